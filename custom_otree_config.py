@@ -90,6 +90,9 @@ config_maps = {
         'environment': ('session', 'environment'),
         'num_rounds': ('session', 'num-rounds'),
         'matching_engine_host': ('market', 'matching-engine-host'),
+        'markets_per_exchange_port': ('market', 'markets-per-exchange-port'),
+        'exchange_extensions': ('market', 'exchange-extensions'),
+        'order_book_depth': ('market', 'order-book-depth'),
         'number_of_groups': ('group', 'number-of-groups'),
         'players_per_group': ('group', 'players-per-group'),
         'k_reference_price': ('parameters', 'k-reference-price'),
@@ -0,0 +1,141 @@
+"""
+slow websocket detection. browsers acknowledge the number of frames
+they processed (ws.js), a connection whose acknowledgements fall more
+than HFT_BACKPRESSURE_MAX_LAG frames behind what was sent to it is slow.
+a slow connection leaves its market group, so group sends stop
+queueing on it, and gets what HFT_BACKPRESSURE_POLICY allows:
+
+    drop_stale  the market's messages without the state ones
+                (bbo, signed volume...), which newer ones replace anyway
+    snapshot    only the latest state of the market, at most once
+                every snapshot_interval seconds
+    resync      nothing, it is closed and the browser reconnects
+
+it rejoins its group with a snapshot of the market state once its lag
+is under a quarter of the limit.
+"""
+import os
+import time
+
+DROP_STALE = 'drop_stale'
+SNAPSHOT = 'snapshot'
+RESYNC = 'resync'
+policies = (DROP_STALE, SNAPSHOT, RESYNC)
+
+backpressure_policy = os.environ.get('HFT_BACKPRESSURE_POLICY', DROP_STALE)
+backpressure_max_lag = int(os.environ.get('HFT_BACKPRESSURE_MAX_LAG', 500))
+
+ack_prefix = '{"type":"ack","received":'
+
+
+def parse_ack(text):
+    """ frames a browser acknowledged, None if the text is not an ack """
+    if text.startswith(ack_prefix):
+        return int(text[len(ack_prefix):-1])
+
+
+class ConnectionLag:
+
+    __slots__ = ('channel_name', 'player_id', 'market_id', 'frame_format',
+        'frames_sent', 'joined_at', 'acked', 'slow', 'dropped', 'max_lag',
+        'snapshot_sent_at')
+
+    def __init__(self, channel_name, player_id, market_id, frame_format,
+            frames_sent, joined_at):
+        self.channel_name = channel_name
+        self.player_id = player_id
+        self.market_id = market_id
+        self.frame_format = frame_format
+        # frames sent outside the group, and the group's
+        # frame count when the connection joined it
+        self.frames_sent = frames_sent
+        self.joined_at = joined_at
+        self.acked = 0
+        self.slow = False
+        self.dropped = 0
+        self.max_lag = 0
+        self.snapshot_sent_at = 0
+
+
+class BackpressureMonitor:
+
+    snapshot_interval = 1 #seconds
+
+    def __init__(self, policy=backpressure_policy, max_lag=backpressure_max_lag):
+        if policy not in policies:
+            raise Exception('invalid backpressure policy %s' % policy)
+        self.policy = policy
+        self.max_lag = max_lag
+        self.resume_lag = max_lag // 4
+        # reply channel name: connection
+        self.connections = {}
+        # (market id, frame format): frames sent to the group
+        self.group_frames = {}
+
+    def connected(self, channel_name, player_id, market_id, frame_format,
+            frames_sent=0):
+        market_id = str(market_id)
+        self.connections[channel_name] = ConnectionLag(channel_name, int(player_id),
+            market_id, frame_format, frames_sent,
+            self.group_frames.get((market_id, frame_format), 0))
+
+    def disconnected(self, channel_name):
+        return self.connections.pop(channel_name, None)
+
+    def group_sent(self, market_id, frame_format):
+        key = (market_id, frame_format)
+        self.group_frames[key] = self.group_frames.get(key, 0) + 1
+
+    def direct_sent(self, channel_name):
+        connection = self.connections.get(channel_name)
+        if connection is not None:
+            connection.frames_sent += 1
+
+    def sent(self, connection):
+        if connection.slow:
+            return connection.frames_sent
+        return connection.frames_sent + self.group_frames.get((
+            connection.market_id, connection.frame_format), 0) - connection.joined_at
+
+    def lag(self, connection):
+        return self.sent(connection) - connection.acked
+
+    def acknowledged(self, channel_name, received):
+        """ the connection if it just became slow or recovered, else None """
+        connection = self.connections.get(channel_name)
+        if connection is None:
+            return None
+        connection.acked = received
+        lag = self.lag(connection)
+        connection.max_lag = max(connection.max_lag, lag)
+        if not connection.slow and lag > self.max_lag:
+            # frames from the group are counted as sent to it from now on
+            connection.frames_sent = self.sent(connection)
+            connection.slow = True
+            return connection
+        if connection.slow and lag <= self.resume_lag:
+            connection.slow = False
+            connection.joined_at = self.group_frames.get((connection.market_id,
+                connection.frame_format), 0)
+            return connection
+        return None
+
+    def slow_connections(self, market_id):
+        return [connection for connection in self.connections.values() if
+            connection.slow and connection.market_id == market_id]
+
+    def snapshot_due(self, connection):
+        now = time.monotonic()
+        if now - connection.snapshot_sent_at < self.snapshot_interval:
+            return False
+        connection.snapshot_sent_at = now
+        return True
+
+    def report(self):
+        lines = []
+        for connection in sorted(self.connections.values(),
+                key=lambda connection: connection.player_id):
+            lines.append('player %s: lag %d frames, max %d, %d dropped%s' % (
+                connection.player_id, self.lag(connection), connection.max_lag,
+                connection.dropped, ', slow' if connection.slow else ''))
+        return '\n'.join(lines) or 'no connections'
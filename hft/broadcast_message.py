@@ -46,6 +46,11 @@ class OrderExecutedBroadcastMessage(BroadcastWSMessage):
     required_field_types = (int, int, str, int, str, int, int)
 
 
+class OrderBookBroadcastMessage(BroadcastWSMessage):
+    required_fields = ('market_id', 'depth', 'batched', 'bids', 'offers')
+    required_field_types = (int, int, bool, list, list)
+
+
 class SystemEventBroadcastMessage(BroadcastWSMessage):
     required_fields = ('market_id', 'code')
     required_field_types = (int, str)    
@@ -97,4 +102,5 @@ class ELOBroadcastMessageFactory(MessageFactory):
         'speed_confirm': SpeedConfirmBroadcastMessage,
         'slider_confirm': SliderConfirmBroadcastMessage,
         'post_batch': PostBatchBroadcastMessage,
+        'order_book': OrderBookBroadcastMessage,
     }
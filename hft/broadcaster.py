@@ -1,54 +1,459 @@
 from channels import Group as CGroup, Channel
-from collections import deque
+from threading import Lock
+from twisted.internet import reactor
+from .backpressure import BackpressureMonitor, DROP_STALE, SNAPSHOT, RESYNC
+from .compact_frames import (COMPACT, JSON, compact_group_name, elo_compact_encoder,
+    to_compact_json)
+from .connections import ConnectionRegistry
+from .broadcast_message import ELOBroadcastMessageFactory
+from .market_elements.price_levels import PriceLevelBook
+from .market_snapshot import build_history, build_snapshot
+from .player_routes import get_player_routes
 import json
 import time
 import logging
 
 log = logging.getLogger(__name__)
 
+
+class BroadcastQueue:
+    """
+    messages of a market waiting for the next flush. of the state
+    messages only the newest of each type is kept, it takes the
+    place of the arrival of the newest one.
+    """
+
+    __slots__ = ('market_id', 'player_id', 'messages', 'latest', 'flush_interval',
+        'flush_call', 'lock')
+
+    def __init__(self, market_id, flush_interval, player_id=None):
+        self.market_id = market_id
+        # queues of private messages belong to a player
+        self.player_id = player_id
+        self.messages = []
+        self.latest = {}
+        self.flush_interval = flush_interval
+        self.flush_call = None
+        self.lock = Lock()
+
+    def add(self, message, latest_wins=False):
+        """ true if the queue was empty, the caller arms the flush then """
+        with self.lock:
+            messages = self.messages
+            was_empty = not messages
+            if latest_wins:
+                message_type = message.type
+                if message_type in self.latest:
+                    messages[self.latest[message_type]] = None
+                self.latest[message_type] = len(messages)
+            messages.append(message)
+            return was_empty
+
+    def take(self):
+        with self.lock:
+            messages = self.messages
+            self.messages = []
+            self.latest = {}
+        return [message.data for message in messages if message is not None]
+
+
 class  Broadcaster:
 
-    flush_interval = 0.25 #seconds
+    # a market's queue is flushed flush_interval seconds after its first
+    # message, the interval adapts between min and max flush interval,
+    # it grows while flushes carry more than flush_target messages
+    # and shrinks when they carry fewer.
+    min_flush_interval = 0.05 #seconds
+    max_flush_interval = 0.5
+    flush_target = 20
     queues = {}
-    flush_history = {}
     unbatchable_message_types = ('system_event', 'role_confirm', 'speed_confirm',
         'slider_confirm')
-
+    # state broadcasts, the newest one in a flush window replaces the others
+    latest_wins_message_types = frozenset(('bbo', 'signed_volume',
+        'reference_price', 'external_feed', 'order_book'))
+    frame_encoder = elo_compact_encoder(latest_wins_message_types)
+    # live websockets of this process
+    connections = ConnectionRegistry()
+    # messages only their player's browser needs,
+    # they go to the player's channel instead of the market group
+    private_message_types = frozenset(('speed_confirm', 'slider_confirm'))
+    # the other browsers draw the book from the order lifecycle messages
+    # until the market's 'order_book' depth feed reaches them, from then
+    # on only the order's player needs them
+    order_message_types = frozenset(('confirmed', 'replaced', 'canceled', 
+        'executed'))
+    # markets whose depth feed went through this process
+    depth_feed_markets = set()
+    # market id: aggregated book built from the order lifecycle messages,
+    # kept here rather than pickled with the market. the exchange's
+    # messages of a market are all handled in the process connected to
+    # it. while the book changes its top levels go to the market every
+    # order_book_interval seconds, if they differ from the last ones.
+    order_books = {}
+    order_book_calls = {}
+    order_book_interval = 0.25 #seconds
+    order_book_lock = Lock()
+    order_book_handlers = {
+        'order_book': 'reset_order_book',
+        'confirmed': 'order_confirmed',
+        'replaced': 'order_replaced',
+        'canceled': 'order_removed',
+        'executed': 'order_removed',
+    }
+    # player id: (reply channel, when to look it up again) of players
+    # connected to other processes, they may reconnect on a new channel
+    remote_player_channels = {}
+    # player id: when to look up the player's channel again
+    missing_player_channels = {}
+    channel_lookup_interval = 5 #seconds
+    # acknowledged frames of each websocket, see backpressure.py
+    backpressure = BackpressureMonitor()
+    # market id: message type: latest state message sent to the market
+    market_state = {}
+    # market id: sequence number of the last frame sent to its groups,
+    # browsers ask for a snapshot when they see a gap
+    market_seq = {}
+    seq_lock = Lock()
 
     def broadcast(self, message, batch=False):
-        if batch and message.type not in self.unbatchable_message_types:
+        message_type = message.type
+        if message_type in self.order_book_handlers:
+            getattr(self, self.order_book_handlers[message_type])(message)
+            if message_type == 'order_book':
+                return
+        if self.is_private(message):
+            if batch and message.type not in self.unbatchable_message_types:
+                self.append(message, private=True)
+            else:
+                self.send_to_player(message)
+        elif batch and message.type not in self.unbatchable_message_types:
             self.append(message)
         else:
             self.broadcast_to_market(message)
-    
-    @staticmethod
-    def broadcast_to_market(message, market_id=None):
+
+    def is_private(self, message):
+        message_type = message.type
+        if message_type in self.private_message_types:
+            return True
+        if message_type in self.order_message_types:
+            return str(message.market_id) in self.depth_feed_markets
+        return False
+
+    def reset_order_book(self, message):
+        """ a market starts trading, its book starts empty with its depth """
+        market_id = str(message.market_id)
+        with self.order_book_lock:
+            book = self.order_books[market_id] = PriceLevelBook(
+                depth=message.depth, batched=message.batched)
+            book.snapshot()
+        self.depth_feed_markets.add(market_id)
+        self.broadcast_to_market(message)
+
+    def get_order_book(self, market_id):
+        try:
+            return self.order_books[market_id]
+        except KeyError:
+            # trading started in another process
+            return self.order_books.setdefault(market_id, PriceLevelBook())
+
+    def order_confirmed(self, message):
+        # immediate or cancel orders never rest in the book
+        if message.time_in_force == 0:
+            return
+        market_id = str(message.market_id)
+        with self.order_book_lock:
+            changed = self.get_order_book(market_id).add(message.order_token,
+                message.price, message.buy_sell_indicator)
+        if changed:
+            self.order_book_changed(market_id)
+
+    def order_replaced(self, message):
+        market_id = str(message.market_id)
+        with self.order_book_lock:
+            changed = self.get_order_book(market_id).replace(message.old_token,
+                message.order_token, message.price)
+        if changed:
+            self.order_book_changed(market_id)
+
+    def order_removed(self, message):
+        # executions of immediate or cancel orders find nothing to remove
+        market_id = str(message.market_id)
+        with self.order_book_lock:
+            changed = self.get_order_book(market_id).remove(message.order_token)
+        if changed:
+            self.order_book_changed(market_id)
+
+    def order_book_changed(self, market_id):
+        # messages may come from threads other than the reactor's
+        reactor.callFromThread(self.schedule_order_book, market_id)
+
+    def schedule_order_book(self, market_id):
+        call = self.order_book_calls.get(market_id)
+        if call is None or not call.active():
+            self.order_book_calls[market_id] = reactor.callLater(
+                self.order_book_interval, self.publish_order_book, market_id)
+
+    def publish_order_book(self, market_id):
+        self.order_book_calls.pop(market_id, None)
+        with self.order_book_lock:
+            book = self.order_books[market_id]
+            snapshot = book.snapshot()
+        if snapshot is None:
+            return
+        bids, offers = snapshot
+        self.depth_feed_markets.add(market_id)
+        self.broadcast_to_market(ELOBroadcastMessageFactory.get_message(
+            'order_book', market_id=market_id, depth=book.depth, 
+            batched=book.batched, bids=bids, offers=offers))
+
+    def connected(self, channel_name, player_id, market_id, frame_format,
+            frames_sent=0):
+        """ a websocket joins its market's group for its frame format """
+        connection = self.connections.connect(channel_name, player_id, market_id,
+            frame_format)
+        CGroup(self.group_name(connection.market_id, frame_format)).add(
+            channel_name)
+        if frame_format == COMPACT:
+            # the new client has none of the state deltas build on
+            self.frame_encoder.request_keyframe(connection.market_id)
+        self.remote_player_channels.pop(connection.player_id, None)
+        self.missing_player_channels.pop(connection.player_id, None)
+        self.backpressure.connected(channel_name, player_id, market_id,
+            frame_format, frames_sent=frames_sent)
+        log.debug('player %s connected to market %s, %d live connections' % (
+            connection.player_id, connection.market_id, 
+            self.connections.count(connection.market_id)))
+
+    def disconnected(self, channel_name, player_id=None):
+        connection = self.connections.disconnect(channel_name)
+        self.backpressure.disconnected(channel_name)
+        if connection is None:
+            # connected through another process, or this one restarted,
+            # the player's route names the groups it may be in
+            if player_id is not None:
+                market_id = get_player_routes().get(player_id)[0]
+                for frame_format in (JSON, COMPACT):
+                    CGroup(self.group_name(market_id, frame_format)
+                        ).discard(channel_name)
+            return
+        CGroup(self.group_name(connection.market_id, connection.frame_format)
+            ).discard(channel_name)
+        log.debug('player %s left market %s, %d live connections' % (
+            connection.player_id, connection.market_id, 
+            self.connections.count(connection.market_id)))
+
+    def get_player_channel(self, player_id):
+        """ reply channel name and frame format of a player, None if not connected """
+        connection = self.connections.player_connection(player_id)
+        if connection is not None:
+            return connection.channel_name, connection.frame_format
+        now = time.monotonic()
+        remote_channel = self.remote_player_channels.get(player_id)
+        if remote_channel is not None and remote_channel[1] > now:
+            # its format is unknown, JSON is understood by every client
+            return remote_channel[0], JSON
+        # the player may have connected to another process,
+        # its reply channel reaches the cache from there
+        if self.missing_player_channels.get(player_id, 0) > now:
+            return None
+        channel_name = get_player_routes().remote_channel(player_id)
+        if not channel_name:
+            self.remote_player_channels.pop(player_id, None)
+            self.missing_player_channels[player_id] = now + self.channel_lookup_interval
+            return None
+        self.remote_player_channels[player_id] = (channel_name, 
+            now + self.channel_lookup_interval)
+        return channel_name, JSON
+
+    def send_to_player(self, message, player_id=None):
+        if player_id is None:
+            player_id = message.player_id
+        player_channel = self.get_player_channel(int(player_id))
+        if player_channel is None:
+            return
+        channel_name, frame_format = player_channel
+        if frame_format == COMPACT:
+            text = self.frame_encoder.encode(None, message.data)
+        else:
+            text = message.to_json()
+        self.send_text(channel_name, text)
+
+    def send_text(self, channel_name, text):
+        Channel(channel_name).send({"text": text})
+        self.backpressure.direct_sent(channel_name)
+
+    def group_name(self, market_id, frame_format):
+        if frame_format == COMPACT:
+            return compact_group_name(market_id)
+        return market_id
+
+    def send_to_group(self, market_id, frame_format, text):
+        CGroup(self.group_name(market_id, frame_format)).send({"text": text})
+        self.backpressure.group_sent(market_id, frame_format)
+
+    def next_seq(self, market_id):
+        with self.seq_lock:
+            seq = self.market_seq[market_id] = self.market_seq.get(market_id, 0) + 1
+        return seq
+
+    def broadcast_to_market(self, message, market_id=None):
         if market_id is None:
             market_id = message.market_id
-        channel_group = CGroup(str(market_id))
-        json_msg = message
-        if not isinstance(json_msg, str):
-            json_msg = message.to_json()
-        channel_group.send({"text": json_msg}) 
+        market_id = str(market_id)
+        seq = self.next_seq(market_id)
+        # groups span processes, connections of other processes may be in them
+        self.send_to_group(market_id, JSON, json.dumps(dict(message.data, seq=seq)))
+        self.send_to_group(market_id, COMPACT, 
+            self.frame_encoder.encode(market_id, message.data, seq=seq))
+        self.sent_to_market(market_id, [message.data], batched=False)
 
-    def append(self, message):
+    def append(self, message, private=False):
         market_id = message.market_id
-        if market_id not in self.queues:
-            self.queues[market_id] = deque()
-            self.flush_history[market_id] = time.time()
-        # len(), append, pop are thread safe
-        mq = self.queues[market_id]
-        mq.append(message)
-        now = time.time()
-        time_since_flush =  now - self.flush_history[market_id]
-        if  time_since_flush > self.flush_interval:
-            num_msg_to_batch = len(mq)
-            batched_messages = [mq.popleft().data for i in range(num_msg_to_batch)]
-            json_msg = json.dumps({'type': 'batch', 'batch': batched_messages})
-            self.broadcast_to_market(json_msg, market_id=market_id)
-            self.flush_history[market_id] = now
-            log.info('flushed broadcast queue %s messages', num_msg_to_batch)
-
-
-
-        
+        key = ('player', message.player_id) if private else market_id
+        try:
+            queue = self.queues[key]
+        except KeyError:
+            queue = self.queues.setdefault(key, BroadcastQueue(market_id,
+                self.min_flush_interval, player_id=message.player_id if private 
+                else None))
+        if queue.add(message, message.type in self.latest_wins_message_types):
+            # messages may come from threads other than the reactor's
+            reactor.callFromThread(self.schedule_flush, queue)
+
+    def schedule_flush(self, queue):
+        if queue.flush_call is None or not queue.flush_call.active():
+            queue.flush_call = reactor.callLater(queue.flush_interval, self.flush,
+                queue)
+
+    def flush(self, queue):
+        queue.flush_call = None
+        batched_messages = queue.take()
+        if not batched_messages:
+            return
+        num_msg_to_batch = len(batched_messages)
+        market_id = str(queue.market_id)
+        if queue.player_id is not None:
+            self.flush_to_player(queue.player_id, batched_messages)
+        else:
+            self.flush_to_market(market_id, batched_messages)
+        self.adapt_flush_interval(queue, num_msg_to_batch)
+        log.debug('flushed broadcast queue %s: %s messages, next interval %.3f',
+            queue.market_id, num_msg_to_batch, queue.flush_interval)
+
+    def flush_to_player(self, player_id, batched_messages):
+        player_channel = self.get_player_channel(int(player_id))
+        if player_channel is None:
+            return
+        channel_name, frame_format = player_channel
+        if frame_format == COMPACT:
+            text = self.frame_encoder.encode_batch(None, batched_messages)
+        else:
+            text = json.dumps({'type': 'batch', 'batch': batched_messages})
+        self.send_text(channel_name, text)
+
+    def flush_to_market(self, market_id, batched_messages):
+        seq = self.next_seq(market_id)
+        self.send_to_group(market_id, JSON, json.dumps({'type': 'batch', 
+            'seq': seq, 'batch': batched_messages}))
+        self.send_to_group(market_id, COMPACT, self.frame_encoder.encode_batch(
+            market_id, batched_messages, seq=seq))
+        self.sent_to_market(market_id, batched_messages)
+
+    def sent_to_market(self, market_id, messages, batched=True):
+        """ keeps the market's latest state, slow connections get their share """
+        for message_data in messages:
+            if message_data['type'] in self.latest_wins_message_types:
+                self.market_state.setdefault(market_id, {})[message_data['type']
+                    ] = message_data
+        for connection in self.backpressure.slow_connections(market_id):
+            if self.backpressure.policy == DROP_STALE:
+                fresh = [message_data for message_data in messages if 
+                    message_data['type'] not in self.latest_wins_message_types]
+                connection.dropped += len(messages) - len(fresh)
+                if fresh:
+                    self.send_messages(connection, fresh, batched)
+            elif self.backpressure.policy == SNAPSHOT:
+                connection.dropped += len(messages)
+                if self.backpressure.snapshot_due(connection):
+                    self.send_snapshot(connection)
+
+    def send_messages(self, connection, messages, batched):
+        # only messages without state here, compact frames need no market
+        if connection.frame_format == COMPACT:
+            text = (self.frame_encoder.encode_batch(None, messages) if batched
+                else self.frame_encoder.encode(None, messages[0]))
+        else:
+            text = json.dumps({'type': 'batch', 'batch': messages} if batched 
+                else messages[0])
+        self.send_text(connection.channel_name, text)
+
+    def send_snapshot(self, connection):
+        state = list(self.market_state.get(connection.market_id, {}).values())
+        if not state:
+            return
+        if connection.frame_format == COMPACT:
+            text = self.frame_encoder.encode_snapshot(state)
+        else:
+            text = json.dumps({'type': 'batch', 'batch': state})
+        self.send_text(connection.channel_name, text)
+
+    def send_resync(self, channel_name, subsession_id):
+        """ snapshot of the market and the player's orders for a connection """
+        connection = self.connections.get(channel_name)
+        if connection is None:
+            return
+        market_id = connection.market_id
+        # frames after this one may repeat state the snapshot has
+        seq = self.market_seq.get(market_id, 0)
+        snapshot = build_snapshot(market_id, subsession_id, connection.player_id)
+        if snapshot is None:
+            return
+        snapshot['seq'] = seq
+        order_book = self.market_state.get(market_id, {}).get('order_book')
+        if order_book is not None:
+            # the book is not part of the market model
+            snapshot['batch'].append(order_book)
+        if connection.frame_format == COMPACT:
+            # the client's delta state is stale too
+            self.frame_encoder.request_keyframe(market_id)
+        self.send_text(channel_name, json.dumps(snapshot))
+
+    def send_history(self, channel_name, subsession_id, resolution_ms, seconds):
+        connection = self.connections.get(channel_name)
+        if connection is None:
+            return
+        history = build_history(connection.market_id, subsession_id, 
+            resolution_ms, seconds)
+        if history is not None:
+            self.send_text(channel_name, to_compact_json(history))
+
+    def acknowledged(self, channel_name, received):
+        """ a browser processed received frames, see backpressure.py """
+        connection = self.backpressure.acknowledged(channel_name, received)
+        if connection is None:
+            return
+        group = CGroup(self.group_name(connection.market_id, 
+            connection.frame_format))
+        if connection.slow:
+            log.warning('player %s is %d frames behind, %s' % (
+                connection.player_id, self.backpressure.lag(connection),
+                self.backpressure.policy))
+            group.discard(channel_name)
+            if self.backpressure.policy == RESYNC:
+                # the browser reconnects once closed
+                Channel(channel_name).send({"text": json.dumps({'type': 'resync'}),
+                    "close": True})
+        else:
+            log.info('player %s caught up, rejoins market %s' % (
+                connection.player_id, connection.market_id))
+            self.send_snapshot(connection)
+            group.add(channel_name)
+
+    def adapt_flush_interval(self, queue, num_messages):
+        if num_messages > self.flush_target:
+            queue.flush_interval = min(self.max_flush_interval,
+                queue.flush_interval * 1.5)
+        elif num_messages < self.flush_target / 2:
+            queue.flush_interval = max(self.min_flush_interval,
+                queue.flush_interval / 1.5)
@@ -1,5 +1,6 @@
 from django.core.cache import cache
 import logging
+import time
 
 log = logging.getLogger(__name__)
 
@@ -63,3 +64,71 @@ def get_model_ids(model):
     subsession_id = model.subsession_id
     return {'model_name': model_name, 'model_id': model_id, 
         'subsession_id': subsession_id}
+
+
+exchange_port_table_key = 'EXCHANGE_PORTS_{auction_format}'
+# reservations older than this are considered abandoned
+exchange_port_reservation_timeout = 12 * 60 * 60
+
+
+def reserve_exchange_port(auction_format, owner, slot, ports, markets_per_port=1,
+        reservation_timeout=exchange_port_reservation_timeout):
+    """
+    reserves a port and a market tag on it for a market,
+    ports are shared by all subsessions running at the same time
+    so reservations are kept in the cache.
+    a port either carries a single market or (if markets_per_port > 1)
+    is multiplexed, market tag is None for single market ports.
+    an owner reserving the same slot again gets the same port and tag.
+    """
+    multiplexed = markets_per_port > 1
+    key = exchange_port_table_key.format(auction_format=auction_format)
+    with cache.lock(lock_key_format_str.format(cache_key=key)):
+        now = time.time()
+        # port: {'multiplexed': bool, 'markets': {market tag: (owner, slot, time)}}
+        port_table = cache.get(key) or {}
+        expired = False
+        for port, port_info in port_table.items():
+            markets = port_info['markets']
+            for market_tag, (held_by, _, reserved_at) in list(markets.items()):
+                if now - reserved_at > reservation_timeout:
+                    log.warning('reservation for port %s tag %s by %s expired.' % (
+                        port, market_tag, held_by))
+                    del markets[market_tag]
+                    expired = True
+        if expired:
+            cache.set(key, port_table, timeout=None)
+        for port, port_info in port_table.items():
+            for market_tag, (held_by, held_slot, _) in port_info['markets'].items():
+                if (held_by, held_slot) == (owner, slot):
+                    return port, market_tag if port_info['multiplexed'] else None
+        for port in sorted(ports):
+            port_info = port_table.get(port)
+            if port_info is None or not port_info['markets']:
+                port_info = {'multiplexed': multiplexed, 'markets': {}}
+                port_table[port] = port_info
+            if port_info['multiplexed'] is not multiplexed:
+                continue
+            markets = port_info['markets']
+            if len(markets) < markets_per_port:
+                market_tag = min(set(range(markets_per_port)) - set(markets))
+                markets[market_tag] = (owner, slot, now)
+                cache.set(key, port_table, timeout=None)
+                log.debug('reserved port %s tag %s for %s:%s' % (port, market_tag, 
+                    owner, slot))
+                return port, market_tag if multiplexed else None
+    raise Exception('no exchange port available for %s, %s ports: %s' % (
+        auction_format, 'multiplexed' if multiplexed else 'single market', ports))
+
+
+def release_exchange_ports(auction_format, owner):
+    key = exchange_port_table_key.format(auction_format=auction_format)
+    with cache.lock(lock_key_format_str.format(cache_key=key)):
+        port_table = cache.get(key) or {}
+        for port, port_info in port_table.items():
+            markets = port_info['markets']
+            for market_tag, (held_by, _, _) in list(markets.items()):
+                if held_by == owner:
+                    del markets[market_tag]
+        cache.set(key, port_table, timeout=None)
+    log.debug('released exchange ports held by %s.' % owner)
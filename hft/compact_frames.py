@@ -0,0 +1,178 @@
+"""
+compact wire format for broadcasts, negotiated per connection
+(see SubjectConsumer and ws.js), JSON messages stay the fallback.
+
+every broadcast message type gets a schema id, a message is sent as
+
+    [schema id, value, value, ...]
+
+with the values in the order of the type's required_fields. state
+messages (Broadcaster.latest_wins_message_types) are sent as deltas
+against the last ones sent to the market,
+
+    [schema id, mask, changed value, changed value, ...]
+
+where bit i of the mask marks field i as present. a full frame, all
+bits set, goes out every keyframe_interval frames of a type and when
+a compact client joins. a batch is [0, frame, frame, ...].
+frames sent to a market's group end with the market's sequence number,
+[schema id, ..., seq] and [0, frame, ..., seq].
+the schema table is sent as a JSON {'type': 'schema'} message on connect.
+
+the other way, clients that got the schema table may send order entry
+and slider messages as [schema id, value, value, ...] with the values
+in the order of the schema's inbound fields, InboundFrameParser reads
+them straight into typed message dicts.
+"""
+import json
+from .broadcast_message import ELOBroadcastMessageFactory
+
+BATCH_SCHEMA_ID = 0
+COMPACT = 'compact'
+JSON = 'json'
+
+to_compact_json = json.JSONEncoder(separators=(',', ':')).encode
+
+
+class CompactFrameEncoder:
+
+    keyframe_interval = 20
+
+    def __init__(self, message_types, state_message_types):
+        self.schemas = {}
+        # ids follow type names so every process agrees on them
+        for schema_id, message_type in enumerate(sorted(message_types), 1):
+            fields = message_types[message_type].required_fields
+            self.schemas[message_type] = (schema_id, fields,
+                message_type in state_message_types)
+        self.state_schema_ids = frozenset(schema_id for schema_id, _, is_state in
+            self.schemas.values() if is_state)
+        # market id: schema id: (last values sent, frames since keyframe)
+        self.market_state = {}
+
+    def schema_message(self):
+        return json.dumps({'type': 'schema', 'batch_schema_id': BATCH_SCHEMA_ID,
+            'schemas': {schema_id: {'type': message_type, 'fields': fields,
+                'delta': is_state} for message_type, (schema_id, fields, is_state)
+                in self.schemas.items()},
+            'inbound': inbound_frame_parser.schema_table()})
+
+    def request_keyframe(self, market_id):
+        self.market_state.pop(market_id, None)
+
+    def frame(self, market_id, message_data):
+        schema_id, fields, is_state = self.schemas[message_data['type']]
+        values = [message_data[field] for field in fields]
+        if not is_state:
+            values.insert(0, schema_id)
+            return values
+        state = self.market_state.setdefault(market_id, {})
+        last_values, frames_since_keyframe = state.get(schema_id, (None, 0))
+        if last_values is None or frames_since_keyframe >= self.keyframe_interval:
+            state[schema_id] = (values, 0)
+            return [schema_id, (1 << len(values)) - 1] + values
+        mask, changed = 0, [schema_id, 0]
+        for ix, value in enumerate(values):
+            if value != last_values[ix]:
+                mask |= 1 << ix
+                changed.append(value)
+        changed[1] = mask
+        state[schema_id] = (values, frames_since_keyframe + 1)
+        return changed
+
+    def encode(self, market_id, message_data, seq=None):
+        frame = self.frame(market_id, message_data)
+        if seq is not None:
+            frame.append(seq)
+        return to_compact_json(frame)
+
+    def encode_batch(self, market_id, batched_messages, seq=None):
+        frames = [BATCH_SCHEMA_ID]
+        for message_data in batched_messages:
+            frame = self.frame(market_id, message_data)
+            # state that did not change is left out
+            if frame[1] != 0 or not self.is_state_frame(frame):
+                frames.append(frame)
+        if seq is not None:
+            frames.append(seq)
+        return to_compact_json(frames)
+
+    def keyframe(self, message_data):
+        """ full frame of a message, whatever was sent to its market before """
+        schema_id, fields, is_state = self.schemas[message_data['type']]
+        values = [message_data[field] for field in fields]
+        if is_state:
+            return [schema_id, (1 << len(values)) - 1] + values
+        return [schema_id] + values
+
+    def encode_snapshot(self, messages):
+        return to_compact_json([BATCH_SCHEMA_ID] + [self.keyframe(message_data) 
+            for message_data in messages])
+
+    def is_state_frame(self, frame):
+        return frame[0] in self.state_schema_ids
+
+
+class InboundFrameParser:
+
+    # message type: (field, type) in frame order
+    inbound_schemas = {
+        'order_entered': (('price', int), ('buy_sell_indicator', str),
+            ('midpoint_peg', bool)),
+        'slider': (('a_x', float), ('a_y', float), ('a_z', float)),
+    }
+
+    def __init__(self):
+        self.schemas = {}
+        # schema id: function of a frame to its message dict
+        self.parsers = {}
+        for schema_id, message_type in enumerate(sorted(self.inbound_schemas), 1):
+            fields = self.inbound_schemas[message_type]
+            self.schemas[message_type] = (schema_id, tuple(field for field, _ 
+                in fields))
+            self.parsers[schema_id] = self.compile_parser(message_type, fields)
+
+    @staticmethod
+    def compile_parser(message_type, fields):
+        # a dict display per type, so a frame costs no loop over its fields
+        source = 'lambda frame: {%s}' % ', '.join(["'type': %r" % message_type] + 
+            ['%r: %s(frame[%d])' % (field, fieldtype.__name__, ix) for ix, 
+                (field, fieldtype) in enumerate(fields, 1)])
+        return eval(source, {fieldtype.__name__: fieldtype for _, fieldtype in fields})
+
+    def schema_table(self):
+        return {schema_id: {'type': message_type, 'fields': fields} for 
+            message_type, (schema_id, fields) in self.schemas.items()}
+
+    def parse_frame(self, frame):
+        """ message dict of a decoded frame """
+        try:
+            return self.parsers[frame[0]](frame)
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise Exception('invalid inbound frame: %s' % (frame, ))
+
+    def parse(self, text):
+        return self.parse_frame(json.loads(text))
+
+
+inbound_frame_parser = InboundFrameParser()
+
+
+def get_frame_format(query_string):
+    """ wire format a client asked for in its websocket url """
+    if isinstance(query_string, bytes):
+        query_string = query_string.decode('utf-8')
+    for pair in (query_string or '').split('&'):
+        key, _, value = pair.partition('=')
+        if key == 'format' and value == COMPACT:
+            return COMPACT
+    return JSON
+
+
+def compact_group_name(market_id):
+    return '%s.%s' % (market_id, COMPACT)
+
+
+def elo_compact_encoder(state_message_types):
+    return CompactFrameEncoder(ELOBroadcastMessageFactory.message_types,
+        state_message_types)
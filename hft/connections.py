@@ -0,0 +1,71 @@
+class Connection:
+
+    __slots__ = ('channel_name', 'player_id', 'market_id', 'frame_format')
+
+    def __init__(self, channel_name, player_id, market_id, frame_format):
+        self.channel_name = channel_name
+        self.player_id = player_id
+        self.market_id = market_id
+        self.frame_format = frame_format
+
+
+class ConnectionRegistry:
+
+    """
+    live websockets of this process by reply channel, market and player.
+    sockets of other processes are not known here, market groups
+    are sent to whether or not this process has any.
+    """
+
+    def __init__(self):
+        self.connections = {}
+        # (market id, frame format): reply channel names
+        self.market_connections = {}
+        # player id: reply channel names, the newest last
+        self.player_connections = {}
+
+    def connect(self, channel_name, player_id, market_id, frame_format):
+        connection = Connection(channel_name, int(player_id), str(market_id),
+            frame_format)
+        self.disconnect(channel_name)
+        self.connections[channel_name] = connection
+        self.market_connections.setdefault((connection.market_id, frame_format),
+            set()).add(channel_name)
+        self.player_connections.setdefault(connection.player_id, []).append(
+            channel_name)
+        return connection
+
+    def disconnect(self, channel_name):
+        connection = self.connections.pop(channel_name, None)
+        if connection is None:
+            return None
+        self.market_connections[connection.market_id, connection.frame_format
+            ].discard(channel_name)
+        player_channels = self.player_connections[connection.player_id]
+        player_channels.remove(channel_name)
+        if not player_channels:
+            del self.player_connections[connection.player_id]
+        return connection
+
+    def get(self, channel_name):
+        return self.connections.get(channel_name)
+
+    def player_connection(self, player_id):
+        """ the player's newest live connection, None if there is none here """
+        try:
+            return self.connections[self.player_connections[player_id][-1]]
+        except KeyError:
+            return None
+
+    def count(self, market_id, frame_format=None):
+        if frame_format is not None:
+            return len(self.market_connections.get((market_id, frame_format), ()))
+        return sum(len(channel_names) for (connected_market_id, _), channel_names
+            in self.market_connections.items() if connected_market_id == market_id)
+
+    def counts(self):
+        """ live connections per market """
+        counts = {}
+        for (market_id, _), channel_names in self.market_connections.items():
+            counts[market_id] = counts.get(market_id, 0) + len(channel_names)
+        return counts
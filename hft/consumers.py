@@ -1,8 +1,14 @@
 from channels import Group, Channel
 from channels.generic.websockets import JsonWebsocketConsumer
+from .backpressure import parse_ack
+from .compact_frames import COMPACT, get_frame_format, inbound_frame_parser
 from .decorators import timer
 from .dispatcher import ELODispatcher
-from .models import Player
+from .inbound_limits import get_inbound_limiter
+from .journal import get_journal
+from .player_routes import get_player_routes
+from functools import partial
+import json
 import logging
 
 log = logging.getLogger(__name__)
@@ -10,32 +16,94 @@ log = logging.getLogger(__name__)
 class SubjectConsumer(JsonWebsocketConsumer):
 
     def raw_connect(self, message, subsession_id, group_id, player_id):
-        player = Player.objects.get(id=player_id)
-        Group(player.market_id).add(message.reply_channel)
+        market_id, _, _ = get_player_routes().get(player_id)
+        frame_format = get_frame_format(message.content.get('query_string'))
+        if frame_format == COMPACT:
+            message.reply_channel.send({'text': 
+                ELODispatcher.broadcaster.frame_encoder.schema_message()})
+        # the schema message is the first frame of compact connections
+        ELODispatcher.broadcaster.connected(message.reply_channel.name, player_id,
+            market_id, frame_format, 
+            frames_sent=1 if frame_format == COMPACT else 0)
+        ELODispatcher.broadcaster.send_resync(message.reply_channel.name, 
+            subsession_id)
         self.connect(message, subsession_id, group_id, player_id)
 
     def connect(self, message, subsession_id, group_id, player_id):
-        player = Player.objects.get(id=player_id)
         log.info('player %s connected. subsession %s, market %s' % (
             player_id, subsession_id, group_id))
-        player.channel = message.reply_channel
-        player.save()
+        get_player_routes().set_channel(player_id, message.reply_channel.name)
 
     def raw_receive(self, message, subsession_id, group_id, player_id):
+        received = parse_ack(message.content['text'])
+        if received is not None:
+            ELODispatcher.broadcaster.acknowledged(message.reply_channel.name, 
+                received)
+            return
+        try:
+            payload = json.loads(message.content['text'])
+            if isinstance(payload, list):
+                payload = inbound_frame_parser.parse_frame(payload)
+            message_type = payload.get('type')
+        except (ValueError, AttributeError):
+            payload, message_type = None, None
+        except Exception as e:
+            log.warning('player %s: %s' % (player_id, e))
+            return
+        if message_type == 'resync':
+            # the browser missed market frames
+            dispatch = partial(self.resync, subsession_id=subsession_id)
+        elif message_type == 'history':
+            try:
+                dispatch = partial(self.history, subsession_id=subsession_id,
+                    resolution_ms=int(payload['resolution']), 
+                    seconds=int(payload['window']))
+            except (KeyError, TypeError, ValueError):
+                log.warning('player %s: invalid history request %s' % (player_id,
+                    message.content['text']))
+                return
+        else:
+            dispatch = partial(self.dispatch_message, subsession_id=subsession_id, 
+                group_id=group_id, player_id=player_id)
+            # parsed already, the incoming message takes the dict as it is
+            if payload is not None:
+                message = payload
+        get_inbound_limiter().admit(player_id, message_type, message, dispatch)
+
+    def resync(self, message, subsession_id):
+        ELODispatcher.broadcaster.send_resync(message.reply_channel.name, 
+            subsession_id)
+
+    def history(self, message, subsession_id, resolution_ms, seconds):
+        ELODispatcher.broadcaster.send_history(message.reply_channel.name, 
+            subsession_id, resolution_ms, seconds)
+
+    def dispatch_message(self, message, subsession_id, group_id, player_id):
+        # only messages the inbound limiter admitted are journaled,
+        # a replay dispatches what the session dispatched
+        journal = get_journal()
+        if journal is not None:
+            journal.record_websocket(subsession_id, group_id, player_id, 
+                json.dumps(message) if isinstance(message, dict) else 
+                message.content['text'])
         try:
             ELODispatcher.dispatch('websocket', message, subsession_id=subsession_id,
                 market_id=group_id, player_id=player_id)
         except Exception as e:
             log.exception('player %s: error processing message, ignoring. %s:%s', 
-                player_id, message.content, e)
+                player_id, getattr(message, 'content', message), e)
 
     def raw_disconnect(self, message, subsession_id, group_id, player_id):
-        player = Player.objects.get(id=player_id)
-        Group(player.market_id).add(message.reply_channel)      
+        # leaves the market group it joined in raw_connect
+        ELODispatcher.broadcaster.disconnected(message.reply_channel.name,
+            player_id=player_id)
 
 class ExogenousEventConsumer(JsonWebsocketConsumer):
 
     def raw_receive(self, message, subsession_id):
+        journal = get_journal()
+        if journal is not None:
+            journal.record_websocket(subsession_id, None, 0, message.content['text'])
         try:
             ELODispatcher.dispatch('websocket', message, subsession_id=subsession_id,
                 player_id=0)
@@ -22,42 +22,48 @@ class Dispatcher:
     message_factory = IncomingMessageFactory
     market_environment = None
     outgoing_message_types = ()
+    broadcaster = Broadcaster()
+    send_exchange = staticmethod(send_exchange)
 
     @classmethod
-    def dispatch(cls, message_source, message, broadcaster=Broadcaster(), **kwargs):
+    def dispatch(cls, message_source, message, broadcaster=None, **kwargs):
+        if broadcaster is None:
+            broadcaster = cls.broadcaster
         incoming_message = cls.message_factory.get_message(
             message_source, message, cls.market_environment, **kwargs)
         event = EventFactory.get_event(message_source, incoming_message, **kwargs)
-        if event.event_type not in cls.topics:
-            log.warning('unsupported event type: %s.' % event.event_type)
-            return
-        else:
+        try:
+            if event.event_type not in cls.topics:
+                log.warning('unsupported event type: %s.' % event.event_type)
+                return
             observers = cls.topics[event.event_type]
 
-        for topic in observers:
-            handler = cls.handler_factory.get_handler(
-                event, topic, cls.market_environment)
-            event = handler.handle()
+            for topic in observers:
+                handler = cls.handler_factory.get_handler(
+                    event, topic, cls.market_environment)
+                event = handler.handle()
 
-        log.debug(
-            '{event.reference_no}:{event.event_source}:{event.event_type}:{event.player_id}'.format(
-             event=event))
-        #log.debug(event)
+            log.debug(
+                '{event.reference_no}:{event.event_source}:{event.event_type}:{event.player_id}'.format(
+                 event=event))
 
+            while event.exchange_msgs:
+                message = event.exchange_msgs.pop()
+                cls.send_exchange(
+                    message.exchange_host, message.exchange_port, message.translate(), 
+                    message.delay, subsession_id=message.subsession_id,
+                    market_id=message.market_id)
 
-        while event.exchange_msgs:
-            message = event.exchange_msgs.pop()
-            send_exchange(
-                message.exchange_host, message.exchange_port, message.translate(), 
-                message.delay, subsession_id=message.subsession_id)
+            while event.broadcast_msgs:
+                message = event.broadcast_msgs.pop()
+                broadcaster.broadcast(message, batch=True)
 
-        while event.broadcast_msgs:
-            message = event.broadcast_msgs.pop()
-            broadcaster.broadcast(message, batch=True)
-
-        while event.internal_event_msgs:
-            message = event.internal_event_msgs.pop()
-            cls.dispatch('internal_event', message)
+            while event.internal_event_msgs:
+                message = event.internal_event_msgs.pop()
+                cls.dispatch('internal_event', message, broadcaster=broadcaster)
+        finally:
+            # a failed handler would otherwise keep the event out of the pool
+            event.release()
 
 
 class ELODispatcher(Dispatcher):
@@ -72,6 +78,8 @@ class ELODispatcher(Dispatcher):
         'Q': ['market'],
         'Z': ['market'],
         'L': ['trader'],
+        'Y': ['trader'],
+        'W': ['trader'],
         'player_ready': ['market'],
         'advance_me': ['market'],
         'role_change': ['market', 'trader'],
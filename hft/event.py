@@ -13,11 +13,11 @@ class EventFactory:
     @staticmethod
     def get_event(message_source, message, **kwargs):
         if message_source == 'exchange':
-            event = ELOEvent(message_source, message, **kwargs)
+            event = ELOEvent.acquire(message_source, message, **kwargs)
         elif message_source == 'websocket':
-            event = ELOEvent(message_source, message, **kwargs)
+            event = ELOEvent.acquire(message_source, message, **kwargs)
         elif message_source == 'internal_event':
-            event = ELOEvent(message_source, message, **kwargs)
+            event = ELOEvent.acquire(message_source, message, **kwargs)
         else:
             raise Exception('invalid message source: %s' % message_source)
         return event
@@ -29,15 +29,28 @@ class Event:
         'subsession_id', 'market_id', 'player_id',
         'attachments', 'outgoing_messages', 'message', 'event_type',
         'event_source', 'reference_no', 'broadcast_msgs', 'internal_event_msgs',
-        'exchange_msgs')
+        'exchange_msgs', 'kwargs')
 
     translator_cls = None
     internal_event_msg_factory = None
     broadcast_msg_factory = None
     exchange_msg_factory = None
     event_id = count(1, 1)
+    # released events wait here to be reused,
+    # each event class needs a list of its own
+    free_events = []
+    pool_size = 64
 
     def __init__(self, event_source, message, **kwargs):
+        self.attachments = {}
+
+        self.internal_event_msgs = MessageRegistry(self.internal_event_msg_factory)
+        self.broadcast_msgs = MessageRegistry(self.broadcast_msg_factory)
+        self.exchange_msgs = MessageRegistry(self.exchange_msg_factory)
+        self.outgoing_messages = deque()
+        self.reset(event_source, message)
+
+    def reset(self, event_source, message):
         self.reference_no = next(self.event_id)
         self.subsession_id = message.subsession_id
         self.market_id = message.market_id
@@ -45,13 +58,30 @@ class Event:
         self.event_type = message.type
         self.event_source = event_source
         self.message = message
+        self.kwargs = None
+
+    @classmethod
+    def acquire(cls, event_source, message, **kwargs):
+        # events are dispatched from several threads,
+        # the pool may empty between a check and the pop
+        try:
+            event = cls.free_events.pop()
+        except IndexError:
+            return cls(event_source, message, **kwargs)
+        event.reset(event_source, message)
+        return event
 
-        self.attachments = {}
-
-        self.internal_event_msgs = MessageRegistry(self.internal_event_msg_factory)
-        self.broadcast_msgs = MessageRegistry(self.broadcast_msg_factory)
-        self.exchange_msgs = MessageRegistry(self.exchange_msg_factory)
-        self.outgoing_messages = deque()
+    def release(self):
+        """ returns the event to the pool, it must not be used after this """
+        self.message = None
+        self.kwargs = None
+        self.attachments.clear()
+        self.internal_event_msgs.clear()
+        self.broadcast_msgs.clear()
+        self.exchange_msgs.clear()
+        self.outgoing_messages.clear()
+        if len(self.free_events) < self.pool_size:
+            self.free_events.append(self)
 
     def __str__(self):
         return """
@@ -77,10 +107,12 @@ class Event:
         """.format(self=self)
 
     def to_kwargs(self):
-        kwargs = self.message.data
-        for attr in ('event_source', 'reference_no'):
-            kwargs[attr] = getattr(self, attr)
-        if self.attachments:
+        # built once per event, handlers only read it or unpack it with **
+        kwargs = self.kwargs
+        if kwargs is None:
+            kwargs = self.kwargs = self.message.data.copy()
+            kwargs['event_source'] = self.event_source
+            kwargs['reference_no'] = self.reference_no
             for k, v in self.attachments.items():
                 if k not in kwargs:
                     kwargs[k] = v
@@ -88,6 +120,11 @@ class Event:
 
     def attach(self, **attachments):
         self.attachments.update(**attachments)
+        kwargs = self.kwargs
+        if kwargs is not None:
+            for k, v in attachments.items():
+                if k not in kwargs:
+                    kwargs[k] = v
 
 
 class ELOEvent(Event):
@@ -96,6 +133,7 @@ class ELOEvent(Event):
         'attachments', 'outgoing_messages', 'message', 'event_type', 'event_source',
         'broadcast_msgs', 'internal_event_msgs', 'reference_no')
     translator_cls = translator.LeepsOuchTranslator
+    free_events = []
     broadcast_msg_factory = ELOBroadcastMessageFactory
     internal_event_msg_factory = ELOInternalEventMessageFactory
     exchange_msg_factory = OutboundExchangeMessageFactory
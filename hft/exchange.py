@@ -1,9 +1,11 @@
 import logging
 import time
+import struct
 from twisted.internet.protocol import Protocol, ClientFactory
 from twisted.internet import reactor
 from collections import deque
 from .decorators import timer
+from .journal import get_journal, INBOUND, OUTBOUND
 from exchange_server.OuchServer import ouch_messages
 
 log = logging.getLogger(__name__)
@@ -19,6 +21,9 @@ class OUCH(Protocol):
         'O': 49,
         'Z': 49,
         'L': 17,
+        # mass cancel and quote acks, see ouch_extensions
+        'Y': 31,
+        'W': 77,
     }
 
     message_cls = ouch_messages.OuchServerMessages
@@ -26,6 +31,7 @@ class OUCH(Protocol):
     def __init__(self):
         super()
         self.buffer = deque()
+        self.journal = get_journal()
 
     def connectionMade(self):
         log.debug('connection made.')
@@ -53,8 +59,11 @@ class OUCH(Protocol):
 
     def handle_incoming_data(self, header):
         market_id = self.factory.market
+        frame = bytes(self.buffer)
+        if self.journal is not None:
+            self.journal.record(INBOUND, self.factory.subsession_id, market_id, frame)
         try:
-            self.factory.dispatcher.dispatch('exchange', bytes(self.buffer), 
+            self.factory.dispatcher.dispatch('exchange', frame, 
                 subsession_id=self.factory.subsession_id, market_id=market_id)
         except Exception:
             log.exception('error processing exchange message (market:%s), ignoring..', 
@@ -66,7 +75,77 @@ class OUCH(Protocol):
         # can receive a message back (accepted),
         # can receive 2 messages (accepted, executed),
         # can receive 0 message (replace dying silently).
-        reactor.callLater(delay, self.transport.write, msg)
+        reactor.callLater(delay, self.write_frame, msg, self.factory.subsession_id,
+            self.factory.market)
+
+    def write_frame(self, msg, subsession_id, market_id, frame_offset=0):
+        if self.journal is not None:
+            self.journal.record(OUTBOUND, subsession_id, market_id, 
+                msg[frame_offset:])
+        self.transport.write(msg)
+
+
+# frames on a multiplexed connection are prefixed
+# with the tag of the market they belong to
+market_tag_header = struct.Struct('!H')
+
+
+class MultiplexedOUCH(OUCH):
+    """
+    carries several markets over one connection,
+    routes inbound frames by the market tag in the frame header
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stream = bytearray()
+
+    def dataReceived(self, data):
+        stream = self.stream
+        stream.extend(data)
+        tag_size = market_tag_header.size
+        offset = 0
+        while len(stream) - offset > tag_size:
+            header = chr(stream[offset + tag_size])
+            try:
+                bytes_needed = self.bytes_needed[header]
+            except KeyError:
+                # can not find the next frame boundary, drop what we have
+                log.error('unknown header %s, dropping %s bytes..', header, 
+                    len(stream) - offset)
+                offset = len(stream)
+                break
+            frame_end = offset + tag_size + bytes_needed
+            if len(stream) < frame_end:
+                break
+            market_tag, = market_tag_header.unpack_from(stream, offset)
+            frame = bytes(stream[offset + tag_size: frame_end])
+            offset = frame_end
+            self.handle_incoming_frame(market_tag, frame)
+        del stream[:offset]
+
+    def handle_incoming_frame(self, market_tag, frame):
+        try:
+            subsession_id, market_id = self.factory.markets[market_tag]
+        except KeyError:
+            log.warning('no market for tag %s, ignoring..', market_tag)
+            return
+        if self.journal is not None:
+            self.journal.record(INBOUND, subsession_id, market_id, frame)
+        try:
+            self.factory.dispatcher.dispatch('exchange', frame, 
+                subsession_id=subsession_id, market_id=market_id)
+        except Exception:
+            log.exception('error processing exchange message (market:%s), ignoring..', 
+                market_id)
+
+    def sendMessage(self, msg, delay, market_tag=None):
+        if not isinstance(msg, bytes):
+            msg = msg.tobytes()
+        subsession_id, market_id = self.factory.markets[market_tag]
+        msg = market_tag_header.pack(market_tag) + msg
+        reactor.callLater(delay, self.write_frame, msg, subsession_id, market_id,
+            market_tag_header.size)
 
 
 class OUCHConnectionFactory(ClientFactory):
@@ -91,16 +170,61 @@ class OUCHConnectionFactory(ClientFactory):
     def clientConnectionFailed(self, connector, reason):
         log.debug('failed to connect to exchange at %s: %s' % (self.addr, reason))
 
+
+class MultiplexedOUCHConnectionFactory(OUCHConnectionFactory):
+    protocol = MultiplexedOUCH
+
+    def __init__(self, addr, dispatcher):
+        super().__init__(None, None, addr, dispatcher)
+        # market tag: (subsession id, market id)
+        self.markets = {}
+        # market id: market tag
+        self.market_tags = {}
+
+    def register_market(self, subsession_id, market_id, market_tag):
+        if market_tag in self.markets and self.markets[market_tag][1] != market_id:
+            log.warning('market tag %s at %s is reassigned: %s --> %s' % (market_tag,
+                self.addr, self.markets[market_tag][1], market_id))
+        self.markets[market_tag] = (subsession_id, market_id)
+        self.market_tags[str(market_id)] = market_tag
+
+    def unregister_market(self, market_id):
+        market_tag = self.market_tags.pop(str(market_id), None)
+        self.markets.pop(market_tag, None)
+        return len(self.markets)
+
+    def get_market_tag(self, market_id, subsession_id=None):
+        try:
+            market_tag = self.market_tags[str(market_id)]
+        except KeyError:
+            raise FileNotFoundError('market %s is not registered at %s.' % (
+                market_id, self.addr))
+        if subsession_id and str(subsession_id) != str(self.markets[market_tag][0]):
+            raise Exception('subsession id mismatch: conn: %s-message: %s' % (
+                self.markets[market_tag][0], subsession_id))
+        return market_tag
+
+
 exchanges = {}
 
 def connect(subsession_id, market_id, host, port, dispatcher, wait_for_connection=False,
-        retries=10):
+        retries=10, market_tag=None):
     addr = '{}:{}'.format(host, port)
-    if addr not in exchanges:
+    if market_tag is not None:
+        if addr not in exchanges:
+            factory = MultiplexedOUCHConnectionFactory(addr, dispatcher)
+            exchanges[addr] = factory
+            reactor.connectTCP(host, port, factory)
+        elif not isinstance(exchanges[addr], MultiplexedOUCHConnectionFactory):
+            raise Exception('exchange at %s is not multiplexed.' % addr)
+        exchanges[addr].register_market(subsession_id, market_id, market_tag)
+    elif addr not in exchanges:
         factory = OUCHConnectionFactory(subsession_id, market_id, addr, dispatcher)
         exchanges[addr] = factory
         reactor.connectTCP(host, port, factory)
     else:
+        if isinstance(exchanges[addr], MultiplexedOUCHConnectionFactory):
+            raise Exception('exchange at %s is multiplexed, market tag required.' % addr)
         if exchanges[addr].market != market_id:
             log.warning('exchange at {} already has a group: {}'.format(addr, exchanges))
         exchanges[addr].market = market_id
@@ -117,19 +241,29 @@ def connect(subsession_id, market_id, host, port, dispatcher, wait_for_connectio
 def disconnect(market_id, host, port):
     addr = '{}:{}'.format(host, port)
     try:
-        conn = exchanges[addr].connection
+        factory = exchanges[addr]
     except KeyError:
         log.warning('connection at %s not found.', addr)
-    else:
-        conn.transport.loseConnection()
-        del exchanges[addr]
+        return
+    if isinstance(factory, MultiplexedOUCHConnectionFactory):
+        markets_left = factory.unregister_market(market_id)
+        if markets_left:
+            log.debug('market %s left %s, %s markets remain.' % (market_id, addr, 
+                markets_left))
+            return
+    factory.connection.transport.loseConnection()
+    del exchanges[addr]
 
-def send_exchange(host, port, message, delay, subsession_id=None):
+def send_exchange(host, port, message, delay, subsession_id=None, market_id=None):
     addr = '{}:{}'.format(host, port)
     if addr not in exchanges:
         raise FileNotFoundError('connection at %s not found.', addr)
-    conn = exchanges[addr].connection
-    if subsession_id and subsession_id != conn.factory.subsession_id:
+    factory = exchanges[addr]
+    conn = factory.connection
+    if isinstance(factory, MultiplexedOUCHConnectionFactory):
+        market_tag = factory.get_market_tag(market_id, subsession_id=subsession_id)
+        conn.sendMessage(message, delay, market_tag=market_tag)
+    elif subsession_id and subsession_id != conn.factory.subsession_id:
         raise Exception('subsession id mismatch: conn: %s-message: %s' % (
             conn.factory.subsession_id, subsession_id))
     else:
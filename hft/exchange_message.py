@@ -3,31 +3,44 @@ from .outbound_message_primitives import OutboundExchangeMessage, MessageFactory
 
 class EnterOrderMessage(OutboundExchangeMessage):
     required_fields = (
-        'subsession_id',
+        'subsession_id', 'market_id',
         'order_token', 'buy_sell_indicator', 'price', 'time_in_force', 'firm',
         'shares', 'stock', 'exchange_host', 'exchange_port', 'delay', 'midpoint_peg')
 
 
 class ReplaceOrderMessage(OutboundExchangeMessage):
     required_fields = (
-        'subsession_id',
+        'subsession_id', 'market_id',
         'existing_order_token', 'replacement_order_token', 'price', 'replace_price',
         'time_in_force', 'exchange_host', 'exchange_port', 'delay', 'shares')
 
 
 class CancelOrderMessage(OutboundExchangeMessage):
-    required_fields = ('subsession_id', 'order_token', 'exchange_host', 
+    required_fields = ('subsession_id', 'market_id', 'order_token', 'exchange_host', 
         'exchange_port', 'delay', 'shares')
 
 
-class ResetMessage(OutboundExchangeMessage):
-    required_fields = ('subsession_id', 'event_code', 'timestamp', 'exchange_host', 
+class MassCancelMessage(OutboundExchangeMessage):
+    required_fields = ('subsession_id', 'market_id', 'order_token', 'exchange_host',
         'exchange_port', 'delay')
 
 
+class TwoSidedQuoteMessage(OutboundExchangeMessage):
+    required_fields = (
+        'subsession_id', 'market_id',
+        'existing_bid_token', 'replacement_bid_token', 'bid_price',
+        'existing_offer_token', 'replacement_offer_token', 'offer_price',
+        'shares', 'time_in_force', 'exchange_host', 'exchange_port', 'delay')
+
+
+class ResetMessage(OutboundExchangeMessage):
+    required_fields = ('subsession_id', 'market_id', 'event_code', 'timestamp', 
+        'exchange_host', 'exchange_port', 'delay')
+
+
 class ExternalFeedChangeMessage(OutboundExchangeMessage):
     required_fields = (
-        'subsession_id', 'e_best_bid', 'e_best_offer', 
+        'subsession_id', 'market_id', 'e_best_bid', 'e_best_offer', 
         'e_signed_volume', 'exchange_host', 'exchange_port', 'delay')
 
 
@@ -36,6 +49,8 @@ class OutboundExchangeMessageFactory(MessageFactory):
         'enter': EnterOrderMessage,
         'replace': ReplaceOrderMessage,
         'cancel': CancelOrderMessage,
+        'mass_cancel': MassCancelMessage,
+        'quote': TwoSidedQuoteMessage,
         'reset_exchange': ResetMessage,
         'external_feed': ExternalFeedChangeMessage,
     }
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+garbage collector control while markets are trading.
+
+HFT_GC_MODE in the environment picks the mode:
+
+    monitor     only measures collector pauses
+    trading     also freezes everything allocated during session setup
+                when trading starts (gc.freeze, python 3.7+) and swaps
+                in the collection thresholds of HFT_GC_THRESHOLDS
+                (gen0,gen1,gen2) while any session trades
+
+the default thresholds let gen 0 grow much larger before a collection,
+so the short lived objects of the dispatch path rarely survive into the
+older generations and full collections become rare.
+the frozen objects and the original thresholds are restored and a full
+collection runs once the last session stops trading, the pause report
+is logged then.
+"""
+from collections import deque
+import gc
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+gc_mode = os.environ.get('HFT_GC_MODE')
+trading_thresholds = tuple(int(threshold) for threshold in os.environ.get(
+    'HFT_GC_THRESHOLDS', '50000,20,100').split(','))
+
+
+class GCPauseMonitor:
+    """ times collector runs through gc.callbacks """
+
+    def __init__(self, clock=time.perf_counter, history=10000):
+        self.clock = clock
+        self.collection_started_at = None
+        self.collections = [0, 0, 0]
+        self.total_pause = [0.0, 0.0, 0.0]
+        self.max_pause = [0.0, 0.0, 0.0]
+        self.recent_pauses = [deque(maxlen=history) for _ in range(3)]
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self.collection_started_at = self.clock()
+        elif self.collection_started_at is not None:
+            pause = self.clock() - self.collection_started_at
+            self.collection_started_at = None
+            generation = info['generation']
+            self.collections[generation] += 1
+            self.total_pause[generation] += pause
+            self.max_pause[generation] = max(self.max_pause[generation], pause)
+            self.recent_pauses[generation].append(pause)
+
+    def install(self):
+        if self not in gc.callbacks:
+            gc.callbacks.append(self)
+
+    def uninstall(self):
+        if self in gc.callbacks:
+            gc.callbacks.remove(self)
+
+    def reset(self):
+        self.__init__(clock=self.clock, history=self.recent_pauses[0].maxlen)
+
+    def report(self):
+        lines = []
+        for generation in range(3):
+            count = self.collections[generation]
+            if not count:
+                lines.append('gen %d: no collections' % generation)
+                continue
+            pauses = sorted(self.recent_pauses[generation])
+            p99 = pauses[min(len(pauses) - 1, int(len(pauses) * 0.99))]
+            lines.append('gen %d: %d collections, %.1f ms total, %.0f us mean, '
+                '%.0f us p99, %.0f us max' % (generation, count,
+                self.total_pause[generation] * 1e3,
+                self.total_pause[generation] / count * 1e6, p99 * 1e6,
+                self.max_pause[generation] * 1e6))
+        return '\n'.join(lines)
+
+
+class TradingGCControl:
+
+    """ counts trading sessions, the mode is on while any of them trades """
+
+    def __init__(self, mode, thresholds=trading_thresholds):
+        self.mode = mode
+        self.thresholds = thresholds
+        self.monitor = GCPauseMonitor()
+        self.trading_sessions = 0
+        self.default_thresholds = None
+        self.monitor.install()
+
+    def trading_started(self):
+        self.trading_sessions += 1
+        if self.trading_sessions > 1:
+            return
+        if self.mode == 'trading':
+            # collect setup garbage before moving survivors out of reach
+            gc.collect()
+            if hasattr(gc, 'freeze'):
+                gc.freeze()
+            self.default_thresholds = gc.get_threshold()
+            gc.set_threshold(*self.thresholds)
+            log.info('trading gc mode on, thresholds %s, %s objects frozen' % (
+                self.thresholds, gc.get_freeze_count() if hasattr(gc, 'freeze')
+                else 'no'))
+        self.monitor.reset()
+
+    def trading_stopped(self):
+        if self.trading_sessions == 0:
+            return
+        self.trading_sessions -= 1
+        if self.trading_sessions:
+            return
+        log.info('gc pauses while trading:\n%s' % self.monitor.report())
+        if self.mode == 'trading':
+            gc.set_threshold(*self.default_thresholds)
+            if hasattr(gc, 'unfreeze'):
+                gc.unfreeze()
+            gc.collect()
+
+
+_gc_control = None
+
+def get_gc_control():
+    """ gc control of this process, None if HFT_GC_MODE is not set """
+    global _gc_control
+    if _gc_control is None and gc_mode:
+        if gc_mode not in ('monitor', 'trading'):
+            raise Exception('invalid HFT_GC_MODE %s' % gc_mode)
+        _gc_control = TradingGCControl(gc_mode)
+    return _gc_control
@@ -0,0 +1,137 @@
+"""
+inbound stage between the subjects' websockets and the dispatcher.
+
+each player has a token bucket per message type, a message that
+finds its bucket empty is dropped. slider messages are coalesced,
+the first one of a burst is dispatched right away and then at most
+one every coalesce_window seconds, the newest value that arrived
+in the window, the ones it replaced are counted as coalesced.
+dropped orders are logged as warnings, the subject meant to trade.
+"""
+from threading import Lock
+from twisted.internet import reactor
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) *
+            self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class InboundLimiter:
+
+    # message type: (messages per second, burst)
+    rate_limits = {
+        'order_entered': (20, 40),
+        'slider': (10, 10),
+        'role_change': (5, 10),
+        'speed_change': (5, 10),
+        'player_ready': (1, 5),
+        'resync': (1, 3),
+        'history': (1, 3),
+    }
+    default_rate_limit = (50, 100)
+    coalesced_message_types = frozenset(('slider', ))
+    # drops of these are logged as warnings, others at debug level
+    warned_message_types = frozenset(('order_entered', ))
+    coalesce_window = 0.1 #seconds
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = Lock()
+        # (player id, message type): bucket
+        self.buckets = {}
+        # (player id, message type): newest message and its dispatch
+        # while a coalesce window is open, None if none arrived in it
+        self.windows = {}
+        self.dropped = {}
+        self.coalesced = {}
+
+    def admit(self, player_id, message_type, message, dispatch):
+        """ calls dispatch(message) now, after a coalesce window or never """
+        key = (int(player_id), message_type)
+        if message_type in self.coalesced_message_types:
+            with self.lock:
+                window_open = key in self.windows
+                if window_open:
+                    if self.windows[key] is not None:
+                        self.coalesced[key] = self.coalesced.get(key, 0) + 1
+                    self.windows[key] = (message, dispatch)
+                else:
+                    self.windows[key] = None
+            if window_open:
+                return
+            # messages arrive on worker threads
+            reactor.callFromThread(reactor.callLater, self.coalesce_window,
+                self.close_window, key)
+        if self.take_token(key):
+            dispatch(message)
+
+    def close_window(self, key):
+        with self.lock:
+            pending = self.windows[key]
+            if pending is None:
+                del self.windows[key]
+            else:
+                self.windows[key] = None
+        if pending is None:
+            return
+        reactor.callLater(self.coalesce_window, self.close_window, key)
+        message, dispatch = pending
+        if self.take_token(key):
+            # windows close on the reactor thread, dispatching blocks
+            reactor.callInThread(dispatch, message)
+
+    def take_token(self, key):
+        now = self.clock()
+        with self.lock:
+            try:
+                bucket = self.buckets[key]
+            except KeyError:
+                rate, burst = self.rate_limits.get(key[1], self.default_rate_limit)
+                bucket = self.buckets[key] = TokenBucket(rate, burst, now)
+            if bucket.take(now):
+                return True
+            dropped = self.dropped[key] = self.dropped.get(key, 0) + 1
+        if key[1] in self.warned_message_types:
+            log.warning('player %s: %s over its rate limit, dropped, %d so far' % (
+                key[0], key[1], dropped))
+        else:
+            log.debug('player %s: %s over its rate limit, dropped' % key)
+        return False
+
+    def report(self):
+        lines = []
+        for key in sorted(set(self.dropped) | set(self.coalesced),
+                key=lambda key: (key[0], str(key[1]))):
+            lines.append('player %s %s: %d dropped, %d coalesced' % (key[0],
+                key[1], self.dropped.get(key, 0), self.coalesced.get(key, 0)))
+        return '\n'.join(lines) or 'nothing dropped or coalesced'
+
+
+_inbound_limiter = None
+
+def get_inbound_limiter():
+    """ inbound limiter of this process """
+    global _inbound_limiter
+    if _inbound_limiter is None:
+        _inbound_limiter = InboundLimiter()
+    return _inbound_limiter
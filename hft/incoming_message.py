@@ -1,11 +1,14 @@
-from .translator import LeepsOuchTranslator
 from .equations import price_grid
 import json
 import logging
 from .cache import get_market_id_table
+from .compact_frames import inbound_frame_parser
 from .message_sanitizer import (
     ELOWSMessageSanitizer, ELOOuchMessageSanitizer, ELOInternalEventMessageSanitizer)
-from exchange_server.OuchServer.ouch_messages import OuchServerMessages
+from .orderstore import player_id_from_token
+from .ouch_extensions import (
+    server_messages, server_layouts, field_structs, ExtensionMessageSpec, MassCanceled,
+    QuoteReplaced)
 
 log = logging.getLogger(__name__)
 
@@ -25,9 +28,32 @@ class IncomingMessageFactory:
                 raise Exception('invalid message source: %s' % message_source)
 
 
-class IncomingMessage:
+class MessageSchema(type):
+    """
+    gives message classes a slot for each of their required fields
+    that their bases don't already have, so no message has a __dict__.
+    the rest of a message is served from its data.
+    """
 
+    def __new__(mcs, name, bases, namespace):
+        inherited = set()
+        for base in bases:
+            for klass in base.__mro__:
+                inherited.update(getattr(klass, '__slots__', ()))
+        slots = tuple(namespace.get('__slots__', ()))
+        slots += tuple(field for field in namespace.get('required_fields', ())
+            if field not in inherited and field not in slots)
+        namespace['__slots__'] = slots
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class IncomingMessage(metaclass=MessageSchema):
+
+    # the routing fields the event reads are slots, typed on the way in.
+    # every other field of a message is read from its data.
+    __slots__ = ('kwargs', '__data')
     required_fields = ('subsession_id', 'market_id', 'player_id', 'type')
+    required_field_types = (int, int, int, str)
     defaults = {'player_id': None}
     sanitizer_cls = None
 
@@ -59,13 +85,19 @@ class IncomingMessage:
                         raise Exception('required key %s is missing in message %s' % (
                             key, incoming_message
                         ))
+        for key, fieldtype in zip(self.required_fields, self.required_field_types):
+            value = incoming_message[key]
+            if value is not None and type(value) is not fieldtype:
+                value = incoming_message[key] = fieldtype(value)
+            setattr(self, key, value)
         self.__data = incoming_message
         return message
 
     def __getattr__(self, attr_name):
-        if attr_name in self.data:
+        # routing fields are slots, only the others get here
+        try:
             return self.data[attr_name]
-        else:
+        except KeyError:
             raise AttributeError('key %s is not in message %s' % (attr_name, self))
 
     def __str__(self):
@@ -77,19 +109,177 @@ class IncomingMessage:
         return message
 
 
+class LazyOuchMessage(dict):
+    """
+    dict over a raw OUCH frame. player id and firm are read off the
+    token bytes on creation, so the sanitizer can skip these messages.
+    other fields are unpacked at their offset when first read and
+    cached, after that reads are plain dict lookups. a message whose
+    payload layout is not known is unpacked in one go instead.
+    """
+
+    __slots__ = ('frame', 'spec', 'fields', 'structs', 'complete')
+
+    token_size = 14
+    # payload offsets of the tokens that name the trader, first one not blank
+    # is used. server messages start with an 8 byte timestamp.
+    routing_token_offsets = {
+        b'A': (8, ),
+        b'U': (8, ),
+        b'C': (8, ),
+        b'E': (8, ),
+        MassCanceled.header: (MassCanceled.offset_of('order_token'), ),
+        QuoteReplaced.header: (QuoteReplaced.offset_of('replacement_bid_token'),
+            QuoteReplaced.offset_of('replacement_offer_token')),
+    }
+    # messages that are not about a trader's order,
+    # peg state messages go to the investor as in the sanitizer
+    routing_defaults = {
+        b'S': {'player_id': None},
+        b'Q': {'player_id': None},
+        b'Z': {'player_id': None},
+        b'L': {'player_id': 1, 'firm': 'inve'},
+    }
+    # spec: (field names, field: (payload offset, struct) or None)
+    spec_fields = {}
+
+    def __init__(self, frame, message_cls):
+        header = bytes(frame[:1])
+        self.frame = frame
+        self.spec = message_cls.lookup_by_header_bytes(header)
+        self.complete = False
+        self['type'] = header.decode('utf-8')
+        try:
+            self.fields, self.structs = self.spec_fields[self.spec]
+        except KeyError:
+            self.fields, self.structs = self.spec_fields[self.spec] = (
+                frozenset(self.spec.PayloadCls.__slots__),
+                self.layout_of(self.spec, header))
+        self.route(header)
+
+    @staticmethod
+    def layout_of(spec, header):
+        """ field: (payload offset, struct) of a spec, None if not known """
+        if isinstance(spec, ExtensionMessageSpec):
+            layout = spec.fields
+        else:
+            layout = server_layouts.get(header)
+        if layout is None:
+            return None
+        structs = field_structs(layout)
+        offset, last = structs[layout[-1][0]]
+        if (tuple(structs) != tuple(spec.PayloadCls.__slots__) or
+                offset + last.size != spec.payload_size):
+            log.warning('payload layout of %s messages does not match the '
+                'exchange server\'s, they are decoded whole.' % header)
+            return None
+        return structs
+
+    def route(self, header):
+        offsets = self.routing_token_offsets.get(header)
+        if offsets is None:
+            if header in self.routing_defaults:
+                self.update(self.routing_defaults[header])
+            return
+        frame, token = self.frame, b''
+        for offset in offsets:
+            token = bytes(frame[1 + offset: 1 + offset + self.token_size])
+            if token.strip():
+                break
+        token = token.decode('utf-8')
+        self['player_id'] = player_id_from_token(token)
+        self['firm'] = token[0:4].lower()
+
+    def materialize(self):
+        if self.complete:
+            return
+        self.complete = True
+        payload = self.frame[1: 1 + self.spec.payload_size]
+        body = {field: value.decode('utf-8') if isinstance(value, bytes) else value
+            for field, value in self.spec.from_bytes(payload, header=False).iteritems()}
+        # routing fields and fields set by the sanitizer stay as they are
+        body.update(dict.items(self))
+        dict.update(self, body)
+
+    def __missing__(self, key):
+        if not self.complete and key in self.fields:
+            if self.structs is None:
+                self.materialize()
+                return self[key]
+            offset, field_struct = self.structs[key]
+            value, = field_struct.unpack_from(self.frame, 1 + offset)
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+            self[key] = value
+            return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or (not self.complete and 
+            key in self.fields)
+
+    # dict(message) and ** unpacking go through keys() and [] once
+    # __iter__ is overridden, they see the whole body
+
+    def __iter__(self):
+        self.materialize()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self.materialize()
+        return dict.keys(self)
+
+    def items(self):
+        self.materialize()
+        return dict.items(self)
+
+    def values(self):
+        self.materialize()
+        return dict.values(self)
+
+    def __len__(self):
+        self.materialize()
+        return dict.__len__(self)
+
+    def copy(self):
+        """ a plain dict of the whole message """
+        self.materialize()
+        return dict(dict.items(self))
+
+    def __delitem__(self, key):
+        self.materialize()
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *default):
+        self.materialize()
+        return dict.pop(self, key, *default)
+
+    def __repr__(self):
+        self.materialize()
+        return '%s(%s)' % (self.__class__.__name__, dict.__repr__(self))
+
+
 class IncomingWSMessage(IncomingMessage):
 
     def translate(self, message, **kwargs):
-        translated_message = json.loads(message.content['text'])
+        text = message.content['text']
+        if text.startswith('['):
+            return inbound_frame_parser.parse(text)
+        translated_message = json.loads(text)
         return translated_message
 
 
 class IncomingOuchMessage(IncomingMessage):
 
     def translate(self, message, message_cls=None):
-        translated_message = LeepsOuchTranslator.decode(message, message_cls=
-            message_cls if message_cls is not None else OuchServerMessages)
-        return translated_message
+        return LazyOuchMessage(message, message_cls if message_cls is not None
+            else server_messages)
 
 
 class InternalEventMessage(IncomingMessage):
@@ -0,0 +1,226 @@
+"""
+append-only binary journal of the OUCH traffic between
+this process and the exchanges, and of the websocket messages
+dispatched for the subjects and the exogenous event emitter.
+subject messages the inbound limiter dropped or coalesced away
+are not recorded.
+
+a journal file starts with a header (magic, wall clock and monotonic
+clock at open, both in nanoseconds) followed by records:
+
+    timestamp (monotonic ns) | direction | subsession id | market id | length | frame
+
+a websocket record frame is the player id followed by the
+message text, player id 0 is the exogenous event emitter.
+
+writes go to an in memory buffer that is flushed to disk once it
+grows past buffer_size or every flush_interval seconds, so the
+exchange protocol only pays for a struct pack and a bytearray extend.
+records come from the reactor and the channels worker threads, a
+lock keeps them whole and in timestamp order.
+
+journaling is on when OUCH_JOURNAL_DIR is set in the environment,
+read journals back with JournalReader.
+"""
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+import atexit
+import logging
+import mmap
+import os
+import struct
+import time
+from threading import Lock
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+
+log = logging.getLogger(__name__)
+
+journal_dir = os.environ.get('OUCH_JOURNAL_DIR')
+
+MAGIC = b'OUCHJRN1'
+file_header = struct.Struct('!8sQQ')
+record_header = struct.Struct('!QBIIH')
+
+INBOUND = 0
+OUTBOUND = 1
+WEBSOCKET = 2
+
+websocket_player = struct.Struct('!I')
+
+
+try:
+    monotonic_ns = time.monotonic_ns
+except AttributeError:
+    # python before 3.7
+    def monotonic_ns():
+        return int(time.monotonic() * 1e9)
+
+
+def as_journal_id(value):
+    # market and subsession ids are digit strings or ints
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def decode_websocket_frame(frame):
+    """ player id and message text of a websocket record """
+    player_id, = websocket_player.unpack_from(frame, 0)
+    return player_id, bytes(frame[websocket_player.size:]).decode('utf-8')
+
+
+JournalRecord = namedtuple('JournalRecord',
+    ('timestamp', 'direction', 'subsession_id', 'market_id', 'frame'))
+
+
+class Journal:
+
+    def __init__(self, path, buffer_size=1 << 16, flush_interval=1.0,
+            clock=monotonic_ns):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.clock = clock
+        self.buffer = bytearray()
+        self.lock = Lock()
+        self.file = open(path, 'ab', buffering=0)
+        if self.file.tell() == 0:
+            self.buffer.extend(file_header.pack(MAGIC, int(time.time() * 1e9),
+                clock()))
+        self.flusher = None
+        if flush_interval:
+            self.flusher = LoopingCall(self.flush)
+            self.flusher.start(flush_interval, now=False)
+
+    def record(self, direction, subsession_id, market_id, frame):
+        header = (direction, as_journal_id(subsession_id),
+            as_journal_id(market_id), len(frame))
+        with self.lock:
+            buffer = self.buffer
+            buffer.extend(record_header.pack(self.clock(), *header))
+            buffer.extend(frame)
+            if len(buffer) >= self.buffer_size:
+                self._write()
+
+    def record_websocket(self, subsession_id, market_id, player_id, text):
+        self.record(WEBSOCKET, subsession_id, market_id,
+            websocket_player.pack(as_journal_id(player_id)) + text.encode('utf-8'))
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        if self.buffer and self.file is not None:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    def close(self):
+        if self.flusher is not None and self.flusher.running:
+            self.flusher.stop()
+        with self.lock:
+            self._write()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+_journal = None
+
+def get_journal():
+    """ journal of this process, None if journaling is off """
+    global _journal
+    if _journal is None and journal_dir:
+        os.makedirs(journal_dir, exist_ok=True)
+        path = os.path.join(journal_dir, 'ouch_{pid}_{time}.journal'.format(
+            pid=os.getpid(), time=time.strftime('%Y%m%d_%H%M%S')))
+        _journal = Journal(path)
+        reactor.addSystemEventTrigger('before', 'shutdown', _journal.close)
+        atexit.register(_journal.close)
+        log.info('journaling exchange traffic to %s' % path)
+    return _journal
+
+
+class JournalReader:
+    """
+    reads a journal through a memory map, only record offsets and
+    timestamps are indexed, frames are copied out as they are read.
+    a record cut short by a crash ends the journal.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.wall_clock, self.opened_at = file_header.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise Exception('%s is not an OUCH journal.' % path)
+        self._offsets = None
+        self._timestamps = None
+
+    def _build_index(self):
+        offsets, timestamps = array('Q'), array('Q')
+        buf, end = self.mmap, len(self.mmap)
+        offset = file_header.size
+        header_size = record_header.size
+        while offset + header_size <= end:
+            timestamp, _, _, _, length = record_header.unpack_from(buf, offset)
+            if offset + header_size + length > end:
+                log.warning('%s: truncated record at %s' % (self.path, offset))
+                break
+            offsets.append(offset)
+            timestamps.append(timestamp)
+            offset += header_size + length
+        self._offsets, self._timestamps = offsets, timestamps
+
+    @property
+    def timestamps(self):
+        if self._timestamps is None:
+            self._build_index()
+        return self._timestamps
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            self._build_index()
+        return self._offsets
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def record_at(self, index):
+        offset = self.offsets[index]
+        timestamp, direction, subsession_id, market_id, length = \
+            record_header.unpack_from(self.mmap, offset)
+        start = offset + record_header.size
+        return JournalRecord(timestamp, direction, subsession_id, market_id,
+            self.mmap[start: start + length])
+
+    def seek(self, timestamp):
+        """ index of the first record at or after timestamp """
+        return bisect_left(self.timestamps, timestamp)
+
+    def records(self, start=None, end=None):
+        """ records with start <= timestamp < end """
+        timestamps = self.timestamps
+        index = self.seek(start) if start is not None else 0
+        while index < len(timestamps):
+            if end is not None and timestamps[index] >= end:
+                return
+            yield self.record_at(index)
+            index += 1
+
+    def __iter__(self):
+        return self.records()
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from hft.replay import Replay
+
+
+class Command(BaseCommand):
+    help = 'replays journaled exchange and websocket traffic through the dispatcher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('journals', nargs='+', 
+            help='journal files, written when OUCH_JOURNAL_DIR is set')
+        parser.add_argument('--speed', type=float, default=1.0,
+            help='1 replays in real time, 10 ten times faster, 0 as fast as possible')
+        parser.add_argument('--subsession-id', type=int, default=None,
+            help='replay into this subsession instead of the recorded one')
+        parser.add_argument('--player-id-offset', type=int, default=0,
+            help='added to recorded player ids and to the player ids in order tokens')
+        parser.add_argument('--market-id-offset', type=int, default=0,
+            help='added to recorded market ids')
+
+    def handle(self, *args, **options):
+        replay = Replay(options['journals'], speed=options['speed'], 
+            subsession_id=options['subsession_id'], 
+            player_id_offset=options['player_id_offset'],
+            market_id_offset=options['market_id_offset'])
+        replay.run()
+        self.stdout.write(replay.report())
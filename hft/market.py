@@ -1,4 +1,6 @@
 from .market_elements.market_role import MarketRoleGroup
+from .market_elements.price_levels import PriceLevelBook
+from .market_elements.market_history import get_market_histories
 from .market_facts import BestBidOffer, ELOExternalFeed, ReferencePrice, SignedVolume
 from .utility import nanoseconds_since_midnight, MIN_BID, MAX_ASK
 import logging
@@ -120,6 +122,9 @@ class ELOMarket(BaseMarket):
         self.reference_price = ReferencePrice(**kwargs)
         self.role_group = MarketRoleGroup('manual', 'automated', 'out')
         self.tax_rate = kwargs.get('tax_rate', 0)
+        self.order_book_depth = (kwargs.get('order_book_depth') or 
+            PriceLevelBook.default_depth)
+        self.auction_format = kwargs.get('auction_format')
         self.clearing_price = None
         self.transacted_volume = None
     
@@ -131,6 +136,11 @@ class ELOMarket(BaseMarket):
         for pid, player in self.players_in_market.items():
             player.refresh_from_db()
             self.role_group.update(nanoseconds_since_midnight(), pid, player.initial_role)
+        # the broadcaster aggregates the book from here on,
+        # clients drop the levels of a previous round
+        self.event.broadcast_msgs('order_book', model=self, 
+            depth=self.order_book_depth, batched=self.auction_format == 'FBA',
+            bids=[], offers=[])
 
     def end_trade(self, *args, **kwargs):
         super().end_trade(*args, **kwargs)
@@ -141,9 +151,17 @@ class ELOMarket(BaseMarket):
         player_id, new_role = kwargs['player_id'], kwargs['state']
         self.role_group.update(nanoseconds_since_midnight(), player_id, new_role)
 
+    def record_history(self):
+        # chart history clients fetch with a 'history' request
+        history = get_market_histories().get(self.market_id)
+        history.record(best_bid=self.bbo.best_bid, best_offer=self.bbo.best_offer,
+            reference_price=self.reference_price.reference_price,
+            signed_volume=self.signed_volume.signed_volume)
+
     def reference_price_change(self, **kwargs):
         self.reference_price.update(**kwargs)
         if self.reference_price.has_changed:
+            self.record_history()
             self.event.broadcast_msgs(
                 'reference_price', market_id=self.market_id, 
                 **self.reference_price.to_kwargs())
@@ -155,6 +173,7 @@ class ELOMarket(BaseMarket):
         kwargs.update(self.bbo.to_kwargs())
         self.signed_volume.update(**kwargs)
         if self.signed_volume.has_changed:
+            self.record_history()
             # maker_ids = self.role_group['automated', 'manual', 'out']
             self.event.internal_event_msgs(
                 'signed_volume_change',
@@ -165,6 +184,7 @@ class ELOMarket(BaseMarket):
     def bbo_change(self, **kwargs):
         self.bbo.update(**kwargs)
         if self.bbo.has_changed:
+            self.record_history()
             # hft_traders = self.role_group['automated', 'manual', 'out']
             self.event.internal_event_msgs(
                 'bbo_change', model=self, **self.bbo.to_kwargs())
@@ -173,6 +193,7 @@ class ELOMarket(BaseMarket):
     def post_batch(self, **kwargs):
         self.bbo.update(**kwargs)
         if self.bbo.has_changed:
+            self.record_history()
             self.event.internal_event_msgs(
                 'post_batch', model=self, **self.bbo.to_kwargs())
             # manually add clearing price and transacted volume to broadcast message
@@ -182,7 +203,7 @@ class ELOMarket(BaseMarket):
             self.transacted_volume = kwargs.get('transacted_volume', None)
             broadcast_fields['transacted_volume'] = self.transacted_volume
             self.event.broadcast_msgs('post_batch', model=self, **broadcast_fields)
-    
+
     def external_feed_change(self, **kwargs):
         self.external_feed.update(**kwargs)
         if self.external_feed.has_changed:
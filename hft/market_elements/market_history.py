@@ -0,0 +1,148 @@
+from array import array
+from collections import OrderedDict
+from threading import Lock
+import math
+import time
+
+
+class HistoryBuffer:
+
+    """
+    the last capacity buckets of resolution seconds, in arrays used as
+    a ring. a bucket holds the last values recorded in it, a bucket
+    nothing was recorded in repeats the one before. fields nothing was
+    recorded for yet are unset, they are None in windows.
+    """
+
+    # field: array type code
+    fields = (('best_bid', 'i'), ('best_offer', 'i'), ('reference_price', 'i'),
+        ('signed_volume', 'f'))
+    # array type code: value of unset fields
+    unset = {'i': -2 ** 31, 'f': math.nan}
+
+    def __init__(self, resolution, capacity):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.columns = {field: array(typecode, [self.unset[typecode]]) * capacity
+            for field, typecode in self.fields}
+        # bucket number (time / resolution) of the newest bucket
+        self.head = None
+        self.size = 0
+
+    def record(self, timestamp, values):
+        bucket = int(timestamp / self.resolution)
+        if self.head is None:
+            self.head = bucket
+            self.size = 1
+        elif bucket > self.head:
+            steps = bucket - self.head
+            if steps >= self.capacity:
+                # nothing of the old buckets is left
+                for field, _ in self.fields:
+                    column = self.columns[field]
+                    last = column[self.head % self.capacity]
+                    for ix in range(self.capacity):
+                        column[ix] = last
+            else:
+                for field, _ in self.fields:
+                    column = self.columns[field]
+                    last = column[self.head % self.capacity]
+                    for step in range(1, steps + 1):
+                        column[(self.head + step) % self.capacity] = last
+            self.head = bucket
+            self.size = min(self.capacity, self.size + steps)
+        elif bucket < self.head:
+            # late, its bucket is history already
+            return
+        slot = bucket % self.capacity
+        for field, typecode in self.fields:
+            value = values.get(field)
+            if value is not None:
+                self.columns[field][slot] = (float(value) if typecode == 'f' 
+                    else int(value))
+
+    def window(self, num_buckets):
+        """ first bucket number and the columns of the last num_buckets buckets """
+        num_buckets = min(num_buckets, self.size)
+        if self.head is None or num_buckets <= 0:
+            return None, {field: [] for field, _ in self.fields}
+        first = self.head - num_buckets + 1
+        slots = [bucket % self.capacity for bucket in range(first, self.head + 1)]
+        columns = {}
+        unset_int = self.unset['i']
+        for field, typecode in self.fields:
+            column = self.columns[field]
+            if typecode == 'f':
+                # single precision noise would only cost bytes
+                columns[field] = [None if math.isnan(column[slot]) else 
+                    round(column[slot], 4) for slot in slots]
+            else:
+                columns[field] = [None if column[slot] == unset_int else 
+                    column[slot] for slot in slots]
+        return first, columns
+
+
+class MarketHistory:
+
+    # (resolution in seconds, buckets kept)
+    default_resolutions = ((0.1, 600), (1, 600))
+
+    def __init__(self, resolutions=default_resolutions):
+        self.buffers = {int(round(resolution * 1000)): HistoryBuffer(resolution,
+            capacity) for resolution, capacity in resolutions}
+
+    def record(self, timestamp=None, **values):
+        if timestamp is None:
+            timestamp = time.time()
+        for history_buffer in self.buffers.values():
+            history_buffer.record(timestamp, values)
+
+    def window(self, resolution_ms, seconds):
+        """
+        columns of the last seconds at the closest resolution kept,
+        times in milliseconds since the epoch
+        """
+        resolution_ms = min(self.buffers, key=lambda kept: abs(kept - resolution_ms))
+        history_buffer = self.buffers[resolution_ms]
+        first, columns = history_buffer.window(int(seconds * 1000 / resolution_ms))
+        columns['resolution'] = resolution_ms
+        columns['start'] = first * resolution_ms if first is not None else None
+        return columns
+
+
+class MarketHistoryStore:
+
+    """
+    histories of the markets whose events this process handled, kept
+    out of the market models so they are not pickled on every event.
+    the oldest market is forgotten once max_markets are kept.
+    """
+
+    max_markets = 64
+
+    def __init__(self):
+        self.histories = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, market_id):
+        """ history of a market, a new one if the market is not kept """
+        market_id = int(market_id)
+        with self.lock:
+            try:
+                self.histories.move_to_end(market_id)
+                return self.histories[market_id]
+            except KeyError:
+                history = self.histories[market_id] = MarketHistory()
+                if len(self.histories) > self.max_markets:
+                    self.histories.popitem(last=False)
+                return history
+
+
+_market_history_store = None
+
+def get_market_histories():
+    """ market history store of this process """
+    global _market_history_store
+    if _market_history_store is None:
+        _market_history_store = MarketHistoryStore()
+    return _market_history_store
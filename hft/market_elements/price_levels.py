@@ -0,0 +1,75 @@
+class PriceLevelBook:
+
+    """
+    resting orders of a market aggregated by price,
+    one count per order at each level of a side.
+    orders are known by token, only orders added here
+    are taken off again, immediate or cancel orders that
+    never rested leave the levels alone when they go.
+    """
+
+    default_depth = 5
+
+    def __init__(self, depth=default_depth, batched=False):
+        self.depth = depth
+        # clients show frequent batch auction books as of the last batch
+        self.batched = batched
+        self.levels = {'B': {}, 'S': {}}
+        # order token: (price, buy sell indicator) of resting orders
+        self.resting = {}
+        self.last_published = None
+
+    def __len__(self):
+        return len(self.resting)
+
+    def __contains__(self, order_token):
+        return order_token in self.resting
+
+    def add(self, order_token, price, buy_sell_indicator):
+        if order_token in self.resting:
+            return False
+        self.resting[order_token] = (price, buy_sell_indicator)
+        side = self.levels[buy_sell_indicator]
+        side[price] = side.get(price, 0) + 1
+        return True
+
+    def remove(self, order_token):
+        """ true if the order was resting """
+        order = self.resting.pop(order_token, None)
+        if order is None:
+            return False
+        price, buy_sell_indicator = order
+        side = self.levels[buy_sell_indicator]
+        volume = side.get(price, 0) - 1
+        if volume > 0:
+            side[price] = volume
+        else:
+            side.pop(price, None)
+        return True
+
+    def replace(self, previous_order_token, replacement_order_token, price):
+        """ the replacement rests in place of a resting order """
+        order = self.resting.get(previous_order_token)
+        if order is None:
+            return False
+        self.remove(previous_order_token)
+        self.add(replacement_order_token, price, order[1])
+        return True
+
+    def top(self, buy_sell_indicator):
+        """ [price, volume] pairs of the best depth levels, best first """
+        side = self.levels[buy_sell_indicator]
+        prices = sorted(side, reverse=buy_sell_indicator == 'B')[:self.depth]
+        return [[price, side[price]] for price in prices]
+
+    def to_kwargs(self):
+        return {'depth': self.depth, 'batched': self.batched,
+            'bids': self.top('B'), 'offers': self.top('S')}
+
+    def snapshot(self):
+        """ top levels of both sides, None if unchanged since the last one """
+        bids, offers = self.top('B'), self.top('S')
+        if (bids, offers) == self.last_published:
+            return None
+        self.last_published = (bids, offers)
+        return bids, offers
@@ -27,13 +27,14 @@ elo = market_environment(
         'player': {
             'initial_endowment': 'cash',
             'speed_unit_cost': 'speed_unit_cost',
-            'default_role': 'default_role'
+            'default_role': 'default_role',
+            'exchange_extensions': 'exchange_extensions'
         }
     },
     checkpoint={
         'trader': {
             'events_to_capture': ('speed_change', 'role_change', 'slider', 
-                'market_start', 'market_end', 'A', 'U', 'C', 'E'),
+                'market_start', 'market_end', 'A', 'U', 'C', 'E', 'Y', 'W'),
             'properties_to_serialize': (
                 'subsession_id', 'market_id', 'id_in_market', 'player_id', 'delay', 
                 'staged_bid', 'staged_offer', 'net_worth', 'cash', 'cost', 'tax_paid',
@@ -0,0 +1,68 @@
+"""
+consolidated state of a market for one player, sent as a 'snapshot'
+message when the player's browser connects or reports a gap in the
+market's frame sequence numbers. built from the market and trader
+models in the cache, the messages are the broadcasts that built the
+state in the first place.
+
+charts fetch the market's bbo, reference price and signed volume
+history with a 'history' request, see MarketHistory. the history is
+what this process recorded, it is not part of the market model.
+"""
+from django.core.cache import cache
+from .broadcast_message import ELOBroadcastMessageFactory
+from .cache import get_cache_key
+from .market_elements.market_history import get_market_histories
+import logging
+
+log = logging.getLogger(__name__)
+
+market_state_facts = ('bbo', 'signed_volume', 'reference_price', 'external_feed')
+
+
+def read_model(model_name, model_id, subsession_id):
+    return cache.get(get_cache_key('from_kws', model_name=model_name,
+        model_id=model_id, subsession_id=subsession_id))
+
+
+def market_state_messages(market):
+    messages = []
+    for fact_name in market_state_facts:
+        fact_kwargs = getattr(market, fact_name).to_kwargs()
+        # facts nothing set yet
+        if None in fact_kwargs.values():
+            continue
+        messages.append(ELOBroadcastMessageFactory.get_message(fact_name,
+            model=market, **fact_kwargs).data)
+    return messages
+
+
+def live_order_messages(trader):
+    return [ELOBroadcastMessageFactory.get_message('confirmed', model=trader,
+        order_token=order['order_token'], price=order['price'],
+        buy_sell_indicator=order['buy_sell_indicator'],
+        time_in_force=order.get('time_in_force', 99999)).data
+        for order in trader.orderstore.orders_with_status(b'active')]
+
+
+def build_snapshot(market_id, subsession_id, player_id):
+    """ the snapshot message without its sequence number, None without models """
+    market = read_model('market', market_id, subsession_id)
+    trader = read_model('trader', player_id, subsession_id)
+    if market is None or trader is None:
+        log.warning('no models for a snapshot of market %s for player %s' % (
+            market_id, player_id))
+        return None
+    return {'type': 'snapshot', 'market_id': int(market_id),
+        'inventory': trader.inventory.position, 'cash': trader.cash,
+        'batch': market_state_messages(market) + live_order_messages(trader)}
+
+
+def build_history(market_id, subsession_id, resolution_ms, seconds):
+    """ a 'history' message with a chart window of the market, None without it """
+    market = read_model('market', market_id, subsession_id)
+    if market is None:
+        return None
+    history = get_market_histories().get(market_id).window(resolution_ms, seconds)
+    history.update({'type': 'history', 'market_id': int(market_id)})
+    return history
@@ -0,0 +1,143 @@
+"""
+per message cost of building outbound messages, the constructors
+and validators compiled for each message class against the generic
+ones on OutboundMessage and BroadcastWSMessage.
+
+also the cost of taking in an order accepted frame, decoded eagerly
+into a dict whose kwargs a handler unpacks as before, against the lazy
+message a handler reads only the fields it uses from.
+
+    python -m hft.message_benchmark --messages 200000
+"""
+import argparse
+import time
+from types import SimpleNamespace
+from .broadcast_message import ELOBroadcastMessageFactory
+from .event import ELOEvent
+from .exchange_message import OutboundExchangeMessageFactory
+from .incoming_message import ELOIncomingOuchMessage
+from .internal_event_message import ELOInternalEventMessageFactory
+from .ouch_extensions import (
+    ExtendedMessages, ExtensionMessageSpec, server_messages, server_layouts)
+from .outbound_message_primitives import OutboundMessage, BroadcastWSMessage
+from .translator import LeepsOuchTranslator
+
+model = SimpleNamespace(market_id=1, player_id=2, subsession_id=3,
+    exchange_host='127.0.0.1', exchange_port=9001, delay=0.1, firm='AAAA')
+
+bbo = {'best_bid': 990000, 'best_offer': 1010000, 'volume_at_best_bid': 2,
+    'volume_at_best_offer': 1, 'next_bid': 980000, 'next_offer': 1020000}
+
+cases = (
+    (ELOBroadcastMessageFactory, 'bbo', bbo),
+    (ELOBroadcastMessageFactory, 'executed', {'order_token': 'AAAAB00010000A',
+        'price': 1000000, 'buy_sell_indicator': 'B', 'inventory': 1,
+        'execution_price': 1000000}),
+    (ELOInternalEventMessageFactory, 'bbo_change', bbo),
+    (OutboundExchangeMessageFactory, 'enter', {'order_token': 'AAAAB00010000A',
+        'buy_sell_indicator': 'B', 'price': 1000000, 'time_in_force': 99999,
+        'shares': 1, 'stock': 'AMAZGOOG', 'midpoint_peg': False}),
+)
+
+# order accepted of the exchange server as an extension, so the
+# benchmark runs without one
+accepted = ExtensionMessageSpec('Accepted', b'A', server_layouts[b'A'])
+accepted_messages = ExtendedMessages(server_messages, accepted)
+accepted_frame = bytes(accepted(timestamp=1, order_token=b'AAAAB00010000A',
+    buy_sell_indicator=b'B', shares=1, stock=b'AMAZGOOG', price=1000000,
+    time_in_force=99999, firm=b'AAAA', display=b'Y', order_reference_number=1,
+    capacity=b'P', intermarket_sweep_eligibility=b'N', minimum_quantity=0,
+    cross_type=b'N', order_state=b'L', bbo_weight_indicator=b' ', 
+    midpoint_peg=False))
+
+
+class EagerOuchMessage(ELOIncomingOuchMessage):
+    """ translates the whole frame up front, as before the lazy message """
+
+    def translate(self, message, message_cls=None):
+        return LeepsOuchTranslator.decode(message, message_cls)
+
+
+def handler(**kwargs):
+    return kwargs['order_token'], kwargs['price']
+
+
+def read_unpacked(event):
+    # kwargs as to_kwargs built them before, unpacked into a handler
+    kwargs = event.message.data
+    kwargs['event_source'] = event.event_source
+    kwargs['reference_no'] = event.reference_no
+    # Trader.order_accepted unpacked them into the orderstore and the broadcast
+    handler(**kwargs)
+    return handler(**kwargs)
+
+
+def read_fields(event):
+    # the fields Trader.order_accepted reads
+    data = event.message.data
+    return (data['order_token'], data['time_in_force'], data['timestamp'],
+        data['price'], data['buy_sell_indicator'], data['midpoint_peg'])
+
+
+def read_routing(event):
+    # a frame no handler reads the body of
+    return event.player_id
+
+
+def time_inbound(message_cls, read, num_messages):
+    start = time.perf_counter()
+    for _ in range(num_messages):
+        message = message_cls(accepted_frame, subsession_id=1, market_id=1,
+            message_cls=accepted_messages)
+        event = ELOEvent.acquire('exchange', message)
+        read(event)
+        event.release()
+    return (time.perf_counter() - start) / num_messages
+
+
+def generic(message_cls):
+    """ the message class with the generic create and clean """
+    namespace = {'create': OutboundMessage.__dict__['create']}
+    if issubclass(message_cls, BroadcastWSMessage):
+        namespace['clean'] = BroadcastWSMessage.__dict__['clean']
+    return type('Generic' + message_cls.__name__, (message_cls, ), namespace)
+
+
+def time_create(message_cls, message_type, kwargs, num_messages):
+    create = message_cls.create
+    start = time.perf_counter()
+    for _ in range(num_messages):
+        create(message_type, model=model, **kwargs)
+    return (time.perf_counter() - start) / num_messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=200000)
+    args = parser.parse_args()
+
+    for factory, message_type, kwargs in cases:
+        message_cls = factory.message_types[message_type]
+        compiled = message_cls.create(message_type, model=model, **kwargs)
+        before = generic(message_cls).create(message_type, model=model, **kwargs)
+        if compiled.data != before.data:
+            raise Exception('%s: compiled create built %s, generic %s' % (
+                message_type, compiled.data, before.data))
+        generic_cost = time_create(generic(message_cls), message_type, kwargs,
+            args.messages)
+        compiled_cost = time_create(message_cls, message_type, kwargs,
+            args.messages)
+        print('%-12s generic %6.2f us  compiled %6.2f us  %.1fx' % (
+            message_type, generic_cost * 1e6, compiled_cost * 1e6,
+            generic_cost / compiled_cost))
+
+    for case, eager_read, lazy_read in (('accepted', read_unpacked, read_fields),
+            ('routing', read_routing, read_routing)):
+        eager_cost = time_inbound(EagerOuchMessage, eager_read, args.messages)
+        lazy_cost = time_inbound(ELOIncomingOuchMessage, lazy_read, args.messages)
+        print('%-12s eager   %6.2f us  lazy     %6.2f us  %.1fx' % (
+            case, eager_cost * 1e6, lazy_cost * 1e6, eager_cost / lazy_cost))
+
+
+if __name__ == '__main__':
+    main()
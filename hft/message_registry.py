@@ -17,6 +17,9 @@ class MessageRegistry:
     def __str__(self):
         return '\n'.join(str(m) for m in self.outgoing_messages)
 
+    def clear(self):
+        self.outgoing_messages.clear()
+
     def pop(self):
         if len(self.outgoing_messages):
             return self.outgoing_messages.popleft()
\ No newline at end of file
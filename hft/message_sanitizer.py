@@ -1,6 +1,7 @@
 
 from .cache import get_market_id_table
 from .equations import price_grid
+from .orderstore import player_id_from_token
 
 class MessageSanitizer:
     
@@ -41,17 +42,24 @@ class ELOWSMessageSanitizer(MessageSanitizer):
 
 class ELOOuchMessageSanitizer(MessageSanitizer):
 
+    # first one with a token in it names the trader,
+    # a quote ack may have a blank side
+    token_fields = ('order_token', 'replacement_order_token', 'replacement_bid_token',
+        'replacement_offer_token')
+
     @classmethod
     def sanitize(cls, message, **kwargs):
+        clean_message = message
         if 'player_id' not in message:
-            clean_message = message
-            token = clean_message.get('order_token')
-            if token is None:
-                token = clean_message.get('replacement_order_token')
+            token = None
+            for field in cls.token_fields:
+                token = clean_message.get(field)
+                if token is not None and token.strip():
+                    break
             event_type = message['type']
             player_id = None
             if event_type not in ('S', 'Q', 'Z', 'L'):
-                player_id = int(token[5:9])
+                player_id = player_id_from_token(token)
                 clean_message['firm'] = token[0:4].lower()
             # hack: need to set player id for peg state messages so they can be added to trader id
             # just use investor id and firm
@@ -10,14 +10,16 @@ from otree.api import (
 from otree.models import Session
 
 from django.core.cache import cache
-import copy
 from otree.common_internal import random_chars_8
 from . import utility
 from .trader import TraderFactory
 from .trade_session import TradeSessionFactory
 from .market import MarketFactory
-from .cache import initialize_model_cache, set_market_id_table, get_market_id_table
+from .cache import (
+    initialize_model_cache, set_market_id_table, get_market_id_table, 
+    reserve_exchange_port)
 from .exogenous_event import ExogenousEventModelFactory
+from .player_routes import get_player_routes
 from . import market_environments
 from django.utils import timezone
 
@@ -61,16 +63,29 @@ class Subsession(BaseSubsession):
         trade_session = create_trade_session(session_format)
         self.auction_format = session_configs['auction_format']
         exchange_host = session_configs['matching_engine_host']
-        all_exchange_ports = copy.deepcopy(utility.available_exchange_ports)
+        markets_per_exchange_port = session_configs.get('markets_per_exchange_port') or 1
+        # rounds are played one after another, so all rounds in a session
+        # reserve the same exchange ports, one per group slot, which the
+        # last round the session plays releases when its trading stops.
+        num_rounds = self.session.config.get('num_rounds') or Constants.num_rounds
+        port_owner = self.session.code
+        if self.round_number == num_rounds:
+            trade_session.exchange_port_owners = [port_owner]
         market_id_map = {}
+        player_routes = {}
         for group in self.get_groups():
             group_id = group.id
-            exchange_port = all_exchange_ports[self.auction_format].pop()
+            exchange_port, exchange_market_tag = reserve_exchange_port(
+                self.auction_format, port_owner, group.id_in_subsession,
+                utility.available_exchange_ports[self.auction_format], 
+                markets_per_port=markets_per_exchange_port)
             market = trade_session.create_market(
-                group_id, exchange_host, exchange_port, **session_configs)                                 
+                group_id, exchange_host, exchange_port, 
+                exchange_market_tag=exchange_market_tag, **session_configs)
             for player in group.get_players():
                 market.register_player(player)
                 player.configure_for_trade_session(market, session_format)
+                player_routes[player.id] = (market.market_id, market.subsession_id)
                 trader = TraderFactory.get_trader(session_format, player)
                 initialize_model_cache(trader)
             initialize_model_cache(market)
@@ -81,6 +96,7 @@ class Subsession(BaseSubsession):
                 if exogenous_event_manager_model:
                     initialize_model_cache(exogenous_event_manager_model)
         set_market_id_table(trade_session.subsession_id, market_id_map)
+        get_player_routes().add_many(player_routes)
         self.configure_for_trade_session(session_format)
         initialize_model_cache(trade_session)
         self.save()
@@ -133,6 +149,8 @@ class Player(BasePlayer):
     market_id = models.CharField()
     id_in_market = models.IntegerField()
     speed_unit_cost = models.IntegerField()
+    # exchange understands the messages in hft.ouch_extensions
+    exchange_extensions = models.BooleanField()
     net_worth = models.IntegerField()
     cash = models.IntegerField()
     cost = models.IntegerField()
@@ -1,20 +1,50 @@
+from bisect import bisect_left, insort
 import logging
 import time
 import itertools
+from .ouch_extensions import MASS_CANCEL_BOTH_SIDES
 
 log = logging.getLogger(__name__)
 
+# order tokens are 14 characters: firm (4), side (1),
+# player id (4) and order counter (5), numbers are in base 36
+# which leaves room for 1.6M players and 60M orders per player
+token_digits = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+player_segment = slice(5, 9)
+player_segment_width = 4
+counter_width = 5
+
+
+def to_token_base(number: int, width: int):
+    digits = []
+    for _ in range(width):
+        number, digit = divmod(number, 36)
+        digits.append(token_digits[digit])
+    if number:
+        raise Exception('%s does not fit in %s token digits.' % (number, width))
+    return ''.join(reversed(digits))
+
+
+def player_id_from_token(token: str):
+    return int(token[player_segment], 36)
+
 
 class OrderStore:
     # single stock orderstore
     # expects keys as in OUCH
-    token_format = '{self.firm}{buy_sell_indicator}{self.player_id:04d}{count:05d}'
+    token_format = '{self.firm}{buy_sell_indicator}{self.player_segment}{count}'
+    counter_limit = 36 ** counter_width
     confirm_message_dispatch ={
         'enter': '_confirm_enter',
         'replaced': '_confirm_replace',
         'canceled': '_confirm_cancel',
-        'executed': '_confirm_execution'
+        'executed': '_confirm_execution',
+        'mass_canceled': '_confirm_mass_cancel',
     }
+    # orders that are or will be on the book
+    live_statuses = (b'active', b'pending')
+    # confirmed orders, their prices make the trader's spread
+    priced_statuses = frozenset((b'active', b'ioc'))
 
     def __init__(self, player_id: int, in_group_id=None, firm=None, default_shares=1,
             ticker=b'AMAZGOOG', default_inventory=0, **kwargs):
@@ -23,17 +53,46 @@ class OrderStore:
         self.ticker = ticker
         self.order_counter = itertools.count(1,1)
         self.player_id = player_id
+        self.player_segment = to_token_base(player_id, player_segment_width)
         self.default_shares = default_shares
         self.firm = firm or chr(in_group_id + 64) * 4
         self._orders = {}
+        # (status, buy sell indicator): token: order info
+        self._status_index = {}
+        # buy sell indicator: prices of its confirmed orders, ascending
+        self._prices = {'B': [], 'S': []}
         self.inventory = default_inventory
-        self.bid = None
-        self.offer = None
 
     @property
     def orders(self):
         return self._orders
 
+    @property
+    def bid(self):
+        prices = self._prices['B']
+        return prices[-1] if prices else None
+
+    @property
+    def offer(self):
+        prices = self._prices['S']
+        return prices[0] if prices else None
+
+    def _index(self, order_info):
+        status, direction = order_info['status'], order_info['buy_sell_indicator']
+        try:
+            orders = self._status_index[status, direction]
+        except KeyError:
+            orders = self._status_index[status, direction] = {}
+        orders[order_info['order_token']] = order_info
+        if status in self.priced_statuses:
+            self.update_spread(order_info['price'], direction)
+
+    def _unindex(self, order_info):
+        status, direction = order_info['status'], order_info['buy_sell_indicator']
+        self._status_index[status, direction].pop(order_info['order_token'], None)
+        if status in self.priced_statuses:
+            self.update_spread(order_info['price'], direction, clear=True)
+
     def enter(self, **kwargs):
         kwargs['created_at'] = time.time()
         kwargs['status'] = b'pending'
@@ -44,12 +103,15 @@ class OrderStore:
         token = self.tokengen(**kwargs)
         kwargs['order_token'] = token 
         self._orders[token] = kwargs
+        self._index(kwargs)
         log.debug('trader %s: register enter: token: %s, price: %s.' % (
             self.player_id, token, kwargs['price']))
         return kwargs
     
     def tokengen(self, **kwargs):
-        count = next(self.order_counter)
+        # wraps around after 60M orders
+        count = to_token_base(next(self.order_counter) % self.counter_limit,
+            counter_width)
         return self.token_format.format(self=self, count=count, **kwargs)
 
     def __getitem__(self, token):
@@ -57,9 +119,9 @@ class OrderStore:
         return order_info
 
     def __str__(self):
-        active_orders = '\n'.join(str(v) for v in self._orders.values() if v['status'] == b'active')
-        pending_orders = '\n'.join(str(v) for v in self._orders.values() if v['status'] == b'pending')
-        ioc = '\n'.join(str(v) for v in self._orders.values() if v['status'] == b'ioc')       
+        active_orders = '\n'.join(str(v) for v in self.orders_with_status(b'active'))
+        pending_orders = '\n'.join(str(v) for v in self.orders_with_status(b'pending'))
+        ioc = '\n'.join(str(v) for v in self.orders_with_status(b'ioc'))
         out = """Player {self.player_id} Orders:
                 Active:
 {active_orders}
@@ -76,14 +138,20 @@ Spread: {self.bid} - {self.offer}
             pending_orders, ioc_orders=ioc)
         return out
 
+    def orders_with_status(self, status, direction=None):
+        directions = ('B', 'S') if direction is None else (direction, )
+        out = []
+        for direction in directions:
+            orders = self._status_index.get((status, direction))
+            if orders:
+                out.extend(orders.values())
+        return out
+
     def all_orders(self, direction=None):
-        out = [o for o in self._orders.values() if o['status'] 
-            in (b'active', b'pending')]
-        if direction is None:
-            return out
-        else:
-            out = list(filter(lambda x: x['buy_sell_indicator'] == direction, out))
-            return out
+        out = []
+        for status in self.live_statuses:
+            out.extend(self.orders_with_status(status, direction))
+        return out
 
     def register_replace(self, token, new_price):
         try:
@@ -104,6 +172,15 @@ Spread: {self.bid} - {self.offer}
             self.player_id, existing_token, replacement_token, new_price))
         return order_info
     
+    def register_mass_cancel(self, buy_sell_indicator=MASS_CANCEL_BOTH_SIDES):
+        # orders entered after this are not covered
+        token = self.tokengen(buy_sell_indicator=buy_sell_indicator)
+        for order_info in self.all_orders(None if buy_sell_indicator == 
+                MASS_CANCEL_BOTH_SIDES else buy_sell_indicator):
+            order_info['mass_cancel_token'] = token
+        log.debug('trader %s: register mass cancel %s.' % (self.player_id, token))
+        return {'order_token': token, 'buy_sell_indicator': buy_sell_indicator}
+
     def confirm(self, event_type, **kwargs):
         handler_name = self.confirm_message_dispatch[event_type]
         handler = getattr(self, handler_name)
@@ -122,6 +199,7 @@ Spread: {self.bid} - {self.offer}
     def _confirm_enter(self, **kwargs):
         token = kwargs['order_token']
         order_info = self._orders[token]
+        self._unindex(order_info)
         time_in_force = kwargs['time_in_force']
         if time_in_force != 0:
             order_info['status'] = b'active'
@@ -133,29 +211,25 @@ Spread: {self.bid} - {self.offer}
             order_info['created_at'], 4)
         order_info['travel_time'] = travel_time
         self._orders[token] = order_info
-        price = order_info['price']
-        direction = order_info['buy_sell_indicator']
+        self._index(order_info)
         log.debug('trader %s: confirm enter: token %s.' % (self.player_id, token))
         log.debug('order %s travel time %s' % (token, travel_time))
-        self.update_spread(price, direction)
         return order_info    
 
     def _confirm_replace(self, **kwargs):
         existing_token = kwargs['previous_order_token']
         replacement_token = kwargs['replacement_order_token']
         order_info = self._orders.pop(existing_token)
+        self._unindex(order_info)
         order_info['order_token'] = replacement_token
         new_price = kwargs['price']
         old_price = int(order_info['price'])
-        direction = order_info['buy_sell_indicator']
-        self.update_spread(old_price, direction, clear=True)
-        self.update_spread(new_price, direction)
-        
         if order_info['replacement_order_token'] == replacement_token:
             del order_info['replacement_order_token']
             del order_info['replace_price']
         order_info['price'] = new_price
         self._orders[replacement_token] = order_info
+        self._index(order_info)
         order_info['old_price'] = old_price
         log.debug('trader %s: confirm replace: token %s --> %s.' % (self.player_id, 
             existing_token, replacement_token))
@@ -164,31 +238,43 @@ Spread: {self.bid} - {self.offer}
     def _confirm_cancel(self, **kwargs):
         token = kwargs['order_token']
         order_info = self._orders.pop(token)
-        direction = order_info['buy_sell_indicator']
-        price = order_info['price']
-        self.update_spread(price, direction, clear=True)   
+        self._unindex(order_info)
         log.debug('trader %s: confirm cancel: token %s.' % (self.player_id, token))
         return order_info
     
+    def _confirm_mass_cancel(self, **kwargs):
+        token = kwargs['order_token']
+        canceled_tokens = [k for k, v in self._orders.items() if 
+            v.get('mass_cancel_token') == token]
+        canceled_orders = [self._orders.pop(k) for k in canceled_tokens]
+        for order_info in canceled_orders:
+            self._unindex(order_info)
+        if len(canceled_orders) != kwargs.get('canceled_orders', len(canceled_orders)):
+            log.warning('trader %s: mass cancel %s: exchange canceled %s orders, \
+%s were registered.' % (self.player_id, token, kwargs['canceled_orders'], 
+                len(canceled_orders)))
+        log.debug('trader %s: confirm mass cancel: token %s, %s orders.' % (
+            self.player_id, token, len(canceled_orders)))
+        return canceled_orders
+
     def _confirm_execution(self, **kwargs):
         token = kwargs['order_token']
         order_info = self._orders.pop(token)
+        self._unindex(order_info)
         direction = order_info['buy_sell_indicator']
         shares = kwargs['executed_shares']
         self.inventory += shares if direction == 'B' else - shares
-        price = order_info['price']
         log.debug('trader %s: confirm execution: token %s.' % (self.player_id, token))
-        self.update_spread(price, direction, clear=True)            
         return order_info
 
     def update_spread(self, price, direction, clear=False):
-        if direction == 'B':
-            if clear is True and price == self.bid:
-                self.bid = None
-            elif price is not None and (self.bid is None or price > self.bid):
-                self.bid = price
-        elif direction == 'S':
-            if clear is True and price == self.offer:
-                self.offer = None
-            elif price is not None and (self.offer is None or price < self.offer):
-                self.offer = price   
\ No newline at end of file
+        """ adds a confirmed order's price to its side, or takes it off """
+        if price is None or direction not in self._prices:
+            return
+        prices = self._prices[direction]
+        if clear is True:
+            ix = bisect_left(prices, price)
+            if ix < len(prices) and prices[ix] == price:
+                del prices[ix]
+        else:
+            insort(prices, price)
@@ -0,0 +1,180 @@
+"""
+OUCH message types of this application that are not in the
+exchange server's ouch_messages. the specs mimic the interface
+of the ouch_messages specs the translator and the local exchange use
+(lookup_by_header_bytes, payload_size, PayloadCls.__slots__,
+from_bytes, calling the spec with field kwargs, bytes(message)),
+so extension messages go through the same code paths.
+"""
+import struct
+from exchange_server.OuchServer.ouch_messages import (
+    OuchClientMessages, OuchServerMessages)
+
+# side of a mass cancel token that cancels both sides
+MASS_CANCEL_BOTH_SIDES = 'X'
+# token of a quote side that was not replaced
+NO_TOKEN = ' ' * 14
+
+
+def field_structs(fields):
+    """ field: (payload offset, struct of the field) of a payload layout """
+    structs, offset = {}, 0
+    for name, fmt in fields:
+        field_struct = struct.Struct('!' + fmt)
+        structs[name] = (offset, field_struct)
+        offset += field_struct.size
+    return structs
+
+
+class ExtensionMessage:
+
+    __slots__ = ('spec', 'values')
+
+    def __init__(self, spec, values):
+        self.spec = spec
+        self.values = values
+
+    def iteritems(self):
+        return zip(self.spec.PayloadCls.__slots__, self.values)
+
+    def __getattr__(self, name):
+        try:
+            return self.values[self.spec.PayloadCls.__slots__.index(name)]
+        except ValueError:
+            raise AttributeError(name)
+
+    def __bytes__(self):
+        return self.spec.header + self.spec.payload_struct.pack(*self.values)
+
+
+class ExtensionMessageSpec:
+
+    def __init__(self, name, header: bytes, fields):
+        self.name = name
+        self.header = header
+        self.fields = fields
+        self.payload_struct = struct.Struct('!' + ''.join(fmt for _, fmt in fields))
+        self.payload_size = self.payload_struct.size
+        self.PayloadCls = type(name + 'Payload', (), {
+            '__slots__': tuple(field for field, _ in fields)})
+
+    def __call__(self, **kwargs):
+        # like ouch_messages specs, unrelated kwargs are ignored
+        return ExtensionMessage(self, tuple(kwargs[field] for field in
+            self.PayloadCls.__slots__))
+
+    def offset_of(self, field_name):
+        """ payload offset of a field """
+        formats = []
+        for name, fmt in self.fields:
+            if name == field_name:
+                return struct.calcsize('!' + ''.join(formats))
+            formats.append(fmt)
+        raise KeyError(field_name)
+
+    def from_bytes(self, payload, header=True):
+        if header:
+            payload = payload[1:]
+        return ExtensionMessage(self, self.payload_struct.unpack_from(payload))
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.name)
+
+
+class ExtendedMessages:
+    """ looks up extension headers first, then the exchange server's messages """
+
+    def __init__(self, base_messages, *extension_specs):
+        self.base_messages = base_messages
+        self.extensions = {spec.header: spec for spec in extension_specs}
+        for spec in extension_specs:
+            setattr(self, spec.name, spec)
+
+    def lookup_by_header_bytes(self, header):
+        spec = self.extensions.get(bytes(header))
+        if spec is not None:
+            return spec
+        return self.base_messages.lookup_by_header_bytes(header)
+
+    def __getattr__(self, name):
+        return getattr(self.base_messages, name)
+
+
+# headers are picked among the ones OUCH 4.2 leaves unused.
+# cancels every resting order of a trader, the order token
+# identifies the trader as in OrderStore.token_format,
+# its side is B, S or MASS_CANCEL_BOTH_SIDES.
+MassCancel = ExtensionMessageSpec('MassCancel', b'Y', (
+    ('order_token', '14s'),
+))
+
+# acknowledges a mass cancel with the number
+# of orders and shares it took off the book
+MassCanceled = ExtensionMessageSpec('MassCanceled', b'Y', (
+    ('timestamp', 'Q'),
+    ('order_token', '14s'),
+    ('canceled_orders', 'I'),
+    ('canceled_shares', 'I'),
+))
+
+# payload layouts of the exchange server's order messages, OUCH 4.2
+# with the server's timestamp and midpoint peg flag. its specs do not
+# expose them, they are for reading single fields off a frame and
+# are checked against the specs' fields and sizes before use.
+server_layouts = {
+    b'A': (
+        ('timestamp', 'Q'), ('order_token', '14s'), ('buy_sell_indicator', 'c'),
+        ('shares', 'I'), ('stock', '8s'), ('price', 'I'), ('time_in_force', 'I'),
+        ('firm', '4s'), ('display', 'c'), ('order_reference_number', 'Q'),
+        ('capacity', 'c'), ('intermarket_sweep_eligibility', 'c'),
+        ('minimum_quantity', 'I'), ('cross_type', 'c'), ('order_state', 'c'),
+        ('bbo_weight_indicator', 'c'), ('midpoint_peg', '?'),
+    ),
+    b'U': (
+        ('timestamp', 'Q'), ('replacement_order_token', '14s'),
+        ('buy_sell_indicator', 'c'), ('shares', 'I'), ('stock', '8s'),
+        ('price', 'I'), ('time_in_force', 'I'), ('firm', '4s'), ('display', 'c'),
+        ('order_reference_number', 'Q'), ('capacity', 'c'),
+        ('intermarket_sweep_eligibility', 'c'), ('minimum_quantity', 'I'),
+        ('cross_type', 'c'), ('order_state', 'c'), ('previous_order_token', '14s'),
+        ('bbo_weight_indicator', 'c'), ('midpoint_peg', '?'),
+    ),
+    b'C': (
+        ('timestamp', 'Q'), ('order_token', '14s'), ('decrement_shares', 'I'),
+        ('reason', 'c'), ('midpoint_peg', '?'),
+    ),
+    b'E': (
+        ('timestamp', 'Q'), ('order_token', '14s'), ('executed_shares', 'I'),
+        ('execution_price', 'I'), ('liquidity_flag', 'c'), ('match_number', 'Q'),
+        ('midpoint_peg', '?'),
+    ),
+}
+
+# replaces a trader's bid and offer at once,
+# the exchange applies both before it updates the BBO
+TwoSidedQuote = ExtensionMessageSpec('TwoSidedQuote', b'W', (
+    ('existing_bid_token', '14s'),
+    ('replacement_bid_token', '14s'),
+    ('bid_price', 'I'),
+    ('existing_offer_token', '14s'),
+    ('replacement_offer_token', '14s'),
+    ('offer_price', 'I'),
+    ('shares', 'I'),
+    ('time_in_force', 'I'),
+))
+
+# acknowledges both replaces of a quote, a side whose
+# order was already gone has NO_TOKEN as its tokens
+QuoteReplaced = ExtensionMessageSpec('QuoteReplaced', b'W', (
+    ('timestamp', 'Q'),
+    ('previous_bid_token', '14s'),
+    ('replacement_bid_token', '14s'),
+    ('bid_price', 'I'),
+    ('previous_offer_token', '14s'),
+    ('replacement_offer_token', '14s'),
+    ('offer_price', 'I'),
+    ('shares', 'I'),
+))
+
+client_messages = ExtendedMessages(OuchClientMessages, MassCancel, TwoSidedQuote)
+server_messages = ExtendedMessages(OuchServerMessages, MassCanceled, QuoteReplaced)
@@ -5,6 +5,40 @@ from .translator import LeepsOuchTranslator
 
 log = logging.getLogger(__name__)
 
+
+def compile_function(name, source, namespace):
+    """ defines a function from generated source, as namedtuple does """
+    namespace = dict(namespace)
+    exec(source, namespace)
+    return namespace[name]
+
+
+def from_model(cls, model, key, kwargs):
+    if model:
+        try:
+            return getattr(model, key)
+        except AttributeError:
+            pass
+    raise Exception('key %s is not in message %s cls: %s' % (
+        key, kwargs, cls.__name__))
+
+
+create_template = """
+def create(cls, message_type, model=None, **kwargs):
+    message_data = {{
+{fields}
+        {type_field_name!r}: str(message_type)}}
+    try:
+        message_data = cls.clean(message_data)
+    except Exception as e:
+        log.exception('invalid message %s: %s' % (message_data, e))
+    return cls(message_data)
+"""
+
+create_field_template = """        {key!r}: kwargs[{key!r}] if {key!r} in kwargs else from_model(
+            cls, model, {key!r}, kwargs),"""
+
+
 class OutboundMessage:
 
     required_fields = ()
@@ -15,8 +49,13 @@ class OutboundMessage:
         self.reference_no = next(self.message_count)    
         self.data = message_data  
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.compile_methods()
+
     @classmethod
     def create(cls, message_type, model=None, **kwargs):
+        # generic version, subclasses get one compiled for their fields
         message_data = {}
         for key in cls.required_fields:
             if key in kwargs:
@@ -33,6 +72,22 @@ class OutboundMessage:
         except Exception as e:
             log.exception('invalid message %s: %s' % (message_data, e))
         return cls(message_data)
+
+    @classmethod
+    def compile_methods(cls):
+        """
+        generates a create for the required fields of the class, values
+        come from kwargs first, then from the model. classes that 
+        define their own create keep it.
+        """
+        if 'create' in cls.__dict__:
+            return
+        source = create_template.format(
+            type_field_name=cls.type_field_name,
+            fields='\n'.join(create_field_template.format(key=key) for key in 
+                cls.required_fields))
+        cls.create = classmethod(compile_function('create', source, 
+            {'from_model': from_model, 'log': log}))
     
     def __str__(self):
         class_name = '%s:  ' % self.__class__.__name__ 
@@ -52,12 +107,23 @@ class OutboundMessage:
         return message_data
 
 
+clean_template = """
+def clean(cls, message_data):
+    clean_message = dict(message_data)
+{fields}
+    return clean_message
+"""
+
+clean_field_template = """    clean_message[{key!r}] = field_type_{ix}(message_data[{key!r}])"""
+
+
 class BroadcastWSMessage(OutboundMessage):
 
     required_field_types = ()
 
     @classmethod
     def clean(cls, message_data):
+        # generic version, subclasses get one compiled for their fields
         clean_message = dict(message_data)
         if len(cls.required_fields) != len(cls.required_field_types):
             raise Exception('required fields length %d, required field types length: %d'
@@ -67,6 +133,26 @@ class BroadcastWSMessage(OutboundMessage):
             clean_value = fieldtype(message_data[key])
             clean_message[key] = clean_value
         return clean_message
+
+    @classmethod
+    def compile_methods(cls):
+        """ 
+        also generates a clean that casts each field to its type,
+        field and type counts are checked once here
+        """
+        super().compile_methods()
+        if 'clean' in cls.__dict__:
+            return
+        if len(cls.required_fields) != len(cls.required_field_types):
+            raise Exception('%s: required fields length %d, required field types '
+                'length: %d' % (cls.__name__, len(cls.required_fields),
+                len(cls.required_field_types)))
+        source = clean_template.format(fields='\n'.join(
+            clean_field_template.format(key=key, ix=ix) for ix, key in 
+                enumerate(cls.required_fields)) or '    pass')
+        namespace = {'field_type_%d' % ix: fieldtype for ix, fieldtype in 
+            enumerate(cls.required_field_types)}
+        cls.clean = classmethod(compile_function('clean', source, namespace))
     
     def to_json(self): 
         return json.dumps(self.data)
@@ -0,0 +1,103 @@
+"""
+player id: (market id, subsession id, reply channel name) for the
+websocket consumers, filled when a trade session is created, so a
+connect does not read the player from the database.
+
+reply channels are kept in memory on connect and written to the cache
+and to Player.channel in bulk every flush_interval seconds, off the
+reactor thread.
+"""
+from django.core.cache import cache
+from django.db.models import Case, CharField, Value, When
+from threading import Lock
+from twisted.internet import reactor
+from .cache import cache_timeout
+import logging
+
+log = logging.getLogger(__name__)
+
+player_route_key = 'PLAYER_ROUTE_{player_id}'
+
+
+class PlayerRoutes:
+
+    flush_interval = 1 #seconds
+
+    def __init__(self):
+        self.lock = Lock()
+        self.routes = {}
+        # player id: reply channel name not persisted yet
+        self.unsaved_channels = {}
+        self.flush_call = None
+
+    def add_many(self, routes, timeout=cache_timeout):
+        """ routes is player id: (market id, subsession id) """
+        with self.lock:
+            for player_id, (market_id, subsession_id) in routes.items():
+                self.routes[int(player_id)] = (str(market_id), str(subsession_id),
+                    None)
+        cache.set_many({player_route_key.format(player_id=player_id):
+            self.routes[int(player_id)] for player_id in routes}, timeout=timeout)
+
+    def get(self, player_id):
+        player_id = int(player_id)
+        try:
+            return self.routes[player_id]
+        except KeyError:
+            pass
+        route = cache.get(player_route_key.format(player_id=player_id))
+        if route is None:
+            # created by an other process and expired from the cache
+            from .models import Player
+            market_id, subsession_id, channel_name = Player.objects.filter(
+                id=player_id).values_list('market_id', 'subsession_id',
+                'channel').get()
+            route = (market_id, subsession_id, channel_name or None)
+            log.debug('player %s route read from the database' % player_id)
+        with self.lock:
+            self.routes[player_id] = route
+        return route
+
+    def remote_channel(self, player_id):
+        """ reply channel another process stored for the player, or None """
+        route = cache.get(player_route_key.format(player_id=int(player_id)))
+        return route[2] if route else None
+
+    def set_channel(self, player_id, channel_name):
+        market_id, subsession_id, _ = self.get(player_id)
+        with self.lock:
+            self.routes[int(player_id)] = (market_id, subsession_id, channel_name)
+            self.unsaved_channels[int(player_id)] = channel_name
+        reactor.callFromThread(self.schedule_flush)
+
+    def schedule_flush(self):
+        if self.flush_call is None or not self.flush_call.active():
+            self.flush_call = reactor.callLater(self.flush_interval,
+                reactor.callInThread, self.persist_channels)
+
+    def persist_channels(self):
+        with self.lock:
+            unsaved_channels = self.unsaved_channels
+            self.unsaved_channels = {}
+            routes = {player_id: self.routes[player_id] for player_id in
+                unsaved_channels}
+        if not unsaved_channels:
+            return
+        from .models import Player
+        cache.set_many({player_route_key.format(player_id=player_id): route
+            for player_id, route in routes.items()}, timeout=cache_timeout)
+        Player.objects.filter(id__in=list(unsaved_channels)).update(channel=Case(
+            *(When(id=player_id, then=Value(channel_name)) for player_id,
+                channel_name in unsaved_channels.items()),
+            output_field=CharField()))
+        log.debug('persisted reply channels of %d players' % len(unsaved_channels))
+
+
+_player_routes = None
+
+def get_player_routes():
+    """ player routes of this process """
+    global _player_routes
+    if _player_routes is None:
+        _player_routes = PlayerRoutes()
+    return _player_routes
@@ -0,0 +1,215 @@
+"""
+replays journaled traffic (see hft.journal) through the dispatcher.
+
+inbound exchange frames and websocket messages are dispatched in
+journal order with their original inter-arrival times divided by speed,
+speed 0 replays as fast as possible. outbound OUCH goes to a sink
+instead of an exchange and broadcasts are counted and dropped,
+so a replay needs no exchange and no connected browsers.
+
+the exchange side is not simulated, the recorded exchange responses are
+replayed as they were, so against a session created with the same
+configs the outbound OUCH should match the recorded one frame by frame.
+the sink digest makes runs of different builds comparable.
+
+a replay into another session of the same configs shifts player and
+market ids by fixed offsets, the players and markets of a session are
+created in order. order tokens carry the player id, so the tokens of
+recorded exchange frames, inbound and outbound, are rewritten too.
+"""
+from collections import defaultdict
+from hashlib import sha256
+from heapq import merge
+import logging
+import time
+from .dispatcher import ELODispatcher
+from .journal import (
+    JournalReader, INBOUND, OUTBOUND, WEBSOCKET, decode_websocket_frame)
+from .orderstore import player_segment, player_segment_width, to_token_base
+from .ouch_extensions import client_messages, server_messages
+
+log = logging.getLogger(__name__)
+
+
+class OuchSink:
+    """ collects outbound OUCH in place of hft.exchange.send_exchange """
+
+    def __init__(self):
+        self.frames = []
+        self.digest = sha256()
+
+    def __call__(self, host, port, message, delay, subsession_id=None, market_id=None):
+        if not isinstance(message, bytes):
+            message = message.tobytes()
+        self.frames.append(message)
+        self.digest.update(message)
+
+
+class BroadcastCounter:
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+
+    def broadcast(self, message, batch=False):
+        self.counts[message.type] += 1
+
+
+class ReplayWebsocketMessage:
+    """ stands in for the channels message IncomingWSMessage reads """
+
+    __slots__ = ('content', )
+
+    def __init__(self, text):
+        self.content = {'text': text}
+
+
+class TokenRewriter:
+    """ moves the player segment of the order tokens in OUCH frames """
+
+    # the investor of every market is player 1
+    fixed_firms = frozenset((b'INVE', ))
+
+    def __init__(self, player_id_offset):
+        self.player_id_offset = player_id_offset
+
+    def rewrite_token(self, token):
+        if not token.strip() or token[:4] in self.fixed_firms:
+            return token
+        player_id = int(token[player_segment], 36) + self.player_id_offset
+        return (token[:player_segment.start] + to_token_base(player_id, 
+            player_segment_width).encode('ascii') + token[player_segment.stop:])
+
+    def rewrite(self, frame, messages):
+        frame = bytes(frame)
+        spec = messages.lookup_by_header_bytes(frame[:1])
+        payload_end = 1 + spec.payload_size
+        fields = dict(spec.from_bytes(frame[1:payload_end], header=False).iteritems())
+        for field, value in fields.items():
+            if field.endswith('_token'):
+                fields[field] = self.rewrite_token(value)
+        return bytes(spec(**fields)) + frame[payload_end:]
+
+
+def make_replay_dispatcher(dispatcher_cls, sink, broadcaster):
+    return type('Replay%s' % dispatcher_cls.__name__, (dispatcher_cls, ), {
+        'send_exchange': staticmethod(sink), 'broadcaster': broadcaster})
+
+
+class Replay:
+
+    def __init__(self, journal_paths, speed=1.0, dispatcher_cls=ELODispatcher,
+            subsession_id=None, player_id_offset=0, market_id_offset=0):
+        self.readers = [JournalReader(path) for path in journal_paths]
+        self.speed = speed
+        self.sink = OuchSink()
+        self.broadcaster = BroadcastCounter()
+        self.dispatcher = make_replay_dispatcher(dispatcher_cls, self.sink,
+            self.broadcaster)
+        # replay into a new session created with the same configs
+        self.subsession_id = subsession_id
+        self.player_id_offset = player_id_offset
+        self.market_id_offset = market_id_offset
+        self.token_rewriter = (TokenRewriter(player_id_offset) if player_id_offset
+            else None)
+        self.recorded_outbound = []
+        self.latencies = defaultdict(list)
+        self.errors = 0
+        self.max_lag = 0
+        self.elapsed = 0
+
+    def records(self):
+        return merge(*self.readers, key=lambda record: record.timestamp)
+
+    def dispatch(self, record):
+        subsession_id = (self.subsession_id if self.subsession_id is not None
+            else record.subsession_id)
+        market_id = str(record.market_id + self.market_id_offset)
+        if record.direction == INBOUND:
+            frame = bytes(record.frame)
+            if self.token_rewriter is not None:
+                frame = self.token_rewriter.rewrite(frame, server_messages)
+            self.dispatcher.dispatch('exchange', frame,
+                subsession_id=subsession_id, market_id=market_id)
+            return 'exchange'
+        player_id, text = decode_websocket_frame(record.frame)
+        message = ReplayWebsocketMessage(text)
+        if player_id == 0:
+            self.dispatcher.dispatch('websocket', message,
+                subsession_id=subsession_id, player_id=0)
+            return 'exogenous'
+        self.dispatcher.dispatch('websocket', message, subsession_id=subsession_id,
+            market_id=market_id, player_id=player_id + self.player_id_offset)
+        return 'websocket'
+
+    def run(self):
+        speed = self.speed
+        first_timestamp, start = None, time.perf_counter()
+        for record in self.records():
+            if record.direction == OUTBOUND:
+                # compared with what the replay sends in the target session
+                frame = bytes(record.frame)
+                if self.token_rewriter is not None:
+                    frame = self.token_rewriter.rewrite(frame, client_messages)
+                self.recorded_outbound.append(frame)
+                continue
+            if record.direction not in (INBOUND, WEBSOCKET):
+                continue
+            if first_timestamp is None:
+                first_timestamp, start = record.timestamp, time.perf_counter()
+            if speed:
+                due = start + (record.timestamp - first_timestamp) / 1e9 / speed
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                else:
+                    self.max_lag = max(self.max_lag, -wait)
+            dispatched_at = time.perf_counter()
+            try:
+                source = self.dispatch(record)
+            except Exception:
+                log.exception('error replaying record at %s, ignoring..' %
+                    record.timestamp)
+                self.errors += 1
+                continue
+            self.latencies[source].append(time.perf_counter() - dispatched_at)
+        self.elapsed = time.perf_counter() - start
+        for reader in self.readers:
+            reader.close()
+        return self
+
+    def first_mismatch(self):
+        """ index of the first outbound frame that differs from the recording """
+        replayed, recorded = self.sink.frames, self.recorded_outbound
+        for index, (left, right) in enumerate(zip(replayed, recorded)):
+            if left != right:
+                return index
+        if len(replayed) != len(recorded):
+            return min(len(replayed), len(recorded))
+        return None
+
+    def report(self):
+        def percentile(values, p):
+            return values[min(len(values) - 1, int(len(values) * p))]
+        events = sum(len(latencies) for latencies in self.latencies.values())
+        lines = [
+            'speed:                %s' % (self.speed or 'max'),
+            'events:               %d (%d errors)' % (events, self.errors),
+            'elapsed:              %.3f s' % self.elapsed,
+            'throughput:           %.0f events/s' % (events / self.elapsed if
+                self.elapsed else 0),
+            'max lag:              %.2f ms' % (self.max_lag * 1e3)]
+        for source, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            lines.append('%-21s %d, latency %.0f us mean, %.0f us p50, '
+                '%.0f us p99, %.0f us max' % (source + ':', len(latencies),
+                sum(latencies) / len(latencies) * 1e6,
+                percentile(latencies, 0.5) * 1e6, percentile(latencies, 0.99) * 1e6,
+                latencies[-1] * 1e6))
+        lines.append('broadcasts:           %s' % ', '.join('%s: %d' % kv for kv in
+            sorted(self.broadcaster.counts.items())))
+        mismatch = self.first_mismatch()
+        lines.append('outbound ouch:        %d replayed, %d recorded, %s' % (
+            len(self.sink.frames), len(self.recorded_outbound), 'identical' if
+            mismatch is None else 'first difference at frame %s' % mismatch))
+        lines.append('outbound digest:      %s' % self.sink.digest.hexdigest())
+        return '\n'.join(lines)
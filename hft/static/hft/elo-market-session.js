@@ -205,6 +205,16 @@ class MarketSession extends PolymerElement {
         eBestBid: Number,
         eBestOffer: Number,
         clearingPrice:Object,
+        // [{time, bestBid, bestOffer, referencePrice, signedVolume}, ...]
+        // of the market before this page connected, for the charts
+        marketHistory: {
+            type: Array,
+            value: () => [],
+        },
+        historyWindow: {
+            type: Object,
+            value: {resolution: 1000, window: 600},
+        },
         middlePeg: {
             type: Number,
             computed: '_computeMiddlePeg(eBestBid, eBestOffer)',
@@ -356,6 +366,9 @@ class MarketSession extends PolymerElement {
                 case 'canceled':
                     this.orderBook.recv(cleanMsg)
                     break;
+                case 'order_book':
+                    this.orderBook.recv(this._scaleOrderBook(cleanMsg))
+                    break;
                 case 'post_batch':
                     marketState.bestBid = cleanMsg.best_bid;
                     marketState.bestOffer = cleanMsg.best_offer;
@@ -443,6 +456,52 @@ class MarketSession extends PolymerElement {
         this.notifyPath('orderBook._buyOrders')
     }
     
+    _handleSnapshot(message) {
+        this.orderBook = new PlayersOrderBook(this.playerId);
+        this.myBid = 0
+        this.myOffer = 0
+        this.inventory = message.inventory
+        this.cash = message.cash
+        this._handleBatchMessage(message)
+        this.outboundMessage({detail: {type: 'history', 
+            resolution: this.historyWindow.resolution, 
+            window: this.historyWindow.window}})
+    }
+
+    _handleHistory(message) {
+        // the scaler only knows flat fields, null is a field
+        // nothing was recorded for yet, charts leave a gap there
+        const scale = (price) => this.scaleForDisplay && price !== null ? 
+            scaler({price: price}, 2).price : price
+        let points = []
+        for (let i = 0; i < message.best_bid.length; i++) {
+            points.push({
+                time: message.start + i * message.resolution,
+                bestBid: scale(message.best_bid[i]),
+                bestOffer: scale(message.best_offer[i]),
+                referencePrice: scale(message.reference_price[i]),
+                signedVolume: message.signed_volume[i],
+            })
+        }
+        this.marketHistory = points
+    }
+
+    _handleOrderBook(message) {
+        this.orderBook.recv(this._scaleOrderBook(message))
+        this.notifyPath('orderBook._buyOrders')
+    }
+
+    // the scaler only knows flat fields, levels are [price, volume]
+    _scaleOrderBook(message) {
+        if (this.scaleForDisplay) {
+            for (let side of ['bids', 'offers']) {
+                message[side] = message[side].map(level => 
+                    [scaler({price: level[0]}, 2).price, level[1]])
+            }
+        }
+        return message
+    }
+
     _handleExecuted(message) {
         if (message.player_id == this.playerId) {
         let cashChange = message.buy_sell_indicator == 'B' ?  - message.execution_price :
@@ -111,6 +111,35 @@ const ELO = {
                 volume_at_best_offer: parseInt,
                 clearing_price: parseInt,
                 transacted_volume: parseInt,
+            },
+            // market state and own live orders after a connect or a gap
+            snapshot: {
+                type: String,
+                market_id: parseInt,
+                seq: parseInt,
+                inventory: parseInt,
+                cash: parseInt,
+                batch: batch => batch,
+            },
+            // columns of equal length, one value per bucket
+            history: {
+                type: String,
+                market_id: parseInt,
+                resolution: parseInt,
+                start: parseInt,
+                best_bid: column => column,
+                best_offer: column => column,
+                reference_price: column => column,
+                signed_volume: column => column,
+            },
+            // [[price, volume], ...] best level first
+            order_book: {
+                type: String,
+                market_id: parseInt,
+                depth: parseInt,
+                batched: Boolean,
+                bids: levels => levels.map(level => level.map(Number)),
+                offers: levels => levels.map(level => level.map(Number)),
             }
         },
         outbound: {
@@ -136,6 +165,12 @@ const ELO = {
             },
             player_ready: {
                 type: String
+            },
+            // resolution in ms, window in seconds
+            history: {
+                type: String,
+                resolution: parseInt,
+                window: parseInt,
             }
         },
     },
@@ -154,6 +189,9 @@ const ELO = {
         reference_price: ['_handleReferencePrice'],
         slider_confirm: ['_handleSliderConfirm'],
         mid_peg: ['_handleMiddlePeg'],
+        order_book: ['_handleOrderBook'],
+        snapshot: ['_handleSnapshot'],
+        history: ['_handleHistory'],
     },
     sliderProperties: {
         minValue: 0,
@@ -0,0 +1,114 @@
+// decodes the compact broadcast frames of hft/compact_frames.py
+// back into the JSON messages the session components expect.
+// frames are [schemaId, values...], state types carry a field mask
+// and only the fields that changed, batches are [batchSchemaId, frames...]
+// frames sent to the whole market end with its sequence number, which
+// the decoded message carries as seq
+// CompactEncoder writes order entry and slider messages the other way,
+// [schemaId, values...] in the order of the schema's inbound fields
+
+class CompactDecoder {
+    constructor() {
+        this.schemas = null;
+        this.batchSchemaId = 0;
+        // schema id -> last full values of a state type
+        this.state = {};
+    }
+
+    setSchemas(message) {
+        this.schemas = message.schemas;
+        this.batchSchemaId = message.batch_schema_id;
+        this.state = {};
+    }
+
+    // forget the state deltas build on, until the next keyframes
+    reset() {
+        this.state = {};
+    }
+
+    // returns the message, or null when it can't be decoded yet
+    decode(frame) {
+        if (frame[0] == this.batchSchemaId) {
+            let batch = {type: 'batch', batch: []};
+            for (let i = 1; i < frame.length; i++) {
+                if (!Array.isArray(frame[i])) {
+                    batch.seq = frame[i];
+                    continue;
+                }
+                let message = this._decodeFrame(frame[i]);
+                if (message) {
+                    batch.batch.push(message);
+                }
+            }
+            return batch;
+        }
+        return this._decodeFrame(frame);
+    }
+
+    _decodeFrame(frame) {
+        const schema = this.schemas ? this.schemas[frame[0]] : null;
+        if (!schema) {
+            return null;
+        }
+        const fields = schema.fields;
+        let values = frame.slice(1, 1 + fields.length);
+        let length = 1 + fields.length;
+        if (schema.delta) {
+            const mask = frame[1];
+            const full = (1 << fields.length) - 1;
+            let last = this.state[frame[0]];
+            if (mask != full && !last) {
+                // a delta on state this client never got, wait for a keyframe
+                return null;
+            }
+            values = [];
+            let next = 2;
+            for (let i = 0; i < fields.length; i++) {
+                values.push(mask & (1 << i) ? frame[next++] : last[i]);
+            }
+            this.state[frame[0]] = values;
+            length = next;
+        }
+        let message = {type: schema.type};
+        for (let i = 0; i < fields.length; i++) {
+            message[fields[i]] = values[i];
+        }
+        if (frame.length > length) {
+            message.seq = frame[length];
+        }
+        return message;
+    }
+}
+
+class CompactEncoder {
+    constructor() {
+        // message type -> {id, fields}, empty until the server sent its table
+        this.schemas = {};
+    }
+
+    setSchemas(message) {
+        this.schemas = {};
+        const inbound = message.inbound || {};
+        for (const id in inbound) {
+            this.schemas[inbound[id].type] = {id: parseInt(id), fields: inbound[id].fields};
+        }
+    }
+
+    // returns the frame, or null for messages that go as JSON
+    encode(message) {
+        const schema = this.schemas[message.type];
+        if (!schema) {
+            return null;
+        }
+        let frame = [schema.id];
+        for (const field of schema.fields) {
+            if (message[field] === undefined) {
+                return null;
+            }
+            frame.push(message[field]);
+        }
+        return frame;
+    }
+}
+
+export { CompactDecoder, CompactEncoder };
@@ -16,7 +16,9 @@ const orderBookTest = () => {
         {type: 'executed', price: 95, order_token: 'SUBB0001000005', 
             buy_sell_indicator: 'B'},
         {type: 'bbo', best_bid: 0, best_offer: 100, volume_bid: 10, volume_offer: 5},
-        {type: 'bbo', best_bid: 5, best_offer: 12, volume_bid: 9, volume_offer: 3}
+        {type: 'bbo', best_bid: 5, best_offer: 12, volume_bid: 9, volume_offer: 3},
+        {type: 'order_book', depth: 5, batched: false, bids: [[103, 1]], 
+            offers: [[110, 2], [111, 1]]}
     ];
 
     for (let i = 0; i < testMessages.length; i++) {
@@ -24,6 +26,8 @@ const orderBookTest = () => {
         console.log('buys', JSON.stringify(testBook.getOrders('B')));
         console.log('sells', JSON.stringify(testBook.getOrders('S')));
         console.log('bbo', JSON.stringify(testBook.bbo));
+        console.log('levels', JSON.stringify(testBook.getLevels('B')), 
+            JSON.stringify(testBook.getLevels('S')));
     }
 
     return testBook;
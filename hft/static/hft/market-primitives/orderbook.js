@@ -9,6 +9,9 @@ class PlayersOrderBook {
         this.auctionFormat = OTREE_CONSTANTS.auctionFormat
         this._buyOrders = {}
         this._sellOrders = {}
+        // price levels of the whole market from 'order_book' broadcasts,
+        // null until the first one, the order maps then only hold own orders
+        this._levels = null
         /*
             _orders = {
                 `orderToken`: {
@@ -36,6 +39,9 @@ class PlayersOrderBook {
                     message.order_token, message.player_id, message.old_price,
                     message.old_token)
                 break;
+            case 'order_book':
+                this._levels = {bids: message.bids, offers: message.offers};
+                break;
         }
     }
 
@@ -71,6 +77,14 @@ class PlayersOrderBook {
         }
     }
 
+    // [[price, volume], ...] of a side, null without an aggregated book
+    getLevels(buySellIndicator) {
+        if (!this._levels) {
+            return null;
+        }
+        return buySellIndicator == 'B' ? this._levels.bids : this._levels.offers;
+    }
+
     // returns true if a change in an order from player with id `playerId` should be immediately shown
     _orderIsVisible(playerId) {
         return this.auctionFormat != 'FBA' || playerId == this.playerId;
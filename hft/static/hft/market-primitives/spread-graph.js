@@ -315,18 +315,32 @@ class SpreadGraph extends PolymerElement {
                 askVolume: 0,
             };
         }
-        d3.values(this.orders._buyOrders)
-          .filter(e => e.visible)
-          .forEach(e => {
-            prices[e.price] = prices[e.price] || getDefaultPriceEntry();
-            prices[e.price].bidVolume++;
-          });
-        d3.values(this.orders._sellOrders)
-          .filter(e => e.visible)
-          .forEach(e => {
-            prices[e.price] = prices[e.price] || getDefaultPriceEntry();
-            prices[e.price].askVolume++;
-          });
+        const bidLevels = this.orders.getLevels('B');
+        if (bidLevels) {
+            // the market's aggregated book, own orders included
+            bidLevels.forEach(([price, volume]) => {
+                prices[price] = prices[price] || getDefaultPriceEntry();
+                prices[price].bidVolume += volume;
+            });
+            this.orders.getLevels('S').forEach(([price, volume]) => {
+                prices[price] = prices[price] || getDefaultPriceEntry();
+                prices[price].askVolume += volume;
+            });
+        }
+        else {
+            d3.values(this.orders._buyOrders)
+              .filter(e => e.visible)
+              .forEach(e => {
+                prices[e.price] = prices[e.price] || getDefaultPriceEntry();
+                prices[e.price].bidVolume++;
+              });
+            d3.values(this.orders._sellOrders)
+              .filter(e => e.visible)
+              .forEach(e => {
+                prices[e.price] = prices[e.price] || getDefaultPriceEntry();
+                prices[e.price].askVolume++;
+              });
+        }
 
         const volumes = [];
         d3.keys(prices).forEach(price => {
@@ -1,4 +1,5 @@
 import { PolymerElement, html } from '../node_modules/@polymer/polymer/polymer-element.js';
+import { CompactDecoder, CompactEncoder } from './compact-frames.js';
 
 
 var socket = null
@@ -11,28 +12,56 @@ class WSConnection extends PolymerElement {
             type: Object,
             value: () => [],
         },
-        urlToConnect: String
+        urlToConnect: String,
+        // ask for compact broadcast frames, servers
+        // that don't know them keep sending JSON
+        compactFrames: {
+            type: Boolean,
+            value: true,
+        },
+        // frames processed between acknowledgements, the server
+        // throttles connections that fall behind (hft/backpressure.py)
+        ackInterval: {
+            type: Number,
+            value: 25,
+        },
       }
     }
     constructor() {
         super();
         this.socket = null;
         this.pendingMessages = [];
+        this.decoder = new CompactDecoder();
+        // order entry and sliders go as compact frames once the schema arrived
+        this.encoder = new CompactEncoder();
+        this.framesReceived = 0;
+        // sequence number of the last market frame, a gap asks for a snapshot
+        this.lastSeq = null;
+        this.resyncRequestedAt = 0;
+        this.resyncing = false;
+        this.playerReadySent = false;
     }
     
     ready() {
         if (this.socket) {
             return ;
         }
-    
-        socket = new WebSocket(this.urlToConnect);
+        this._connect();
+        this.addEventListener('ws-message', this.send.bind(this))
+    }
+
+    _connect() {
+        let url = this.urlToConnect;
+        if (this.compactFrames) {
+            url += (url.includes('?') ? '&' : '?') + 'format=compact';
+        }
+        socket = new WebSocket(url);
 
         socket.onerror = this._onError.bind(this);
         socket.onopen = this._onOpen.bind(this);
         socket.onmessage = this._onMessage.bind(this);
         socket.onclose = this._onClose.bind(this);
         this.socket = socket
-        this.addEventListener('ws-message', this.send.bind(this))
     }
 
     _onOpen() {
@@ -41,6 +70,12 @@ class WSConnection extends PolymerElement {
         this.pending.forEach( (message) => {
             this.send(message)
         });
+        this.pending = [];
+        // a reconnect joins a market that already trades
+        if (this.playerReadySent) {
+            return;
+        }
+        this.playerReadySent = true;
 
         let playerReadyMessage = {
             type: 'player_ready',
@@ -53,8 +88,37 @@ class WSConnection extends PolymerElement {
     }
 
     _onMessage(message) {
+        this._receive(message);
+        this.framesReceived++;
+        if (this.framesReceived % this.ackInterval == 0 && this.socket) {
+            this.socket.send('{"type":"ack","received":' + this.framesReceived + '}');
+        }
+    }
+
+    _receive(message) {
         this.socket = socket
         let payload = JSON.parse(message.data);
+        if (Array.isArray(payload)) {
+            payload = this.decoder.decode(payload);
+            if (!payload) {
+                return;
+            }
+        } else if (payload && payload.type == 'schema') {
+            this.decoder.setSchemas(payload);
+            this.encoder.setSchemas(payload);
+            return;
+        } else if (payload && payload.type == 'snapshot') {
+            this.lastSeq = payload.seq;
+            this.resyncRequestedAt = 0;
+            this.decoder.reset();
+        } else if (payload && payload.type == 'resync') {
+            // fell too far behind, the server closes the socket next
+            this.resyncing = true;
+            return;
+        }
+        if (payload && payload.seq !== undefined && payload.type != 'snapshot') {
+            this._checkSeq(payload.seq);
+        }
         if (payload) {
             payload['client_received_timestamp'] = Date.now();
             let event = new CustomEvent('inbound-ws-message', {detail: payload,
@@ -66,6 +130,19 @@ class WSConnection extends PolymerElement {
         }
     };
 
+    _checkSeq(seq) {
+        const now = Date.now();
+        // a lost request is repeated after a while
+        if (this.lastSeq !== null && seq > this.lastSeq + 1 && 
+                now - this.resyncRequestedAt > 2000 && this.socket) {
+            this.resyncRequestedAt = now;
+            this.socket.send('{"type":"resync"}');
+        }
+        if (this.lastSeq === null || seq > this.lastSeq) {
+            this.lastSeq = seq;
+        }
+    }
+
     _onError(error) {
         this.socket = socket
         console.error(error);
@@ -75,6 +152,14 @@ class WSConnection extends PolymerElement {
         this.socket = socket
         console.log('disconnected from: ', this.urlToConnect)
         this.socket = null;
+        if (this.resyncing) {
+            this.resyncing = false;
+            this.framesReceived = 0;
+            this.lastSeq = null;
+            this.decoder = new CompactDecoder();
+            this.encoder = new CompactEncoder();
+            this._connect();
+        }
     };
 
     send(event) {
@@ -84,8 +169,8 @@ class WSConnection extends PolymerElement {
             this.pending.push(event);
             return;
         }
-        const jsonMessage = JSON.stringify(message);
-        this.socket.send(jsonMessage);
+        const frame = this.encoder.encode(message);
+        this.socket.send(JSON.stringify(frame || message));
     }
 
     static get template() {return html``;}
@@ -13,6 +13,9 @@ import sys
 from django.core import serializers
 from .exogenous_event import get_filecode_from_filename
 from .internal_event_message import MarketEndMessage
+from .cache import release_exchange_ports
+from .gc_control import get_gc_control
+from .inbound_limits import get_inbound_limiter
 
 
 log = logging.getLogger(__name__)
@@ -40,6 +43,9 @@ class TradeSession:
         self.is_trading = False
         self.market_state = {}
         self.market_exchange_pairs = {}
+        self.market_exchange_tags = {}
+        # holders of the exchange ports to release when trading stops
+        self.exchange_port_owners = []
         self.clients = {}
         self.exogenous_events = {}
         self.trading_markets = []
@@ -52,13 +58,17 @@ class TradeSession:
     def stop_trade_session(self):
         raise NotImplementedError()
 
-    def create_market(self, group_id, exchange_host, exchange_port, **kwargs):
+    def create_market(self, group_id, exchange_host, exchange_port, 
+            exchange_market_tag=None, **kwargs):
         market_id_in_trade_session = str(next(self.market_count))
         market_cls = self.market_factory.get_market(self.session_format)
         market = market_cls(group_id, market_id_in_trade_session, self.subsession_id, 
             exchange_host, exchange_port, **kwargs)
         self.market_state[market.market_id] = False
         self.market_exchange_pairs[market.market_id] = (exchange_host, exchange_port)
+        # market tag is set if the market shares
+        # a multiplexed connection with other markets
+        self.market_exchange_tags[market.market_id] = exchange_market_tag
         return market
 
     def register_exogenous_event(self, client_type, rel_path):
@@ -98,12 +108,14 @@ class ELOTradeSession(TradeSession):
         def create_exchange_connection(self, market_id):
             host, port = self.market_exchange_pairs[market_id]
             exchange.connect(self.subsession_id, market_id, host, port, 
-                self.event_dispatcher_cls, wait_for_connection=True)
+                self.event_dispatcher_cls, wait_for_connection=True,
+                market_tag=self.market_exchange_tags.get(market_id))
         def reset_exchange(self, market_id):
             host, port = self.market_exchange_pairs[market_id]
             self.event.exchange_msgs(
                 'reset_exchange', exchange_host=host, exchange_port=port, 
-                delay=0, event_code='S', timestamp=0, subsession_id=self.subsession_id)
+                delay=0, event_code='S', timestamp=0, subsession_id=self.subsession_id,
+                market_id=market_id)
         self.market_state[market_id] = True
         is_ready = (True if False not in self.market_state.values() else False)
         if is_ready and not self.is_trading:
@@ -116,6 +128,9 @@ class ELOTradeSession(TradeSession):
                 self.trading_markets.append(market_id)
             self.start_exogenous_events()
             self.is_trading = True
+            gc_control = get_gc_control()
+            if gc_control is not None:
+                gc_control.trading_started()
             task.deferLater(reactor, self.subsession.session_duration, 
                 partial(self.stop_trade_session, clients=dict(self.clients)))
             
@@ -133,6 +148,15 @@ class ELOTradeSession(TradeSession):
                     self.event_dispatcher_cls.dispatch('internal_event', ex_event_msg)
                 self.stop_exogenous_events(clients=clients)
                 self.is_trading = False
+                gc_control = get_gc_control()
+                if gc_control is not None:
+                    gc_control.trading_stopped()
+                log.info('websocket backpressure:\n%s' % 
+                    self.event_dispatcher_cls.broadcaster.backpressure.report())
+                log.info('inbound rate limits:\n%s' % get_inbound_limiter().report())
+                for port_owner in self.exchange_port_owners:
+                    release_exchange_ports(self.subsession.auction_format, 
+                        port_owner)
 
                 post_session_delay = self.subsession.session.config['post_session_delay']
                 if post_session_delay is None:
@@ -44,6 +44,7 @@ class BaseTrader(object):
         self.orderstore = self.orderstore_cls(player_id, in_group_id=id_in_market, 
             **kwargs)
         self.account_id = kwargs.get('firm')
+        self.exchange_extensions = bool(kwargs.get('exchange_extensions'))
         self.tag = self.account_id or self.player_id
         self.inventory = Inventory()
         self.trader_role = TraderStateFactory.get_trader_state(default_role)
@@ -152,10 +153,15 @@ class ELOTrader(BaseTrader):
         'C': 'order_canceled', 
         'E': 'order_executed', 
         'L': 'peg_state_change',
+        'Y': 'orders_mass_canceled',
+        'W': 'quote_replaced',
         'role_change': 'state_change', 
         'slider': 'user_slider_change'}
     otree_player_converter = elo_otree_player_converter
-
+    # (previous token, replacement token, price) fields of each side of a quote ack
+    quote_sides = (
+        ('previous_bid_token', 'replacement_bid_token', 'bid_price'),
+        ('previous_offer_token', 'replacement_offer_token', 'offer_price'))
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -235,30 +241,66 @@ w: %s, speed unit cost: %s' % (
             return self.market_facts['best_offer']
 
     def order_accepted(self, event):
-        if not event.message.midpoint_peg:
-            event_as_kws = event.to_kwargs()
-            self.orderstore.confirm('enter', **event_as_kws)
-            event.broadcast_msgs('confirmed', model=self, **event_as_kws)
+        # exchange messages are decoded lazily, the handlers read
+        # only the fields they use, straight from the message data
+        msg = event.message.data
+        if not msg['midpoint_peg']:
+            self.orderstore.confirm('enter', order_token=msg['order_token'],
+                time_in_force=msg['time_in_force'], timestamp=msg['timestamp'])
+            event.broadcast_msgs('confirmed', model=self, 
+                market_id=msg['market_id'], player_id=msg['player_id'], 
+                order_token=msg['order_token'], price=msg['price'], 
+                buy_sell_indicator=msg['buy_sell_indicator'],
+                time_in_force=msg['time_in_force'])
     
     def order_replaced(self, event):
-        event_as_kws = event.to_kwargs()
-        order_info = self.orderstore.confirm('replaced', **event_as_kws)  
-        order_token = event.message.replacement_order_token
-        old_token = event.message.previous_order_token
+        msg = event.message.data
+        order_token = msg['replacement_order_token']
+        old_token = msg['previous_order_token']
+        order_info = self.orderstore.confirm('replaced', 
+            previous_order_token=old_token, replacement_order_token=order_token,
+            price=msg['price'])
         old_price = order_info['old_price']
         event.broadcast_msgs('replaced', order_token=order_token, 
-            old_token=old_token, old_price=old_price, model=self, **event_as_kws)       
+            old_token=old_token, old_price=old_price, model=self, 
+            market_id=msg['market_id'], player_id=msg['player_id'], 
+            price=msg['price'], buy_sell_indicator=msg['buy_sell_indicator'])
 
     def order_canceled(self, event):
-        event_as_kws = event.to_kwargs()
-        order_info = self.orderstore.confirm('canceled', **event_as_kws)
-        order_token = event.message.order_token
+        order_token = event.message.data['order_token']
+        order_info = self.orderstore.confirm('canceled', order_token=order_token)
         price = order_info['price']
         buy_sell_indicator = order_info['buy_sell_indicator']
         event.broadcast_msgs('canceled', order_token=order_token,
             price=price, buy_sell_indicator=buy_sell_indicator, 
             model=self)
 
+    def quote_replaced(self, event):
+        msg = event.message.data
+        for previous_field, replacement_field, price_field in self.quote_sides:
+            order_token = msg[replacement_field]
+            if not order_token.strip():
+                # order was gone, replace died at the exchange
+                continue
+            old_token = msg[previous_field]
+            order_info = self.orderstore.confirm('replaced', 
+                previous_order_token=old_token, replacement_order_token=order_token,
+                price=msg[price_field])
+            event.broadcast_msgs('replaced', order_token=order_token,
+                old_token=old_token, old_price=order_info['old_price'], model=self,
+                market_id=msg['market_id'], player_id=msg['player_id'],
+                price=order_info['price'], 
+                buy_sell_indicator=order_info['buy_sell_indicator'])
+
+    def orders_mass_canceled(self, event):
+        msg = event.message.data
+        canceled_orders = self.orderstore.confirm('mass_canceled', 
+            order_token=msg['order_token'], canceled_orders=msg['canceled_orders'])
+        for order_info in canceled_orders:
+            event.broadcast_msgs('canceled', order_token=order_info['order_token'],
+                price=order_info['price'], 
+                buy_sell_indicator=order_info['buy_sell_indicator'], model=self)
+
     def order_executed(self, event):
         def adjust_inventory(buy_sell_indicator):
             if buy_sell_indicator == 'B':
@@ -274,12 +316,13 @@ w: %s, speed unit cost: %s' % (
                 self.cash -= execution_price
             elif buy_sell_indicator == 'S':
                 self.cash += execution_price
-        event_as_kws = event.to_kwargs()
-        execution_price = event.message.execution_price
-        order_info =  self.orderstore.confirm('executed', **event_as_kws)
+        msg = event.message.data
+        execution_price = msg['execution_price']
+        order_token = msg['order_token']
+        order_info =  self.orderstore.confirm('executed', order_token=order_token,
+            executed_shares=msg['executed_shares'])
         buy_sell_indicator = order_info['buy_sell_indicator']
         price = order_info['price']
-        order_token = event.message.order_token
         adjust_inventory(buy_sell_indicator)
         event.broadcast_msgs(
             'executed', order_token=order_token, price=price, 
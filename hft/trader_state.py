@@ -40,8 +40,13 @@ class TraderState(object):
     def cancel_all_orders(self, trader, event):
         all_orders = trader.orderstore.all_orders()
         if all_orders:
+            if trader.exchange_extensions:
+                # one message takes all of them off the book
+                order_info = trader.orderstore.register_mass_cancel()
+                event.exchange_msgs('mass_cancel', model=trader, **order_info)
             for order in all_orders:
-                event.exchange_msgs('cancel', model=trader, **order)
+                if not trader.exchange_extensions:
+                    event.exchange_msgs('cancel', model=trader, **order)
                 if order['buy_sell_indicator'] == 'B':
                     trader.staged_bid = None
                     log.debug('trader %s: staged bid set none.' % trader.tag)
@@ -326,6 +331,20 @@ class ELOAutomatedTraderState(ELOTraderState):
             else:
                 self.enter_order(trader, event, 'B', price=target_bid)
 
+        if (trader.exchange_extensions and len(buys) == len(sells) == 1 and
+                buys[0]['shares'] == sells[0]['shares'] and
+                buys[0]['time_in_force'] == sells[0]['time_in_force']):
+            # both sides in one message, one BBO update at the exchange
+            buy, sell = buys[0], sells[0]
+            event.exchange_msgs('quote', model=trader,
+                existing_bid_token=buy['existing_order_token'],
+                replacement_bid_token=buy['replacement_order_token'],
+                bid_price=buy['replace_price'],
+                existing_offer_token=sell['existing_order_token'],
+                replacement_offer_token=sell['replacement_order_token'],
+                offer_price=sell['replace_price'],
+                shares=buy['shares'], time_in_force=buy['time_in_force'])
+            return
         if start_from == 'B':
             all_orders = buys + sells
         else:
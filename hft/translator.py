@@ -6,6 +6,7 @@ import pytz
 from random import randrange
 import struct
 import logging
+from .ouch_extensions import MassCancel, TwoSidedQuote
 
 log = logging.getLogger(__name__)
 
@@ -61,6 +62,8 @@ class LeepsOuchTranslator(Translator):
         'cancel': OuchClientMessages.CancelOrder,
         'reset_exchange': OuchClientMessages.SystemStart,
         'external_feed': OuchClientMessages.ExternalFeedChange,
+        'mass_cancel': MassCancel,
+        'quote': TwoSidedQuote,
     }
 
 if __name__ == '__main__':
@@ -20,6 +20,9 @@ exogenous_events = {
 exogenous_event_endpoint = 'ws://127.0.0.1:8000/hft_exogenous_event/{subsession_id}'
 exogenous_event_client = 'hft/exogenous_event_emitter/ws_client.py'
 
+# ports are reserved per market (see cache.reserve_exchange_port),
+# a port carries more than one market if 
+# markets_per_exchange_port is set in session configs
 available_exchange_ports = {
     'CDA': list(range(9010, 9000, -1)),
     'FBA': list(range(9110, 9100, -1)),
@@ -151,7 +154,7 @@ def ensure_results_ready(subsession_id, market_id, record_cls, num_players,
 elo_args_fields = (
     'subsession_id', 'market_id', 'id', 'id_in_group', 'default_role', 
     'exchange_host', 'exchange_port')
-elo_kwargs_fields = ('cash', 'speed_unit_cost')
+elo_kwargs_fields = ('cash', 'speed_unit_cost', 'exchange_extensions')
 def elo_otree_player_converter(otree_player):
     args = [getattr(otree_player, field) for field in elo_args_fields]
     kwargs = {field: getattr(otree_player, field) for field in elo_kwargs_fields}
@@ -0,0 +1,263 @@
+"""
+matching throughput of the local stand-in engines,
+runs the engine directly on a random order flow, no sockets involved.
+
+    python -m local_exchange.benchmark --messages 200000
+    python -m local_exchange.benchmark --mechanism fba --batch-length 5
+    python -m local_exchange.benchmark --mechanism iex --peg-proportion 0.5
+    python -m local_exchange.benchmark --quotes two-sided
+"""
+import argparse
+import random
+import time
+from heapq import heappush, heappop
+from itertools import count
+from .cda import CDAEngine
+from .fba import FBAEngine
+from .iex import IEXEngine
+
+engines = {
+    'cda': CDAEngine,
+    'fba': FBAEngine,
+    'iex': IEXEngine,
+}
+
+TICK = 10000
+
+
+class VirtualTimer:
+
+    __slots__ = ('is_active', )
+
+    def __init__(self):
+        self.is_active = True
+
+    def active(self):
+        return self.is_active
+
+    def cancel(self):
+        self.is_active = False
+
+
+class VirtualScheduler:
+    """ runs delayed calls in simulated time, so expiries are part of the workload """
+
+    def __init__(self):
+        self.now = 0
+        self.queue = []
+        self.sequence = count()
+
+    def call_later(self, delay, func, *args):
+        timer = VirtualTimer()
+        heappush(self.queue, (self.now + delay, next(self.sequence), timer, func, args))
+        return timer
+
+    def seconds(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+        queue = self.queue
+        while queue and queue[0][0] <= self.now:
+            _, _, timer, func, args = heappop(queue)
+            if timer.is_active:
+                timer.is_active = False
+                func(*args)
+
+
+class OutboundCounter:
+
+    def __init__(self):
+        self.counts = {}
+        self.bursts = 0
+
+    def __call__(self, messages):
+        self.bursts += 1
+        counts = self.counts
+        for header, _ in messages:
+            counts[header] = counts.get(header, 0) + 1
+
+
+def generate_order_flow(num_messages, num_traders=20, seed=0,
+        replace_rate=0.3, cancel_rate=0.1, ioc_rate=0.05, expiring_rate=0.2,
+        peg_proportion=0, external_feed_rate=0):
+    """
+    peg_proportion of the entered orders are midpoint pegged like
+    investor orders of the exogenous event emitter,
+    external_feed_rate is the share of external feed updates in the flow
+    """
+    rnd = random.Random(seed)
+    mid = 100 * TICK
+    live_tokens = []
+    counters = [count(1, 1) for _ in range(num_traders)]
+    flow = []
+    for _ in range(num_messages):
+        mid += rnd.choice((-TICK, 0, 0, TICK))
+        if external_feed_rate and rnd.random() < external_feed_rate:
+            half_spread = rnd.randint(1, 4) * TICK
+            flow.append(('external_feed', {'e_best_bid': mid - half_spread,
+                'e_best_offer': mid + half_spread, 'e_signed_volume': 0}))
+            continue
+        trader = rnd.randrange(num_traders)
+        draw = rnd.random()
+        if live_tokens and draw < cancel_rate:
+            token = live_tokens.pop(rnd.randrange(len(live_tokens)))
+            flow.append(('cancel', {'order_token': token, 'shares': 0}))
+            continue
+        side = rnd.choice('BS')
+        offset = rnd.randint(-2, 8) * TICK
+        price = mid - offset if side == 'B' else mid + offset
+        token = '{firm}{side}{trader:04d}{count:05d}'.format(
+            firm=chr(trader % 26 + 65) * 4, side=side, trader=trader,
+            count=next(counters[trader]) % 100000)
+        if live_tokens and draw < cancel_rate + replace_rate:
+            existing_token = live_tokens.pop(rnd.randrange(len(live_tokens)))
+            # keep side of the existing order
+            side = existing_token[4]
+            token = token[:4] + side + token[5:]
+            price = mid - offset if side == 'B' else mid + offset
+            flow.append(('replace', {'existing_order_token': existing_token,
+                'replacement_order_token': token, 'price': price, 'shares': 1,
+                'time_in_force': 99999}))
+        else:
+            draw = rnd.random()
+            time_in_force = 99999
+            if draw < ioc_rate:
+                time_in_force = 0
+            elif draw < ioc_rate + expiring_rate:
+                time_in_force = rnd.randint(1, 10)
+            midpoint_peg = bool(peg_proportion) and rnd.random() < peg_proportion
+            flow.append(('enter', {'order_token': token, 'buy_sell_indicator': side,
+                'price': price, 'shares': 1, 'time_in_force': time_in_force,
+                'firm': token[:4], 'midpoint_peg': midpoint_peg}))
+        live_tokens.append(token)
+    return flow
+
+
+def generate_quote_flow(num_updates, num_traders=20, seed=0, two_sided=True):
+    """
+    automated traders keeping a bid and an offer around a moving mid,
+    every update reprices both sides of one trader, with one quote
+    message if two_sided or with two replace messages otherwise
+    """
+    rnd = random.Random(seed)
+    mid = 100 * TICK
+    flow, tokens, counters = [], [], []
+    for trader in range(num_traders):
+        counter = count(1, 1)
+        firm = chr(trader % 26 + 65) * 4
+        quote_tokens = []
+        for side, price in (('B', mid - TICK), ('S', mid + TICK)):
+            token = '{}{}{:04d}{:05d}'.format(firm, side, trader, next(counter))
+            flow.append(('enter', {'order_token': token, 'buy_sell_indicator': side,
+                'price': price, 'shares': 1, 'time_in_force': 99999, 'firm': firm,
+                'midpoint_peg': False}))
+            quote_tokens.append(token)
+        tokens.append(quote_tokens)
+        counters.append(counter)
+    for _ in range(num_updates):
+        # quotes never cross, so every update finds both orders
+        quote_mid = mid + rnd.randint(-1, 1) * TICK
+        trader = rnd.randrange(num_traders)
+        half_spread = rnd.randint(2, 4) * TICK
+        bid_token, offer_token = tokens[trader]
+        new_tokens = ['{}{:04d}{:05d}'.format(token[:5], trader,
+            next(counters[trader]) % 100000) for token in (bid_token, offer_token)]
+        if two_sided:
+            flow.append(('quote', {'existing_bid_token': bid_token,
+                'replacement_bid_token': new_tokens[0],
+                'bid_price': quote_mid - half_spread,
+                'existing_offer_token': offer_token,
+                'replacement_offer_token': new_tokens[1],
+                'offer_price': quote_mid + half_spread, 'shares': 1, 'time_in_force': 99999}))
+        else:
+            for existing, replacement, price in (
+                    (bid_token, new_tokens[0], quote_mid - half_spread),
+                    (offer_token, new_tokens[1], quote_mid + half_spread)):
+                flow.append(('replace', {'existing_order_token': existing,
+                    'replacement_order_token': replacement, 'price': price,
+                    'shares': 1, 'time_in_force': 99999}))
+        tokens[trader] = new_tokens
+    return flow
+
+
+def time_batches(engine):
+    """ records (seconds, resting orders) for each batch an engine runs """
+    batch_times = []
+    run_batch = engine.run_batch
+    def timed_run_batch():
+        resting_orders = len(engine.orders)
+        start = time.perf_counter()
+        run_batch()
+        batch_times.append((time.perf_counter() - start, resting_orders))
+    engine.run_batch = timed_run_batch
+    return batch_times
+
+
+def run(engine_cls, flow, message_interval=0.001, **engine_kwargs):
+    scheduler = VirtualScheduler()
+    outbound = OutboundCounter()
+    engine = engine_cls(outbound, call_later=scheduler.call_later,
+        seconds=scheduler.seconds, **engine_kwargs)
+    batch_times = time_batches(engine) if hasattr(engine, 'run_batch') else []
+    engine.handle_message('reset_exchange', {'event_code': 'S'})
+    handle = engine.handle_message
+    advance = scheduler.advance
+    start = time.perf_counter()
+    for message_type, message in flow:
+        advance(message_interval)
+        handle(message_type, dict(message))
+    elapsed = time.perf_counter() - start
+    return engine, outbound, elapsed, batch_times
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='local exchange matching benchmark')
+    parser.add_argument('--mechanism', default='cda', choices=sorted(engines))
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--traders', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-length', type=float, default=3,
+        help='batch length in seconds, fba only')
+    parser.add_argument('--speed-bump', type=float, default=0.00035,
+        help='delay of inbound orders in seconds, iex only')
+    parser.add_argument('--peg-proportion', type=float, default=0)
+    parser.add_argument('--external-feed-rate', type=float, default=0)
+    parser.add_argument('--quotes', choices=('one-sided', 'two-sided'), default=None,
+        help='market maker repricing flow, two replaces or one quote per update')
+    options = parser.parse_args(args)
+    if options.quotes:
+        flow = generate_quote_flow(options.messages, num_traders=options.traders,
+            seed=options.seed, two_sided=options.quotes == 'two-sided')
+    else:
+        flow = generate_order_flow(options.messages, num_traders=options.traders,
+            seed=options.seed, peg_proportion=options.peg_proportion,
+            external_feed_rate=options.external_feed_rate)
+    engine_kwargs = {}
+    if options.mechanism == 'fba':
+        engine_kwargs['batch_length'] = options.batch_length
+    elif options.mechanism == 'iex':
+        engine_kwargs['speed_bump'] = options.speed_bump
+    engine, outbound, elapsed, batch_times = run(engines[options.mechanism], flow,
+        **engine_kwargs)
+    executions = outbound.counts.get('E', 0) // 2
+    print('mechanism:            %s' % options.mechanism)
+    print('inbound messages:     %d' % len(flow))
+    print('elapsed:              %.3f s' % elapsed)
+    print('throughput:           %.0f messages/s' % (len(flow) / elapsed))
+    print('mean latency:         %.2f us/message' % (elapsed / len(flow) * 1e6))
+    print('executions:           %d (%.0f/s)' % (executions, executions / elapsed))
+    print('outbound messages:    %s' % ', '.join('%s: %d' % kv for kv in
+        sorted(outbound.counts.items())))
+    print('resting orders:       %d, price levels: %d bid / %d ask' % (
+        len(engine.orders), len(engine.book.bids), len(engine.book.asks)))
+    if batch_times:
+        durations = [duration for duration, _ in batch_times]
+        print('batches:              %d, up to %d resting orders' % (
+            len(batch_times), max(resting for _, resting in batch_times)))
+        print('batch cross time:     %.2f ms mean, %.2f ms max' % (
+            sum(durations) / len(durations) * 1e3, max(durations) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import logging
+from .engine import MatchingEngine
+
+log = logging.getLogger(__name__)
+
+
+class CDAEngine(MatchingEngine):
+    """
+    continuous double auction, price-time priority,
+    trades at the price of the resting order
+    """
+
+    mechanism = 'cda'
+
+    def enter_order(self, message, outgoing):
+        if message['order_token'] in self.orders:
+            log.warning('duplicate order token %s, ignoring..' % message['order_token'])
+            return
+        order = self.new_order(message)
+        outgoing.append(('A', self.accepted_fields(order)))
+        self.match(order, outgoing)
+        self.place(order, outgoing)
+        self.check_bbo(outgoing)
+
+    def replace_order(self, message, outgoing):
+        existing_token = message['existing_order_token']
+        swapped = self.swap_order(existing_token, message['replacement_order_token'],
+            message['price'], message['shares'], message['time_in_force'])
+        if swapped is None:
+            return
+        replacement, keeps_priority = swapped
+        outgoing.append(('U', self.replaced_fields(replacement, existing_token)))
+        if not keeps_priority:
+            self.match(replacement, outgoing)
+            self.place(replacement, outgoing)
+        self.check_bbo(outgoing)
+
+    def quote(self, message, outgoing):
+        """ replaces both sides of a trader, then matches and updates the BBO once """
+        shares, time_in_force = message['shares'], message['time_in_force']
+        bid = self.swap_order(message['existing_bid_token'],
+            message['replacement_bid_token'], message['bid_price'], shares,
+            time_in_force)
+        offer = self.swap_order(message['existing_offer_token'],
+            message['replacement_offer_token'], message['offer_price'], shares,
+            time_in_force)
+        if bid is None and offer is None:
+            return
+        outgoing.append(('W', self.quote_fields(message, bid and bid[0],
+            offer and offer[0])))
+        for swapped in (bid, offer):
+            if swapped is not None and not swapped[1]:
+                self.match(swapped[0], outgoing)
+                self.place(swapped[0], outgoing)
+        self.check_bbo(outgoing)
+
+    def swap_order(self, existing_token, replacement_token, new_price, new_shares,
+            time_in_force):
+        """
+        replaces an order without matching it, 
+        returns the replacement and whether it kept its place in the book,
+        None if the order is gone.
+        """
+        order = self.orders.get(existing_token)
+        if order is None:
+            # order is gone, replace dies silently
+            log.debug('replace for unknown token %s, ignoring..' % existing_token)
+            return None
+        if new_shares == 0:
+            # replaced to nothing, the order leaves the book
+            self.unrest_order(order)
+            order.order_token = replacement_token
+            order.shares = 0
+            return order, True
+        if new_price == order.price and new_shares <= order.shares:
+            # keeps time priority
+            self.side_of(order).reduce(order, order.shares - new_shares)
+            del self.orders[existing_token]
+            timer = self.expiry_timers.pop(existing_token, None)
+            order.order_token = replacement_token
+            self.orders[replacement_token] = order
+            if timer is not None:
+                self.expiry_timers[replacement_token] = timer
+            return order, True
+        self.unrest_order(order)
+        replacement = self.new_order({
+            'buy_sell_indicator': order.buy_sell_indicator, 'price': new_price,
+            'shares': new_shares, 'time_in_force': time_in_force,
+            'firm': order.firm, 'midpoint_peg': order.midpoint_peg},
+            order_token=replacement_token)
+        return replacement, False
+
+    def cancel_order(self, message, outgoing):
+        order = self.orders.get(message['order_token'])
+        if order is None:
+            log.debug('cancel for unknown token %s, ignoring..' % message['order_token'])
+            return
+        self.remove_order(order, outgoing)
+        self.check_bbo(outgoing)
+
+    def place(self, order, outgoing):
+        if not order.shares:
+            return
+        if order.time_in_force == 0:
+            # immediate or cancel, the remainder dies
+            outgoing.append(('C', self.canceled_fields(order, order.shares, 'I')))
+        else:
+            self.rest_order(order)
+
+    def match(self, order, outgoing):
+        opposite = self.book.opposite(order.buy_sell_indicator)
+        while order.shares and opposite.crosses(order.price):
+            resting = opposite.best_level().front()
+            self.trade(resting, order, resting.price, outgoing)
+
+    def trade(self, resting, order, price, outgoing):
+        """ executes an incoming order against a resting one """
+        shares = min(order.shares, resting.shares)
+        match_number = next(self.match_number)
+        self.side_of(resting).reduce(resting, shares)
+        if not resting.is_live:
+            self.unrest_order(resting)
+        order.shares -= shares
+        outgoing.append(('E', self.executed_fields(resting, shares, price, 
+            match_number)))
+        outgoing.append(('E', self.executed_fields(order, shares, price, 
+            match_number)))
@@ -0,0 +1,218 @@
+from itertools import count
+import time
+import logging
+from .order_book import OrderBook, Order, MIN_BID, MAX_ASK
+
+log = logging.getLogger(__name__)
+
+# time in force values at or above this
+# are good until the session ends
+TIF_SESSION = 99998
+
+# tokens of a quote side that was not replaced, same as
+# hft.ouch_extensions.NO_TOKEN, engines do not need the OUCH libraries
+NO_TOKEN = ' ' * 14
+
+
+def nanoseconds_since_midnight():
+    return int((time.time() % 86400) * 1e9)
+
+
+class MatchingEngine:
+    """
+    base for the local stand-in exchanges,
+    consumes decoded OUCH client messages keyed by the message type names
+    the oTree side uses, see ouch.client_message_types, and
+    produces OUCH server messages as (header, fields) pairs.
+    all messages produced while handling one input are passed
+    to outbound in a single call so they can be written in one burst.
+    """
+
+    mechanism = None
+    message_dispatch = {
+        'enter': 'enter_order',
+        'replace': 'replace_order',
+        'cancel': 'cancel_order',
+        'mass_cancel': 'mass_cancel',
+        'quote': 'quote',
+        'reset_exchange': 'reset',
+        'external_feed': 'external_feed_change',
+    }
+
+    def __init__(self, outbound, call_later=None, clock=nanoseconds_since_midnight,
+            **kwargs):
+        self.outbound = outbound
+        # call_later(delay, func, *args) -> handle with cancel() and active(),
+        # twisted's reactor.callLater or anything alike
+        self.call_later = call_later
+        self.clock = clock
+        self.book = OrderBook()
+        self.orders = {}
+        self.expiry_timers = {}
+        self.match_number = count(1, 1)
+        self.order_reference_number = count(1, 1)
+        self.bbo = self.book.bbo()
+        self.e_best_bid = MIN_BID
+        self.e_best_offer = MAX_ASK
+        self.e_signed_volume = 0
+
+    def handle_message(self, message_type, message):
+        try:
+            handler_name = self.message_dispatch[message_type]
+        except KeyError:
+            log.warning('%s exchange: unsupported message type %s, ignoring..' % (
+                self.mechanism, message_type))
+            return
+        handler = getattr(self, handler_name)
+        outgoing = []
+        handler(message, outgoing)
+        if outgoing:
+            self.outbound(outgoing)
+
+    def reset(self, message, outgoing):
+        for timer in self.expiry_timers.values():
+            if timer.active():
+                timer.cancel()
+        self.expiry_timers.clear()
+        self.orders.clear()
+        self.book.clear()
+        self.bbo = self.book.bbo()
+        outgoing.append(('S', {'timestamp': self.clock(),
+            'event_code': message.get('event_code', 'S')}))
+
+    def external_feed_change(self, message, outgoing):
+        self.e_best_bid = message['e_best_bid']
+        self.e_best_offer = message['e_best_offer']
+        self.e_signed_volume = message['e_signed_volume']
+
+    def enter_order(self, message, outgoing):
+        raise NotImplementedError()
+
+    def replace_order(self, message, outgoing):
+        raise NotImplementedError()
+
+    def cancel_order(self, message, outgoing):
+        raise NotImplementedError()
+
+    def quote(self, message, outgoing):
+        raise NotImplementedError()
+
+    def mass_cancel(self, message, outgoing):
+        """
+        takes every order of the trader in the mass cancel token
+        off the book, acknowledged with a single message
+        """
+        token = message['order_token']
+        firm, side, trader = token[:4], token[4], token[5:9]
+        canceled = [order for order_token, order in self.orders.items() if
+            order_token[:4] == firm and order_token[5:9] == trader and
+            (side not in 'BS' or order.buy_sell_indicator == side)]
+        canceled_shares = 0
+        for order in canceled:
+            canceled_shares += order.shares
+            self.unrest_order(order)
+        outgoing.append(('Y', {'timestamp': self.clock(), 'order_token': token,
+            'canceled_orders': len(canceled), 'canceled_shares': canceled_shares}))
+        self.check_bbo(outgoing)
+
+    def new_order(self, message, order_token=None):
+        return Order(
+            order_token or message['order_token'], message['buy_sell_indicator'],
+            message['price'], message['shares'], message['time_in_force'],
+            firm=message.get('firm'), midpoint_peg=message.get('midpoint_peg', False),
+            order_reference_number=next(self.order_reference_number))
+
+    def side_of(self, order):
+        """ the book side an order rests on """
+        return self.book.side(order.buy_sell_indicator)
+
+    def rest_order(self, order):
+        self.side_of(order).add(order)
+        self.orders[order.order_token] = order
+        if self.call_later is not None and 0 < order.time_in_force < TIF_SESSION:
+            self.expiry_timers[order.order_token] = self.call_later(
+                order.time_in_force, self.expire_order, order.order_token)
+
+    def unrest_order(self, order):
+        self.side_of(order).remove(order)
+        self.orders.pop(order.order_token, None)
+        timer = self.expiry_timers.pop(order.order_token, None)
+        if timer is not None and timer.active():
+            timer.cancel()
+
+    def expire_order(self, order_token):
+        self.expiry_timers.pop(order_token, None)
+        order = self.orders.get(order_token)
+        if order is None:
+            return
+        outgoing = []
+        self.remove_order(order, outgoing, reason='T')
+        self.check_bbo(outgoing)
+        self.outbound(outgoing)
+
+    def remove_order(self, order, outgoing, reason='U'):
+        shares = order.shares
+        self.unrest_order(order)
+        outgoing.append(('C', self.canceled_fields(order, shares, reason)))
+
+    def check_bbo(self, outgoing):
+        bbo = self.book.bbo()
+        if bbo != self.bbo:
+            self.bbo = bbo
+            outgoing.append(('Q', self.bbo_fields(bbo)))
+
+    def accepted_fields(self, order):
+        return {
+            'timestamp': self.clock(), 'order_token': order.order_token,
+            'buy_sell_indicator': order.buy_sell_indicator, 'shares': order.shares,
+            'price': order.price, 'time_in_force': order.time_in_force,
+            'firm': order.firm, 'order_reference_number': order.order_reference_number,
+            'midpoint_peg': order.midpoint_peg}
+
+    def replaced_fields(self, order, previous_order_token):
+        fields = self.accepted_fields(order)
+        fields['replacement_order_token'] = fields.pop('order_token')
+        fields['previous_order_token'] = previous_order_token
+        return fields
+
+    def quote_fields(self, message, bid, offer):
+        """ bid and offer are the replacement orders, None if that replace died """
+        if bid is None:
+            previous_bid_token = replacement_bid_token = NO_TOKEN
+            bid_price = 0
+        else:
+            previous_bid_token = message['existing_bid_token']
+            replacement_bid_token, bid_price = bid.order_token, bid.price
+        if offer is None:
+            previous_offer_token = replacement_offer_token = NO_TOKEN
+            offer_price = 0
+        else:
+            previous_offer_token = message['existing_offer_token']
+            replacement_offer_token, offer_price = offer.order_token, offer.price
+        return {
+            'timestamp': self.clock(), 'previous_bid_token': previous_bid_token,
+            'replacement_bid_token': replacement_bid_token, 'bid_price': bid_price,
+            'previous_offer_token': previous_offer_token,
+            'replacement_offer_token': replacement_offer_token,
+            'offer_price': offer_price, 'shares': message['shares']}
+
+    def canceled_fields(self, order, decrement_shares, reason):
+        return {
+            'timestamp': self.clock(), 'order_token': order.order_token,
+            'decrement_shares': decrement_shares, 'reason': reason,
+            'midpoint_peg': order.midpoint_peg}
+
+    def executed_fields(self, order, shares, price, match_number):
+        return {
+            'timestamp': self.clock(), 'order_token': order.order_token,
+            'executed_shares': shares, 'execution_price': price,
+            'match_number': match_number, 'midpoint_peg': order.midpoint_peg}
+
+    def bbo_fields(self, bbo):
+        best_bid, volume_at_best_bid, best_ask, volume_at_best_ask, next_bid, \
+            next_ask = bbo
+        return {
+            'timestamp': self.clock(), 'best_bid': best_bid,
+            'volume_at_best_bid': volume_at_best_bid, 'best_ask': best_ask,
+            'volume_at_best_ask': volume_at_best_ask, 'next_bid': next_bid,
+            'next_ask': next_ask}
@@ -0,0 +1,164 @@
+import logging
+from .engine import MatchingEngine
+
+log = logging.getLogger(__name__)
+
+
+class FBAEngine(MatchingEngine):
+    """
+    frequent batch auction, orders rest without matching during a batch,
+    at the end of each batch the book is crossed at a uniform price
+    and the executions and the post batch (Z) message go out in one burst.
+    """
+
+    mechanism = 'fba'
+
+    def __init__(self, *args, batch_length=3, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_length = batch_length
+        self.batch_timer = None
+        self.ioc_orders = []
+        self.clearing_price = 0
+        self.transacted_volume = 0
+
+    def reset(self, message, outgoing):
+        super().reset(message, outgoing)
+        self.ioc_orders.clear()
+        if self.batch_timer is not None and self.batch_timer.active():
+            self.batch_timer.cancel()
+        self.batch_timer = None
+        self.schedule_batch()
+
+    def schedule_batch(self):
+        if self.call_later is None:
+            return
+        self.batch_timer = self.call_later(self.batch_length, self.run_batch)
+
+    def enter_order(self, message, outgoing):
+        if message['order_token'] in self.orders:
+            log.warning('duplicate order token %s, ignoring..' % message['order_token'])
+            return
+        order = self.new_order(message)
+        outgoing.append(('A', self.accepted_fields(order)))
+        self.rest_order(order)
+        if order.time_in_force == 0:
+            self.ioc_orders.append(order)
+
+    def replace_order(self, message, outgoing):
+        existing_token = message['existing_order_token']
+        replacement = self.swap_order(existing_token, message['replacement_order_token'],
+            message['price'], message['shares'], message['time_in_force'])
+        if replacement is not None:
+            outgoing.append(('U', self.replaced_fields(replacement, existing_token)))
+
+    def quote(self, message, outgoing):
+        shares, time_in_force = message['shares'], message['time_in_force']
+        bid = self.swap_order(message['existing_bid_token'],
+            message['replacement_bid_token'], message['bid_price'], shares,
+            time_in_force)
+        offer = self.swap_order(message['existing_offer_token'],
+            message['replacement_offer_token'], message['offer_price'], shares,
+            time_in_force)
+        if bid is not None or offer is not None:
+            outgoing.append(('W', self.quote_fields(message, bid, offer)))
+
+    def swap_order(self, existing_token, replacement_token, price, shares,
+            time_in_force):
+        order = self.orders.get(existing_token)
+        if order is None:
+            log.debug('replace for unknown token %s, ignoring..' % existing_token)
+            return None
+        self.unrest_order(order)
+        replacement = self.new_order({
+            'buy_sell_indicator': order.buy_sell_indicator, 'price': price,
+            'shares': shares, 'time_in_force': time_in_force,
+            'firm': order.firm, 'midpoint_peg': order.midpoint_peg},
+            order_token=replacement_token)
+        if not shares:
+            # replaced to nothing, the order leaves the book
+            return replacement
+        self.rest_order(replacement)
+        if replacement.time_in_force == 0:
+            self.ioc_orders.append(replacement)
+        return replacement
+
+    def cancel_order(self, message, outgoing):
+        order = self.orders.get(message['order_token'])
+        if order is None:
+            log.debug('cancel for unknown token %s, ignoring..' % message['order_token'])
+            return
+        self.remove_order(order, outgoing)
+
+    def check_bbo(self, outgoing):
+        # the book is only published with the post batch message
+        pass
+
+    def run_batch(self):
+        self.schedule_batch()
+        outgoing = []
+        self.cross(outgoing)
+        for order in self.ioc_orders:
+            if order.is_live:
+                self.remove_order(order, outgoing, reason='I')
+        self.ioc_orders.clear()
+        self.bbo = self.book.bbo()
+        fields = self.bbo_fields(self.bbo)
+        fields['clearing_price'] = self.clearing_price
+        fields['transacted_volume'] = self.transacted_volume
+        outgoing.append(('Z', fields))
+        self.outbound(outgoing)
+
+    def cross(self, outgoing):
+        """
+        walks the sorted demand and supply schedules down to where
+        they stop crossing, this gives the volume and the marginal bid
+        and ask, clearing price is the midpoint of the two.
+        then the top volume shares on each side execute in price-time priority.
+        O(L log L) for L price levels plus O(n) for executed orders.
+        """
+        bid_levels = self.book.bids.sorted_levels()
+        ask_levels = self.book.asks.sorted_levels()
+        volume = 0
+        i, j = 0, 0
+        bid_volume, ask_volume = None, None
+        marginal_bid, marginal_ask = None, None
+        while (i < len(bid_levels) and j < len(ask_levels) and
+                bid_levels[i].price >= ask_levels[j].price):
+            if bid_volume is None:
+                bid_volume = bid_levels[i].volume
+            if ask_volume is None:
+                ask_volume = ask_levels[j].volume
+            shares = min(bid_volume, ask_volume)
+            volume += shares
+            marginal_bid, marginal_ask = bid_levels[i].price, ask_levels[j].price
+            bid_volume -= shares
+            ask_volume -= shares
+            if not bid_volume:
+                i += 1
+                bid_volume = None
+            if not ask_volume:
+                j += 1
+                ask_volume = None
+        self.transacted_volume = volume
+        if not volume:
+            self.clearing_price = 0
+            return
+        self.clearing_price = (marginal_bid + marginal_ask) // 2
+        match_number = next(self.match_number)
+        for levels in (bid_levels, ask_levels):
+            self.fill(levels, volume, self.clearing_price, match_number, outgoing)
+        log.debug('batch crossed %s shares at %s' % (volume, self.clearing_price))
+
+    def fill(self, levels, volume, price, match_number, outgoing):
+        remaining = volume
+        for level in levels:
+            for order in list(level):
+                shares = min(order.shares, remaining)
+                self.side_of(order).reduce(order, shares)
+                if not order.is_live:
+                    self.unrest_order(order)
+                outgoing.append(('E', self.executed_fields(order, shares, price,
+                    match_number)))
+                remaining -= shares
+                if not remaining:
+                    return
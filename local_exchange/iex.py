@@ -0,0 +1,156 @@
+from collections import deque
+import logging
+import time
+from .cda import CDAEngine
+from .order_book import BookSide, MIN_BID, MAX_ASK
+
+log = logging.getLogger(__name__)
+
+# peg price in L messages while there is no midpoint,
+# see ELOTrader.peg_state_change
+NO_PEG_PRICE = -9999
+
+
+class IEXEngine(CDAEngine):
+    """
+    continuous double auction behind a speed bump,
+    order entry, replace and cancel messages wait speed_bump seconds
+    in a FIFO queue before they reach the book, the external feed does not.
+    midpoint pegged orders are not displayed and trade at the midpoint of
+    the best bid and offer across the book and the external feed,
+    the midpoint is rechecked on every BBO or external feed change
+    and reported with an L message when it or the peg state changes.
+    pegged orders are kept in their own book sides keyed by their limit,
+    the peg price lives on the engine so repricing touches no order,
+    among pegs the more aggressive limit goes first, then time.
+    """
+
+    mechanism = 'iex'
+    delayed_message_types = frozenset(('enter', 'replace', 'cancel', 'mass_cancel',
+        'quote'))
+
+    def __init__(self, *args, speed_bump=0.00035, seconds=time.monotonic, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.speed_bump = speed_bump
+        # clock of call_later, reactor.seconds with twisted
+        self.seconds = seconds
+        self.delay_queue = deque()
+        self.release_timer = None
+        self.peg_bids = BookSide('B')
+        self.peg_asks = BookSide('S')
+        self.peg_price = None
+        self.peg_state = 0
+
+    def handle_message(self, message_type, message):
+        if (message_type in self.delayed_message_types and self.speed_bump and
+                self.call_later is not None):
+            self.delay_queue.append((self.seconds() + self.speed_bump, message_type,
+                message))
+            if self.release_timer is None:
+                self.release_timer = self.call_later(self.speed_bump,
+                    self.release_delayed)
+            return
+        super().handle_message(message_type, message)
+
+    def release_delayed(self):
+        self.release_timer = None
+        queue = self.delay_queue
+        now = self.seconds()
+        while queue and queue[0][0] <= now:
+            _, message_type, message = queue.popleft()
+            super().handle_message(message_type, message)
+        if queue:
+            self.release_timer = self.call_later(queue[0][0] - now,
+                self.release_delayed)
+
+    def reset(self, message, outgoing):
+        self.delay_queue.clear()
+        if self.release_timer is not None and self.release_timer.active():
+            self.release_timer.cancel()
+        self.release_timer = None
+        self.peg_bids.clear()
+        self.peg_asks.clear()
+        self.peg_price = None
+        self.peg_state = 0
+        super().reset(message, outgoing)
+
+    def external_feed_change(self, message, outgoing):
+        super().external_feed_change(message, outgoing)
+        self.check_peg(outgoing)
+
+    def side_of(self, order):
+        if order.midpoint_peg:
+            return self.peg_bids if order.buy_sell_indicator == 'B' else self.peg_asks
+        return self.book.side(order.buy_sell_indicator)
+
+    def match(self, order, outgoing):
+        is_bid = order.buy_sell_indicator == 'B'
+        opposite_pegs = self.peg_asks if is_bid else self.peg_bids
+        if order.midpoint_peg:
+            # the midpoint is inside the BBO so only pegs trade with pegs
+            peg_price = self.peg_price
+            if peg_price is None or (order.price < peg_price if is_bid else
+                    order.price > peg_price):
+                return
+            while order.shares and opposite_pegs.crosses(peg_price):
+                resting = opposite_pegs.best_level().front()
+                self.trade(resting, order, peg_price, outgoing)
+            return
+        opposite = self.book.opposite(order.buy_sell_indicator)
+        while order.shares:
+            level = opposite.best_level() if opposite.crosses(order.price) else None
+            resting = None
+            peg_price = self.peg_price
+            if peg_price is not None and opposite_pegs.crosses(peg_price) and (
+                    order.price >= peg_price if is_bid else order.price <= peg_price):
+                # displayed orders first at the same price
+                if level is None or (peg_price < level.price if is_bid else
+                        peg_price > level.price):
+                    resting = opposite_pegs.best_level().front()
+            if resting is not None:
+                self.trade(resting, order, peg_price, outgoing)
+            elif level is not None:
+                resting = level.front()
+                self.trade(resting, order, resting.price, outgoing)
+            else:
+                break
+
+    def check_bbo(self, outgoing):
+        super().check_bbo(outgoing)
+        self.check_peg(outgoing)
+
+    def midpoint(self):
+        best_bid = max(self.bbo[0], self.e_best_bid)
+        best_ask = min(self.bbo[2], self.e_best_offer)
+        if best_bid <= MIN_BID or best_ask >= MAX_ASK or best_bid >= best_ask:
+            return None
+        return (best_bid + best_ask) // 2
+
+    def check_peg(self, outgoing):
+        peg_price = self.midpoint()
+        repriced = peg_price != self.peg_price
+        if repriced:
+            self.peg_price = peg_price
+            if peg_price is not None:
+                self.cross_pegs(peg_price, outgoing)
+        peg_state = int(peg_price is not None and
+            bool(len(self.peg_bids) or len(self.peg_asks)))
+        if repriced or peg_state != self.peg_state:
+            self.peg_state = peg_state
+            outgoing.append(('L', {'timestamp': self.clock(),
+                'peg_price': NO_PEG_PRICE if peg_price is None else peg_price,
+                'peg_state': peg_state}))
+
+    def cross_pegs(self, peg_price, outgoing):
+        """ pegs resting on both sides trade once there is a midpoint again """
+        while self.peg_bids.crosses(peg_price) and self.peg_asks.crosses(peg_price):
+            bid = self.peg_bids.best_level().front()
+            ask = self.peg_asks.best_level().front()
+            shares = min(bid.shares, ask.shares)
+            match_number = next(self.match_number)
+            for order in (bid, ask):
+                self.side_of(order).reduce(order, shares)
+                if not order.is_live:
+                    self.unrest_order(order)
+                outgoing.append(('E', self.executed_fields(order, shares, peg_price,
+                    match_number)))
@@ -0,0 +1,207 @@
+from collections import deque
+from heapq import heappush, heappop
+import logging
+
+log = logging.getLogger(__name__)
+
+MIN_BID = 0
+MAX_ASK = 2147483647
+
+
+class Order:
+
+    __slots__ = (
+        'order_token', 'buy_sell_indicator', 'price', 'shares', 'time_in_force',
+        'firm', 'midpoint_peg', 'order_reference_number', 'is_live', 'queued_in')
+
+    def __init__(self, order_token, buy_sell_indicator, price, shares,
+            time_in_force, firm=None, midpoint_peg=False, order_reference_number=0):
+        self.order_token = order_token
+        self.buy_sell_indicator = buy_sell_indicator
+        self.price = price
+        self.shares = shares
+        self.time_in_force = time_in_force
+        self.firm = firm
+        self.midpoint_peg = midpoint_peg
+        self.order_reference_number = order_reference_number
+        self.is_live = False
+        # price level whose queue holds the order, live or dead
+        self.queued_in = None
+
+    def __str__(self):
+        return '<Order {self.order_token}: {self.buy_sell_indicator} \
+{self.shares}@{self.price} tif: {self.time_in_force}>'.format(self=self)
+
+
+class PriceLevel:
+    """
+    orders at a price in time priority,
+    removed orders are only marked dead and skipped later
+    so removal is O(1). an order is in the queue at most once.
+    """
+
+    __slots__ = ('price', 'orders', 'volume', 'live_orders')
+
+    def __init__(self, price):
+        self.price = price
+        self.orders = deque()
+        self.volume = 0
+        self.live_orders = 0
+
+    def front(self):
+        orders = self.orders
+        while not orders[0].is_live:
+            orders.popleft().queued_in = None
+        return orders[0]
+
+    def __iter__(self):
+        return (o for o in self.orders if o.is_live)
+
+
+class BookSide:
+    """
+    price levels of one side of the book,
+    a heap of level prices gives the best price in O(log n),
+    prices of emptied levels are removed from the heap lazily
+    """
+
+    def __init__(self, buy_sell_indicator):
+        self.buy_sell_indicator = buy_sell_indicator
+        self.is_bid = buy_sell_indicator == 'B'
+        self.empty_price = MIN_BID if self.is_bid else MAX_ASK
+        self.levels = {}
+        self._prices = []
+        # keeps the heap free of duplicate prices
+        self._prices_in_heap = set()
+
+    def _heap_key(self, price):
+        return -price if self.is_bid else price
+
+    def _clean_top(self):
+        prices = self._prices
+        levels = self.levels
+        while prices:
+            price = -prices[0] if self.is_bid else prices[0]
+            if price in levels:
+                return levels[price]
+            heappop(prices)
+            self._prices_in_heap.discard(price)
+        return None
+
+    def add(self, order):
+        price = order.price
+        level = self.levels.get(price)
+        if level is None:
+            level = PriceLevel(price)
+            self.levels[price] = level
+            if price not in self._prices_in_heap:
+                heappush(self._prices, self._heap_key(price))
+                self._prices_in_heap.add(price)
+        if order.queued_in is level:
+            # removed and added again before its dead entry was
+            # skipped, it goes to the back of the queue once
+            level.orders.remove(order)
+        level.orders.append(order)
+        order.queued_in = level
+        level.volume += order.shares
+        level.live_orders += 1
+        order.is_live = True
+
+    def remove(self, order):
+        if not order.is_live:
+            return
+        order.is_live = False
+        level = self.levels[order.price]
+        level.volume -= order.shares
+        level.live_orders -= 1
+        if level.live_orders == 0:
+            del self.levels[order.price]
+
+    def reduce(self, order, shares):
+        """ takes shares off an order, removes it once it has no shares left """
+        if shares >= order.shares:
+            self.remove(order)
+            order.shares = 0
+        else:
+            order.shares -= shares
+            self.levels[order.price].volume -= shares
+
+    def best_level(self):
+        return self._clean_top()
+
+    def best_price(self):
+        level = self._clean_top()
+        return level.price if level is not None else self.empty_price
+
+    def next_price(self):
+        """ second best price in O(log n) """
+        best = self._clean_top()
+        if best is None:
+            return self.empty_price
+        top = heappop(self._prices)
+        self._prices_in_heap.discard(best.price)
+        following = self._clean_top()
+        heappush(self._prices, top)
+        self._prices_in_heap.add(best.price)
+        return following.price if following is not None else self.empty_price
+
+    def volume_at(self, price):
+        level = self.levels.get(price)
+        return level.volume if level is not None else 0
+
+    def crosses(self, price):
+        """ true if an order at price on the other side trades against this side """
+        best = self._clean_top()
+        if best is None:
+            return False
+        return price <= best.price if self.is_bid else price >= best.price
+
+    def sorted_levels(self):
+        return sorted(self.levels.values(), key=lambda l: l.price,
+            reverse=self.is_bid)
+
+    def clear(self):
+        for level in self.levels.values():
+            for order in level.orders:
+                order.is_live = False
+                order.queued_in = None
+        self.levels.clear()
+        self._prices.clear()
+        self._prices_in_heap.clear()
+
+    def __len__(self):
+        return len(self.levels)
+
+
+class OrderBook:
+
+    def __init__(self):
+        self.bids = BookSide('B')
+        self.asks = BookSide('S')
+
+    def side(self, buy_sell_indicator):
+        return self.bids if buy_sell_indicator == 'B' else self.asks
+
+    def opposite(self, buy_sell_indicator):
+        return self.asks if buy_sell_indicator == 'B' else self.bids
+
+    def bbo(self):
+        best_bid = self.bids.best_price()
+        best_ask = self.asks.best_price()
+        return (best_bid, self.bids.volume_at(best_bid), best_ask,
+            self.asks.volume_at(best_ask), self.bids.next_price(),
+            self.asks.next_price())
+
+    def clear(self):
+        self.bids.clear()
+        self.asks.clear()
+
+    def __str__(self):
+        def side_str(side):
+            return '\n'.join('    %s: %s' % (l.price, l.volume)
+                for l in side.sorted_levels())
+        return """Order Book:
+  Asks:
+{asks}
+  Bids:
+{bids}""".format(asks=side_str(self.asks), bids=side_str(self.bids))
@@ -0,0 +1,111 @@
+"""
+OUCH codec of the local exchange. the message layouts are the exchange
+server's ouch_messages, the protocol library both sides of the wire
+share. the mass cancel and quote extensions of hft.ouch_extensions are
+repeated here, the local exchange runs without the oTree app.
+"""
+from exchange_server.OuchServer.ouch_messages import (
+    OuchClientMessages, OuchServerMessages)
+import struct
+import logging
+
+log = logging.getLogger(__name__)
+
+# message type names are the ones the oTree side uses
+# to encode client messages, see hft.translator
+client_message_types = {
+    OuchClientMessages.EnterOrder: 'enter',
+    OuchClientMessages.ReplaceOrder: 'replace',
+    OuchClientMessages.CancelOrder: 'cancel',
+    OuchClientMessages.SystemStart: 'reset_exchange',
+    OuchClientMessages.ExternalFeedChange: 'external_feed',
+}
+
+# header: (message type, payload struct, fields)
+client_extensions = {
+    b'Y': ('mass_cancel', struct.Struct('!14s'), ('order_token', )),
+    b'W': ('quote', struct.Struct('!14s14sI14s14sIII'), ('existing_bid_token',
+        'replacement_bid_token', 'bid_price', 'existing_offer_token',
+        'replacement_offer_token', 'offer_price', 'shares', 'time_in_force')),
+}
+server_extensions = {
+    b'Y': (struct.Struct('!Q14sII'), ('timestamp', 'order_token', 'canceled_orders',
+        'canceled_shares')),
+    b'W': (struct.Struct('!Q14s14sI14s14sII'), ('timestamp', 'previous_bid_token',
+        'replacement_bid_token', 'bid_price', 'previous_offer_token',
+        'replacement_offer_token', 'offer_price', 'shares')),
+}
+
+server_defaults = {
+    'stock': b'AMAZGOOG',
+    'display': b'Y',
+    'capacity': b'P',
+    'iso': b'N',
+    'intermarket_sweep_eligibility': b'N',
+    'minimum_quantity': 0,
+    'min_quantity': 0,
+    'cross_type': b'N',
+    'customer_type': b'R',
+    'order_state': b'L',
+    'bbo_weight_indicator': b' ',
+    'liquidity_flag': b'A',
+    'order_reference_number': 0,
+    'firm': b'    ',
+    'midpoint_peg': False,
+}
+
+
+def as_text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def client_message_size(header: bytes):
+    """ size of a client message including its header, None if unknown """
+    if header in client_extensions:
+        return 1 + client_extensions[header][1].size
+    try:
+        message_spec = OuchClientMessages.lookup_by_header_bytes(header)
+    except Exception:
+        return None
+    return 1 + message_spec.payload_size
+
+
+def decode_client_message(frame: bytes):
+    header = bytes(frame[:1])
+    if header in client_extensions:
+        message_type, payload, fields = client_extensions[header]
+        values = payload.unpack_from(frame, 1)
+        return message_type, {field: as_text(value) for field, value in
+            zip(fields, values)}
+    message_spec = OuchClientMessages.lookup_by_header_bytes(header)
+    message_type = client_message_types.get(message_spec)
+    body = message_spec.from_bytes(frame[1: 1 + message_spec.payload_size],
+        header=False)
+    message = {k: as_text(v) for k, v in body.iteritems()}
+    return message_type, message
+
+
+def server_message_values(header, slots, fields):
+    values = []
+    for slot in slots:
+        value = fields.get(slot)
+        if value is None:
+            value = server_defaults.get(slot)
+        if isinstance(value, str):
+            value = bytes(value, 'utf8')
+        if value is None:
+            raise KeyError('field %s is missing in %s message %s' % (slot, header,
+                fields))
+        values.append(value)
+    return values
+
+
+def encode_server_message(header: str, fields: dict) -> bytes:
+    header = header.encode('utf-8')
+    if header in server_extensions:
+        payload, slots = server_extensions[header]
+        return header + payload.pack(*server_message_values(header, slots, fields))
+    message_spec = OuchServerMessages.lookup_by_header_bytes(header)
+    slots = message_spec.PayloadCls.__slots__
+    values = server_message_values(header, slots, fields)
+    return bytes(message_spec(**dict(zip(slots, values))))
@@ -0,0 +1,144 @@
+"""
+local stand-in for the exchange server, speaks OUCH
+over TCP to hft.exchange connections.
+
+    python -m local_exchange.server --port 9001 --mechanism cda
+    python -m local_exchange.server --port 9001 --mechanism fba --batch-length 3
+    python -m local_exchange.server --port 9001 --mechanism iex --speed-bump 0.00035
+
+with --multiplexed every frame is expected to carry the
+market tag header of hft.exchange.MultiplexedOUCH and
+each market tag gets its own matching engine.
+"""
+import argparse
+import logging
+import struct
+import sys
+from functools import partial
+from twisted.internet import reactor
+from twisted.internet.protocol import Protocol, ServerFactory
+from .ouch import client_message_size, decode_client_message, encode_server_message
+from .cda import CDAEngine
+from .fba import FBAEngine
+from .iex import IEXEngine
+
+log = logging.getLogger(__name__)
+
+# same as hft.exchange.market_tag_header
+market_tag_header = struct.Struct('!H')
+
+engines = {
+    'cda': CDAEngine,
+    'fba': FBAEngine,
+    'iex': IEXEngine,
+}
+
+
+class LocalExchangeProtocol(Protocol):
+
+    def __init__(self):
+        self.stream = bytearray()
+
+    def connectionMade(self):
+        log.info('client connected: %s' % self.transport.getPeer())
+        self.factory.connection = self
+
+    def connectionLost(self, reason):
+        log.info('client disconnected: %s' % reason)
+        if self.factory.connection is self:
+            self.factory.connection = None
+
+    def dataReceived(self, data):
+        stream = self.stream
+        stream.extend(data)
+        tag_size = market_tag_header.size if self.factory.multiplexed else 0
+        offset = 0
+        while len(stream) - offset > tag_size:
+            header = bytes(stream[offset + tag_size: offset + tag_size + 1])
+            message_size = client_message_size(header)
+            if message_size is None:
+                log.error('unknown header %s, dropping %s bytes..', header, 
+                    len(stream) - offset)
+                offset = len(stream)
+                break
+            frame_end = offset + tag_size + message_size
+            if len(stream) < frame_end:
+                break
+            market_tag = None
+            if tag_size:
+                market_tag, = market_tag_header.unpack_from(stream, offset)
+            frame = bytes(stream[offset + tag_size: frame_end])
+            offset = frame_end
+            try:
+                message_type, message = decode_client_message(frame)
+                self.factory.get_engine(market_tag).handle_message(
+                    message_type, message)
+            except Exception:
+                log.exception('error handling frame %s (market tag: %s), ignoring..',
+                    frame, market_tag)
+        del stream[:offset]
+
+    def write_messages(self, market_tag, messages):
+        prefix = b''
+        if market_tag is not None:
+            prefix = market_tag_header.pack(market_tag)
+        burst = b''.join(prefix + encode_server_message(header, fields) 
+            for header, fields in messages)
+        self.transport.write(burst)
+
+
+class LocalExchangeFactory(ServerFactory):
+    protocol = LocalExchangeProtocol
+
+    def __init__(self, engine_cls, multiplexed=False, **engine_kwargs):
+        self.engine_cls = engine_cls
+        self.engine_kwargs = engine_kwargs
+        self.multiplexed = multiplexed
+        self.engines = {}
+        self.connection = None
+
+    def get_engine(self, market_tag):
+        if market_tag not in self.engines:
+            self.engines[market_tag] = self.engine_cls(
+                partial(self.send, market_tag), call_later=reactor.callLater,
+                seconds=reactor.seconds, **self.engine_kwargs)
+            log.info('%s engine created for market tag %s' % (
+                self.engine_cls.mechanism, market_tag))
+        return self.engines[market_tag]
+
+    def send(self, market_tag, messages):
+        if self.connection is None:
+            log.warning('no client connected, dropping %s messages.' % len(messages))
+            return
+        self.connection.write_messages(market_tag, messages)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='local stand-in exchange')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9001)
+    parser.add_argument('--mechanism', default='cda', choices=sorted(engines))
+    parser.add_argument('--multiplexed', action='store_true')
+    parser.add_argument('--batch-length', type=float, default=3,
+        help='batch length in seconds, fba only')
+    parser.add_argument('--speed-bump', type=float, default=0.00035,
+        help='delay of inbound orders in seconds, iex only')
+    parser.add_argument('--debug', action='store_true')
+    options = parser.parse_args(args)
+    logging.basicConfig(stream=sys.stdout, format='[%(asctime)s] %(message)s',
+        level=logging.DEBUG if options.debug else logging.INFO)
+    engine_kwargs = {}
+    if options.mechanism == 'fba':
+        engine_kwargs['batch_length'] = options.batch_length
+    elif options.mechanism == 'iex':
+        engine_kwargs['speed_bump'] = options.speed_bump
+    factory = LocalExchangeFactory(engines[options.mechanism], 
+        multiplexed=options.multiplexed, **engine_kwargs)
+    reactor.listenTCP(options.port, factory, interface=options.host)
+    log.info('%s exchange listening at %s:%s' % (options.mechanism, options.host, 
+        options.port))
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import pytest
+
+from hft.backpressure import DROP_STALE, BackpressureMonitor, parse_ack
+
+
+def test_parse_ack():
+    assert parse_ack('{"type":"ack","received":42}') == 42
+    assert parse_ack('{"type":"slider"}') is None
+
+
+def test_lag_counts_group_and_direct_frames():
+    monitor = BackpressureMonitor(DROP_STALE, max_lag=8)
+    monitor.group_sent('3', 'json')
+    monitor.connected('a', '7', 3, 'json', frames_sent=1)
+    monitor.group_sent('3', 'json')
+    monitor.group_sent('3', 'json')
+    monitor.group_sent('3', 'compact')
+    monitor.direct_sent('a')
+    connection = monitor.connections['a']
+    # frames sent to the group before it joined do not count
+    assert monitor.lag(connection) == 4
+    monitor.acknowledged('a', 3)
+    assert monitor.lag(connection) == 1
+
+
+def test_slow_connection_recovers_under_a_quarter_of_the_limit():
+    monitor = BackpressureMonitor(DROP_STALE, max_lag=8)
+    monitor.connected('a', 7, 3, 'json')
+    for _ in range(9):
+        monitor.group_sent('3', 'json')
+    connection = monitor.acknowledged('a', 0)
+    assert connection is not None and connection.slow
+    assert monitor.slow_connections('3') == [connection]
+    # a slow connection is out of the group, group frames no longer count
+    monitor.group_sent('3', 'json')
+    assert monitor.lag(connection) == 9
+    assert monitor.acknowledged('a', 6) is None
+    assert monitor.acknowledged('a', 7) is connection
+    assert not connection.slow
+    assert connection.max_lag == 9
+    monitor.group_sent('3', 'json')
+    assert monitor.lag(connection) == 3
+
+
+def test_unknown_connections_are_ignored():
+    monitor = BackpressureMonitor(DROP_STALE, max_lag=8)
+    assert monitor.acknowledged('gone', 5) is None
+    monitor.direct_sent('gone')
+    assert monitor.disconnected('gone') is None
+    assert monitor.report() == 'no connections'
+
+
+def test_snapshot_due_at_most_once_per_interval():
+    monitor = BackpressureMonitor(DROP_STALE, max_lag=8)
+    monitor.connected('a', 7, 3, 'json')
+    connection = monitor.connections['a']
+    assert monitor.snapshot_due(connection)
+    assert not monitor.snapshot_due(connection)
+    connection.snapshot_sent_at -= monitor.snapshot_interval
+    assert monitor.snapshot_due(connection)
+
+
+def test_invalid_policy():
+    with pytest.raises(Exception):
+        BackpressureMonitor('unbounded')
@@ -0,0 +1,186 @@
+from local_exchange.benchmark import VirtualScheduler
+from local_exchange.cda import CDAEngine
+from local_exchange.engine import NO_TOKEN
+from local_exchange.order_book import BookSide, Order
+
+
+def make_engine(**kwargs):
+    sent = []
+    scheduler = VirtualScheduler()
+    engine = CDAEngine(sent.extend, call_later=scheduler.call_later, clock=lambda: 0,
+        **kwargs)
+    return engine, sent, scheduler
+
+
+def enter(engine, token, side, price, shares=1, time_in_force=99999):
+    engine.handle_message('enter', {'order_token': token, 'buy_sell_indicator': side,
+        'price': price, 'shares': shares, 'time_in_force': time_in_force,
+        'firm': token[:4]})
+
+
+def headers(sent):
+    return [header for header, _ in sent]
+
+
+def test_resting_order_sets_bbo():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 100)
+    assert headers(sent) == ['A', 'Q']
+    assert sent[-1][1]['best_bid'] == 100
+    assert sent[-1][1]['volume_at_best_bid'] == 1
+
+
+def test_crossing_order_trades_at_resting_price():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAS000100001', 'S', 100)
+    enter(engine, 'BBBBB000200001', 'B', 105)
+    executions = [fields for header, fields in sent if header == 'E']
+    assert [fields['order_token'] for fields in executions] == [
+        'AAAAS000100001', 'BBBBB000200001']
+    assert all(fields['execution_price'] == 100 for fields in executions)
+    assert not engine.orders
+
+
+def test_time_priority_within_a_level():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAS000100001', 'S', 100)
+    enter(engine, 'BBBBS000200001', 'S', 100)
+    enter(engine, 'CCCCB000300001', 'B', 100)
+    executed = [fields['order_token'] for header, fields in sent if header == 'E']
+    assert executed[0] == 'AAAAS000100001'
+    assert 'BBBBS000200001' in engine.orders
+
+
+def test_immediate_or_cancel_remainder_is_canceled():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 100, time_in_force=0)
+    assert 'C' in headers(sent)
+    assert not engine.orders
+    assert not engine.book.bids.levels
+
+
+def test_replace_keeps_priority_at_same_price_and_fewer_shares():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAS000100001', 'S', 100, shares=2)
+    enter(engine, 'BBBBS000200001', 'S', 100)
+    engine.handle_message('replace', {'existing_order_token': 'AAAAS000100001',
+        'replacement_order_token': 'AAAAS000100002', 'price': 100, 'shares': 1,
+        'time_in_force': 99999})
+    assert list(engine.orders) == ['BBBBS000200001', 'AAAAS000100002']
+    front = engine.book.asks.best_level().front()
+    assert front.order_token == 'AAAAS000100002'
+    assert engine.book.asks.volume_at(100) == 2
+
+
+def test_replace_to_zero_shares_takes_the_order_off():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 100)
+    engine.handle_message('replace', {'existing_order_token': 'AAAAB000100001',
+        'replacement_order_token': 'AAAAB000100002', 'price': 100, 'shares': 0,
+        'time_in_force': 99999})
+    assert sent[-2][0] == 'U'
+    assert sent[-2][1]['shares'] == 0
+    assert not engine.orders
+    assert not engine.book.bids.levels
+
+
+def test_replace_of_unknown_order_dies_silently():
+    engine, sent, _ = make_engine()
+    engine.handle_message('replace', {'existing_order_token': 'AAAAB000100001',
+        'replacement_order_token': 'AAAAB000100002', 'price': 100, 'shares': 1,
+        'time_in_force': 99999})
+    assert sent == []
+
+
+def quote(engine, bid_tokens, bid_price, offer_tokens, offer_price, shares=1):
+    engine.handle_message('quote', {'existing_bid_token': bid_tokens[0],
+        'replacement_bid_token': bid_tokens[1], 'bid_price': bid_price,
+        'existing_offer_token': offer_tokens[0],
+        'replacement_offer_token': offer_tokens[1], 'offer_price': offer_price,
+        'shares': shares, 'time_in_force': 99999})
+
+
+def test_quote_replaces_both_sides_with_one_bbo_update():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 90)
+    enter(engine, 'AAAAS000100002', 'S', 110)
+    del sent[:]
+    quote(engine, ('AAAAB000100001', 'AAAAB000100003'), 95,
+        ('AAAAS000100002', 'AAAAS000100004'), 105)
+    assert headers(sent) == ['W', 'Q']
+    ack = sent[0][1]
+    assert (ack['previous_bid_token'], ack['replacement_bid_token'],
+        ack['bid_price']) == ('AAAAB000100001', 'AAAAB000100003', 95)
+    assert (ack['previous_offer_token'], ack['replacement_offer_token'],
+        ack['offer_price']) == ('AAAAS000100002', 'AAAAS000100004', 105)
+    assert (sent[1][1]['best_bid'], sent[1][1]['best_ask']) == (95, 105)
+    assert set(engine.orders) == {'AAAAB000100003', 'AAAAS000100004'}
+
+
+def test_quote_side_that_is_gone_has_blank_tokens():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 90)
+    del sent[:]
+    quote(engine, ('AAAAB000100001', 'AAAAB000100003'), 95,
+        ('AAAAS000100002', 'AAAAS000100004'), 105)
+    ack = sent[0][1]
+    assert ack['replacement_bid_token'] == 'AAAAB000100003'
+    assert ack['previous_offer_token'] == ack['replacement_offer_token'] == NO_TOKEN
+    assert ack['offer_price'] == 0
+    quote(engine, ('gone', 'AAAAB000100005'), 95, ('gone', 'AAAAS000100006'), 105)
+    assert headers(sent) == ['W', 'Q']
+
+
+def test_quote_matches_after_both_sides_are_replaced():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 90)
+    enter(engine, 'AAAAS000100002', 'S', 110)
+    enter(engine, 'BBBBS000200001', 'S', 100)
+    del sent[:]
+    quote(engine, ('AAAAB000100001', 'AAAAB000100003'), 100,
+        ('AAAAS000100002', 'AAAAS000100004'), 105)
+    assert headers(sent) == ['W', 'E', 'E', 'Q']
+    assert set(engine.orders) == {'AAAAS000100004'}
+
+
+def test_mass_cancel_takes_one_trader_side():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 90)
+    enter(engine, 'AAAAS000100002', 'S', 110)
+    enter(engine, 'BBBBB000200001', 'B', 91)
+    engine.handle_message('mass_cancel', {'order_token': 'AAAAB000100003'})
+    acks = [fields for header, fields in sent if header == 'Y']
+    assert acks[0]['canceled_orders'] == 1
+    assert set(engine.orders) == {'AAAAS000100002', 'BBBBB000200001'}
+
+
+def test_orders_expire_after_their_time_in_force():
+    engine, sent, scheduler = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 100, time_in_force=5)
+    scheduler.advance(4)
+    assert 'AAAAB000100001' in engine.orders
+    scheduler.advance(2)
+    assert not engine.orders
+    assert sent[-2] == ('C', {'timestamp': 0, 'order_token': 'AAAAB000100001',
+        'decrement_shares': 1, 'reason': 'T', 'midpoint_peg': False})
+
+
+def test_reset_clears_the_book():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 100)
+    engine.handle_message('reset_exchange', {'event_code': 'S'})
+    assert not engine.orders
+    assert engine.book.bids.best_price() == engine.book.bids.empty_price
+
+
+def test_readded_order_is_queued_once():
+    side = BookSide('B')
+    first, second = Order('t1', 'B', 10, 1, 99), Order('t2', 'B', 10, 1, 99)
+    side.add(first)
+    side.add(second)
+    side.remove(first)
+    side.add(first)
+    level = side.levels[10]
+    assert [order.order_token for order in level] == ['t2', 't1']
+    assert len(level.orders) == 2
+    assert level.front() is second
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip('exchange_server.OuchServer.ouch_messages')
+pytest.importorskip('pytz')
+
+from hft.compact_frames import (COMPACT, JSON, InboundFrameParser,
+    get_frame_format)
+
+
+def test_order_frames_become_typed_messages():
+    parser = InboundFrameParser()
+    schema_id, fields = parser.schemas['order_entered']
+    assert fields == ('price', 'buy_sell_indicator', 'midpoint_peg')
+    assert parser.parse('[%d, 100, "B", 0]' % schema_id) == {
+        'type': 'order_entered', 'price': 100, 'buy_sell_indicator': 'B',
+        'midpoint_peg': False}
+
+
+def test_slider_frames():
+    parser = InboundFrameParser()
+    schema_id, _ = parser.schemas['slider']
+    assert parser.parse_frame([schema_id, 0.5, 1, 0]) == {'type': 'slider',
+        'a_x': 0.5, 'a_y': 1.0, 'a_z': 0.0}
+
+
+@pytest.mark.parametrize('frame', [[99, 1, 2, 3], [1], [1, 'x', 'B', 0], 7])
+def test_invalid_frames(frame):
+    with pytest.raises(Exception, match='invalid inbound frame'):
+        InboundFrameParser().parse_frame(frame)
+
+
+def test_schema_table_follows_type_names():
+    assert InboundFrameParser().schema_table() == {
+        1: {'type': 'order_entered', 'fields': ('price', 'buy_sell_indicator',
+            'midpoint_peg')},
+        2: {'type': 'slider', 'fields': ('a_x', 'a_y', 'a_z')}}
+
+
+def test_frame_format():
+    assert get_frame_format(b'format=compact') == COMPACT
+    assert get_frame_format('a=1&format=json') == JSON
+    assert get_frame_format(None) == JSON
@@ -0,0 +1,35 @@
+from hft.connections import ConnectionRegistry
+
+
+def test_connect_and_disconnect():
+    registry = ConnectionRegistry()
+    registry.connect('a', '7', 3, 'json')
+    registry.connect('b', '8', 3, 'compact')
+    assert registry.get('a').player_id == 7
+    assert registry.count('3') == 2
+    assert registry.count('3', 'json') == 1
+    assert registry.disconnect('a').channel_name == 'a'
+    assert registry.disconnect('a') is None
+    assert registry.get('a') is None
+    assert registry.counts() == {'3': 1}
+
+
+def test_player_connection_is_the_newest():
+    registry = ConnectionRegistry()
+    registry.connect('a', 7, 3, 'json')
+    registry.connect('b', 7, 3, 'json')
+    assert registry.player_connection(7).channel_name == 'b'
+    registry.disconnect('b')
+    assert registry.player_connection(7).channel_name == 'a'
+    registry.disconnect('a')
+    assert registry.player_connection(7) is None
+    assert registry.player_connections == {}
+
+
+def test_reconnecting_a_channel_moves_it():
+    registry = ConnectionRegistry()
+    registry.connect('a', 7, 3, 'json')
+    registry.connect('a', 7, 4, 'json')
+    assert registry.count('3') == 0
+    assert registry.count('4') == 1
+    assert registry.player_connections == {7: ['a']}
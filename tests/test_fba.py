@@ -0,0 +1,94 @@
+from local_exchange.benchmark import VirtualScheduler
+from local_exchange.fba import FBAEngine
+
+
+def make_engine(batch_length=3):
+    sent = []
+    scheduler = VirtualScheduler()
+    engine = FBAEngine(sent.extend, call_later=scheduler.call_later, clock=lambda: 0,
+        batch_length=batch_length)
+    engine.handle_message('reset_exchange', {'event_code': 'S'})
+    sent.clear()
+    return engine, sent, scheduler
+
+
+def enter(engine, token, side, price, shares=1, time_in_force=99999):
+    engine.handle_message('enter', {'order_token': token, 'buy_sell_indicator': side,
+        'price': price, 'shares': shares, 'time_in_force': time_in_force,
+        'firm': token[:4]})
+
+
+def test_orders_rest_without_matching_during_a_batch():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 105)
+    enter(engine, 'BBBBS000200001', 'S', 100)
+    assert [header for header, _ in sent] == ['A', 'A']
+    assert len(engine.orders) == 2
+
+
+def test_batch_clears_at_the_marginal_midpoint():
+    engine, sent, scheduler = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 106)
+    enter(engine, 'BBBBS000200001', 'S', 100)
+    scheduler.advance(3)
+    executions = [fields for header, fields in sent if header == 'E']
+    assert len(executions) == 2
+    assert all(fields['execution_price'] == 103 for fields in executions)
+    header, post_batch = sent[-1]
+    assert header == 'Z'
+    assert post_batch['clearing_price'] == 103
+    assert post_batch['transacted_volume'] == 1
+    assert not engine.orders
+
+
+def test_uncrossed_book_publishes_an_empty_batch():
+    engine, sent, scheduler = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 99)
+    enter(engine, 'BBBBS000200001', 'S', 100)
+    scheduler.advance(3)
+    header, post_batch = sent[-1]
+    assert header == 'Z'
+    assert post_batch['transacted_volume'] == 0
+    assert post_batch['best_bid'] == 99
+    assert post_batch['best_ask'] == 100
+
+
+def test_immediate_or_cancel_orders_die_after_the_batch():
+    engine, sent, scheduler = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 99, time_in_force=0)
+    scheduler.advance(3)
+    canceled = [fields for header, fields in sent if header == 'C']
+    assert canceled[0]['order_token'] == 'AAAAB000100001'
+    assert canceled[0]['reason'] == 'I'
+    assert not engine.orders
+
+
+def test_replace_to_zero_shares_does_not_rest():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 99)
+    engine.handle_message('replace', {'existing_order_token': 'AAAAB000100001',
+        'replacement_order_token': 'AAAAB000100002', 'price': 99, 'shares': 0,
+        'time_in_force': 99999})
+    assert sent[-1][0] == 'U'
+    assert not engine.orders
+    assert not engine.book.bids.levels
+
+
+def test_quote_rests_both_sides_until_the_batch():
+    engine, sent, _ = make_engine()
+    enter(engine, 'AAAAB000100001', 'B', 90)
+    enter(engine, 'AAAAS000100002', 'S', 110)
+    engine.handle_message('quote', {'existing_bid_token': 'AAAAB000100001',
+        'replacement_bid_token': 'AAAAB000100003', 'bid_price': 100,
+        'existing_offer_token': 'AAAAS000100002',
+        'replacement_offer_token': 'AAAAS000100004', 'offer_price': 100,
+        'shares': 1, 'time_in_force': 99999})
+    assert sent[-1][0] == 'W'
+    assert set(engine.orders) == {'AAAAB000100003', 'AAAAS000100004'}
+
+
+def test_batches_repeat():
+    engine, sent, scheduler = make_engine(batch_length=1)
+    for _ in range(3):
+        scheduler.advance(1)
+    assert [header for header, _ in sent] == ['Z', 'Z', 'Z']
@@ -0,0 +1,75 @@
+from local_exchange.benchmark import VirtualScheduler
+from local_exchange.iex import IEXEngine, NO_PEG_PRICE
+
+
+def make_engine(speed_bump=0.00035):
+    sent = []
+    scheduler = VirtualScheduler()
+    engine = IEXEngine(sent.extend, call_later=scheduler.call_later,
+        seconds=scheduler.seconds, clock=lambda: 0, speed_bump=speed_bump)
+    return engine, sent, scheduler
+
+
+def enter(engine, token, side, price, shares=1, midpoint_peg=False):
+    engine.handle_message('enter', {'order_token': token, 'buy_sell_indicator': side,
+        'price': price, 'shares': shares, 'time_in_force': 99999,
+        'firm': token[:4], 'midpoint_peg': midpoint_peg})
+
+
+def test_orders_wait_for_the_speed_bump():
+    engine, sent, scheduler = make_engine(speed_bump=0.001)
+    enter(engine, 'AAAAB000100001', 'B', 100)
+    assert sent == []
+    scheduler.advance(0.0005)
+    assert sent == []
+    scheduler.advance(0.0005)
+    assert sent[0][0] == 'A'
+    assert 'AAAAB000100001' in engine.orders
+
+
+def test_speed_bump_keeps_arrival_order():
+    engine, sent, scheduler = make_engine(speed_bump=0.001)
+    enter(engine, 'AAAAS000100001', 'S', 100)
+    engine.handle_message('cancel', {'order_token': 'AAAAS000100001'})
+    scheduler.advance(0.001)
+    assert [header for header, _ in sent if header in 'AC'] == ['A', 'C']
+    assert not engine.orders
+
+
+def test_external_feed_is_not_delayed():
+    engine, sent, _ = make_engine(speed_bump=0.001)
+    engine.handle_message('external_feed', {'e_best_bid': 90, 'e_best_offer': 110,
+        'e_signed_volume': 0})
+    assert engine.e_best_bid == 90
+    assert sent[-1] == ('L', {'timestamp': 0, 'peg_price': 100, 'peg_state': 0})
+
+
+def test_pegged_orders_trade_at_the_midpoint():
+    engine, sent, _ = make_engine(speed_bump=0)
+    enter(engine, 'AAAAB000100001', 'B', 90)
+    enter(engine, 'BBBBS000200001', 'S', 110)
+    assert engine.peg_price == 100
+    enter(engine, 'CCCCB000300001', 'B', 105, midpoint_peg=True)
+    enter(engine, 'DDDDS000400001', 'S', 100)
+    executions = [fields for header, fields in sent if header == 'E']
+    assert [fields['order_token'] for fields in executions] == [
+        'CCCCB000300001', 'DDDDS000400001']
+    assert all(fields['execution_price'] == 100 for fields in executions)
+
+
+def test_pegged_orders_are_not_displayed():
+    engine, sent, _ = make_engine(speed_bump=0)
+    enter(engine, 'AAAAB000100001', 'B', 90)
+    enter(engine, 'BBBBS000200001', 'S', 110)
+    enter(engine, 'CCCCB000300001', 'B', 105, midpoint_peg=True)
+    assert engine.book.bids.best_price() == 90
+    assert engine.peg_state == 1
+
+
+def test_no_midpoint_without_both_sides():
+    engine, sent, _ = make_engine(speed_bump=0)
+    enter(engine, 'AAAAB000100001', 'B', 90)
+    enter(engine, 'BBBBS000200001', 'S', 110)
+    engine.handle_message('cancel', {'order_token': 'BBBBS000200001'})
+    assert engine.peg_price is None
+    assert sent[-1][1]['peg_price'] == NO_PEG_PRICE
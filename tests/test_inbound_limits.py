@@ -0,0 +1,101 @@
+import logging
+
+import pytest
+
+pytest.importorskip('twisted')
+
+import hft.inbound_limits
+from hft.inbound_limits import InboundLimiter
+
+
+class FakeReactor:
+
+    def __init__(self):
+        self.later = []
+        self.in_thread = []
+
+    def callFromThread(self, function, *args):
+        function(*args)
+
+    def callLater(self, delay, function, *args):
+        self.later.append((delay, function, args))
+
+    def callInThread(self, function, *args):
+        self.in_thread.append((function, args))
+
+    def run_later(self):
+        later, self.later = self.later, []
+        for _, function, args in later:
+            function(*args)
+
+
+@pytest.fixture
+def reactor(monkeypatch):
+    fake = FakeReactor()
+    monkeypatch.setattr(hft.inbound_limits, 'reactor', fake)
+    return fake
+
+
+def make_limiter():
+    now = [0.0]
+    return InboundLimiter(clock=lambda: now[0]), now
+
+
+def test_bucket_drops_past_the_burst_and_refills():
+    limiter, now = make_limiter()
+    dispatched = []
+    for i in range(45):
+        limiter.admit(7, 'order_entered', i, dispatched.append)
+    assert dispatched == list(range(40))
+    assert limiter.dropped[7, 'order_entered'] == 5
+    # 20 a second, two tokens back after a tenth of a second
+    now[0] = 0.1
+    for message in ('a', 'b', 'c'):
+        limiter.admit(7, 'order_entered', message, dispatched.append)
+    assert dispatched[40:] == ['a', 'b']
+    assert limiter.dropped[7, 'order_entered'] == 6
+
+
+def test_buckets_are_per_player():
+    limiter, _ = make_limiter()
+    dispatched = []
+    for player_id in (1, 2):
+        for _ in range(5):
+            limiter.admit(player_id, 'player_ready', player_id, dispatched.append)
+    assert dispatched == [1] * 5 + [2] * 5
+    limiter.admit(1, 'player_ready', 1, dispatched.append)
+    assert limiter.dropped == {(1, 'player_ready'): 1}
+    assert 'player 1 player_ready: 1 dropped' in limiter.report()
+
+
+def test_dropped_orders_are_warned(caplog):
+    limiter, _ = make_limiter()
+    with caplog.at_level(logging.DEBUG, logger='hft.inbound_limits'):
+        for _ in range(41):
+            limiter.admit(7, 'order_entered', None, lambda message: None)
+        for _ in range(6):
+            limiter.admit(7, 'player_ready', None, lambda message: None)
+    levels = [record.levelno for record in caplog.records]
+    assert levels == [logging.WARNING, logging.DEBUG]
+
+
+def test_sliders_are_coalesced(reactor):
+    limiter, now = make_limiter()
+    dispatched = []
+    limiter.admit(7, 'slider', 'first', dispatched.append)
+    assert dispatched == ['first']
+    assert reactor.later[0][0] == limiter.coalesce_window
+    limiter.admit(7, 'slider', 'second', dispatched.append)
+    limiter.admit(7, 'slider', 'third', dispatched.append)
+    assert dispatched == ['first']
+    assert limiter.coalesced[7, 'slider'] == 1
+    now[0] = 0.1
+    reactor.run_later()
+    # the newest value is dispatched off the reactor thread
+    assert reactor.in_thread == [(dispatched.append, ('third', ))]
+    # nothing arrived in the next window, it closes
+    reactor.run_later()
+    assert limiter.windows == {}
+    assert reactor.later == []
+    limiter.admit(7, 'slider', 'fourth', dispatched.append)
+    assert dispatched == ['first', 'fourth']
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip('django')
+pytest.importorskip('exchange_server.OuchServer.ouch_messages')
+
+from hft.incoming_message import LazyOuchMessage
+from hft.message_benchmark import accepted_frame, accepted_messages
+from hft.ouch_extensions import (
+    ExtendedMessages, ExtensionMessageSpec, QuoteReplaced, server_messages)
+
+
+def test_routing_fields_are_read_on_creation():
+    message = LazyOuchMessage(accepted_frame, accepted_messages)
+    assert set(dict.keys(message)) == {'type', 'player_id', 'firm'}
+    assert (message['player_id'], message['firm']) == (1, 'aaaa')
+
+
+def test_fields_are_decoded_one_at_a_time():
+    message = LazyOuchMessage(accepted_frame, accepted_messages)
+    assert message['price'] == 1000000
+    assert message['buy_sell_indicator'] == 'B'
+    assert not message.complete
+    assert set(dict.keys(message)) == {'type', 'player_id', 'firm', 'price',
+        'buy_sell_indicator'}
+    with pytest.raises(KeyError):
+        message['execution_price']
+
+
+def test_whole_message():
+    message = LazyOuchMessage(accepted_frame, accepted_messages)
+    message['price']
+    message['order_token'] = 'changed'
+    assert dict(message)['order_token'] == 'changed'
+    assert len(message) == 17 + 2
+    assert dict(message)['stock'] == 'AMAZGOOG'
+
+
+def test_layout_that_does_not_match_is_decoded_whole():
+    spec = ExtensionMessageSpec('Accepted', b'A', (('timestamp', 'Q'),
+        ('order_token', '14s')))
+    # the layout is only trusted if it adds up to the spec
+    spec.payload_size += 1
+    frame = b'A' + spec.payload_struct.pack(1, b'AAAAB00010000A') + b'\0'
+    message = LazyOuchMessage(frame, ExtendedMessages(server_messages, spec))
+    assert message.structs is None
+    assert message['timestamp'] == 1
+    assert message.complete
+
+
+def test_quote_ack_is_routed_by_its_first_replaced_side():
+    blank = b' ' * 14
+    frame = QuoteReplaced.header + QuoteReplaced.payload_struct.pack(1, blank, blank,
+        0, b'AAAAS0001000A1', b'AAAAS0001000A2', 1010000, 1)
+    message = LazyOuchMessage(frame, server_messages)
+    assert (message['player_id'], message['firm']) == (1, 'aaaa')
+    assert message['replacement_bid_token'].strip() == ''
+    assert message['offer_price'] == 1010000
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+pytest.importorskip('twisted')
+
+from hft.journal import (INBOUND, OUTBOUND, WEBSOCKET, Journal, JournalReader,
+    decode_websocket_frame)
+
+
+def write_journal(path, records):
+    """ records are (timestamp, direction, market id, frame) """
+    timestamps = iter([0] + [timestamp for timestamp, _, _, _ in records])
+    journal = Journal(str(path), flush_interval=0, clock=lambda: next(timestamps))
+    for _, direction, market_id, frame in records:
+        journal.record(direction, 1, market_id, frame)
+    journal.close()
+    return str(path)
+
+
+def test_records_read_back_in_order(tmp_path):
+    path = write_journal(tmp_path / 'a.journal', [
+        (10, INBOUND, 3, b'Aframe'), (20, OUTBOUND, 3, b'Oframe')])
+    with JournalReader(path) as reader:
+        records = list(reader)
+    assert [(r.timestamp, r.direction, r.subsession_id, r.market_id, bytes(r.frame))
+        for r in records] == [(10, INBOUND, 1, 3, b'Aframe'),
+        (20, OUTBOUND, 1, 3, b'Oframe')]
+
+
+def test_record_at_builds_the_index(tmp_path):
+    path = write_journal(tmp_path / 'a.journal', [(10, INBOUND, 3, b'A'),
+        (20, INBOUND, 3, b'B')])
+    with JournalReader(path) as reader:
+        assert bytes(reader.record_at(1).frame) == b'B'
+
+
+def test_seek_and_time_window(tmp_path):
+    path = write_journal(tmp_path / 'a.journal', [(timestamp, INBOUND, 3, b'x')
+        for timestamp in (10, 20, 30, 40)])
+    with JournalReader(path) as reader:
+        assert len(reader) == 4
+        assert reader.seek(25) == 2
+        assert [r.timestamp for r in reader.records(20, 40)] == [20, 30]
+
+
+def test_truncated_record_ends_the_journal(tmp_path):
+    path = write_journal(tmp_path / 'a.journal', [(10, INBOUND, 3, b'first'),
+        (20, INBOUND, 3, b'second')])
+    with open(path, 'r+b') as journal_file:
+        journal_file.truncate(journal_file.seek(0, 2) - 3)
+    with JournalReader(path) as reader:
+        assert [bytes(r.frame) for r in reader] == [b'first']
+
+
+def test_websocket_records(tmp_path):
+    journal = Journal(str(tmp_path / 'a.journal'), flush_interval=0)
+    journal.record_websocket('1', '3', 7, '{"type": "slider"}')
+    journal.close()
+    with JournalReader(str(tmp_path / 'a.journal')) as reader:
+        record, = list(reader)
+    assert record.direction == WEBSOCKET
+    assert decode_websocket_frame(record.frame) == (7, '{"type": "slider"}')
+
+
+def test_not_a_journal(tmp_path):
+    path = tmp_path / 'other'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(Exception):
+        JournalReader(str(path))
+
+
+def test_records_from_several_threads_stay_whole(tmp_path):
+    path = str(tmp_path / 'a.journal')
+    journal = Journal(path, buffer_size=256, flush_interval=0)
+
+    def record(player_id):
+        for i in range(500):
+            journal.record_websocket(1, 3, player_id, 'message %d' % i)
+
+    threads = [threading.Thread(target=record, args=(player_id, ))
+        for player_id in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    journal.close()
+    with JournalReader(path) as reader:
+        records = list(reader)
+    assert len(records) == 2000
+    timestamps = [record.timestamp for record in records]
+    assert timestamps == sorted(timestamps)
+    for player_id in range(1, 5):
+        assert [text for record_player_id, text in (decode_websocket_frame(
+            record.frame) for record in records) if record_player_id == player_id
+            ] == ['message %d' % i for i in range(500)]
@@ -0,0 +1,85 @@
+from hft.market_elements.market_history import (HistoryBuffer, MarketHistory,
+    MarketHistoryStore)
+
+
+def test_empty_buckets_repeat_the_one_before():
+    history_buffer = HistoryBuffer(1, 10)
+    history_buffer.record(0.5, {'best_bid': 100, 'signed_volume': 0.5})
+    history_buffer.record(3.2, {'best_bid': 102})
+    first, columns = history_buffer.window(10)
+    assert first == 0
+    assert columns['best_bid'] == [100, 100, 100, 102]
+    assert columns['signed_volume'] == [0.5] * 4
+
+
+def test_unset_fields_are_none():
+    history_buffer = HistoryBuffer(1, 10)
+    history_buffer.record(0, {'best_bid': 100})
+    history_buffer.record(1, {'best_offer': 0})
+    _, columns = history_buffer.window(2)
+    assert columns['best_bid'] == [100, 100]
+    # zero is a value, not a missing one
+    assert columns['best_offer'] == [None, 0]
+    assert columns['reference_price'] == [None, None]
+    assert columns['signed_volume'] == [None, None]
+
+
+def test_ring_keeps_the_last_capacity_buckets():
+    history_buffer = HistoryBuffer(1, 3)
+    for second in range(5):
+        history_buffer.record(second, {'best_bid': second})
+    first, columns = history_buffer.window(10)
+    assert first == 2
+    assert columns['best_bid'] == [2, 3, 4]
+    # a gap longer than the ring fills it with the last value
+    history_buffer.record(20, {'best_offer': 7})
+    first, columns = history_buffer.window(3)
+    assert first == 18
+    assert columns['best_bid'] == [4, 4, 4]
+    assert columns['best_offer'] == [None, None, 7]
+
+
+def test_late_records_are_ignored():
+    history_buffer = HistoryBuffer(1, 10)
+    history_buffer.record(5, {'best_bid': 100})
+    history_buffer.record(4, {'best_bid': 90})
+    assert history_buffer.window(10) == (5, {'best_bid': [100],
+        'best_offer': [None], 'reference_price': [None], 'signed_volume': [None]})
+
+
+def test_empty_window():
+    first, columns = HistoryBuffer(1, 10).window(5)
+    assert first is None
+    assert columns['best_bid'] == []
+
+
+def test_signed_volume_is_rounded():
+    history_buffer = HistoryBuffer(1, 10)
+    history_buffer.record(0, {'signed_volume': 0.1})
+    _, columns = history_buffer.window(1)
+    assert columns['signed_volume'] == [0.1]
+
+
+def test_window_picks_the_closest_resolution():
+    history = MarketHistory()
+    history.record(timestamp=10.05, best_bid=100)
+    history.record(timestamp=10.25, best_bid=101)
+    columns = history.window(200, 0.3)
+    assert columns['resolution'] == 100
+    assert columns['start'] == 10000
+    assert columns['best_bid'] == [100, 100, 101]
+    columns = history.window(5000, 60)
+    assert columns['resolution'] == 1000
+    assert columns['best_bid'] == [101]
+
+
+def test_store_forgets_the_oldest_market():
+    store = MarketHistoryStore()
+    store.max_markets = 2
+    first = store.get('1')
+    assert store.get(1) is first
+    store.get(2)
+    store.get(1)
+    store.get(3)
+    assert list(store.histories) == [1, 3]
+    assert store.get(1) is first
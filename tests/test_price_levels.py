@@ -0,0 +1,67 @@
+from hft.market_elements.price_levels import PriceLevelBook
+
+
+def test_levels_count_resting_orders():
+    book = PriceLevelBook(depth=2)
+    book.add('a', 100, 'B')
+    book.add('b', 100, 'B')
+    book.add('c', 99, 'B')
+    book.add('d', 98, 'B')
+    book.add('e', 101, 'S')
+    assert book.top('B') == [[100, 2], [99, 1]]
+    assert book.top('S') == [[101, 1]]
+
+
+def test_orders_that_never_rested_leave_levels_alone():
+    book = PriceLevelBook()
+    book.add('a', 100, 'B')
+    # an immediate or cancel order at the same price is never added
+    assert not book.remove('ioc')
+    assert book.top('B') == [[100, 1]]
+
+
+def test_removal_goes_by_token():
+    book = PriceLevelBook()
+    book.add('a', 100, 'B')
+    book.add('b', 100, 'B')
+    assert book.remove('a')
+    assert not book.remove('a')
+    assert book.top('B') == [[100, 1]]
+    assert book.remove('b')
+    assert book.top('B') == []
+    assert len(book) == 0
+
+
+def test_duplicate_tokens_are_added_once():
+    book = PriceLevelBook()
+    assert book.add('a', 100, 'S')
+    assert not book.add('a', 100, 'S')
+    assert book.top('S') == [[100, 1]]
+
+
+def test_replace_moves_a_resting_order():
+    book = PriceLevelBook()
+    book.add('a', 100, 'S')
+    assert book.replace('a', 'b', 102)
+    assert 'a' not in book and 'b' in book
+    assert book.top('S') == [[102, 1]]
+    assert not book.replace('gone', 'c', 103)
+    assert book.top('S') == [[102, 1]]
+
+
+def test_snapshot_only_when_changed():
+    book = PriceLevelBook()
+    assert book.snapshot() == ([], [])
+    assert book.snapshot() is None
+    book.add('a', 100, 'B')
+    assert book.snapshot() == ([[100, 1]], [])
+    book.add('b', 90, 'B')
+    book.remove('b')
+    assert book.snapshot() is None
+
+
+def test_to_kwargs():
+    book = PriceLevelBook(depth=3, batched=True)
+    book.add('a', 101, 'S')
+    assert book.to_kwargs() == {'depth': 3, 'batched': True, 'bids': [],
+        'offers': [[101, 1]]}